@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter, deque
+
+from starlette.responses import JSONResponse
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_MAX_QUEUED = 16
+DEFAULT_MAX_INFLIGHT_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_REQUEST_BYTES = 1024 ** 3
+DEFAULT_QUEUE_TIMEOUT = 60.0
+# Smoothing of the average ingest duration used for Retry-After
+DURATION_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, reason, status_code, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limits the number of concurrent requests and the total bytes of their bodies.
+
+    A request is admitted when a concurrency slot is free and its declared size
+    fits in the in-flight byte budget. Otherwise it waits in a FIFO queue.
+    When the queue is full, or the wait exceeds the queue timeout, the request
+    is rejected. Limits apply per worker process and to one event loop.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, max_queued=DEFAULT_MAX_QUEUED,
+                 max_inflight_bytes=DEFAULT_MAX_INFLIGHT_BYTES, max_request_bytes=DEFAULT_MAX_REQUEST_BYTES,
+                 queue_timeout=DEFAULT_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_request_bytes = max_request_bytes
+        self.queue_timeout = queue_timeout
+
+        self.active = 0
+        self.inflight_bytes = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.completed = 0
+        self.rejections = Counter()
+        self.average_duration = None
+
+    def _fits(self, size):
+        if self.active >= self.max_concurrent:
+            return False
+        # A lone request is always admitted so an oversized budget can never deadlock
+        return self.active == 0 or self.inflight_bytes + size <= self.max_inflight_bytes
+
+    def _grant(self, size):
+        self.active += 1
+        self.inflight_bytes += size
+        self.admitted += 1
+
+    def _wake(self):
+        while self.waiters and self._fits(self.waiters[0][0]):
+            size, future = self.waiters.popleft()
+            if future.done():
+                continue
+            self._grant(size)
+            future.set_result(True)
+
+    def _abandon(self, entry):
+        size, future = entry
+        if future.done() and not future.cancelled():
+            # Granted just before the waiter gave up: hand the slot back
+            self.release(size)
+            return
+        future.cancel()
+        try:
+            self.waiters.remove(entry)
+        except ValueError:
+            pass
+
+    def retry_after(self):
+        """Seconds until the queue should have drained one slot, from the average ingest duration."""
+        average = self.average_duration or self.queue_timeout
+        backlog = len(self.waiters) + 1
+        return max(1, math.ceil(average * backlog / self.max_concurrent))
+
+    def reject(self, reason, status_code=429):
+        self.rejections[reason] += 1
+        logger.warning(f"Rejected request: {reason} (active {self.active}, queued {len(self.waiters)})")
+        return AdmissionRejected(reason, status_code, self.retry_after() if status_code == 429 else None)
+
+    async def acquire(self, size):
+        """
+        Wait for a slot for a request of `size` bytes.
+
+        Raises:
+        AdmissionRejected: The request is too large, the queue is full, or the wait timed out
+        """
+        if size > self.max_request_bytes:
+            raise self.reject("request_too_large", 413)
+        if not self.waiters and self._fits(size):
+            self._grant(size)
+            return
+        if len(self.waiters) >= self.max_queued:
+            raise self.reject("queue_full")
+
+        entry = (size, asyncio.get_running_loop().create_future())
+        self.waiters.append(entry)
+        try:
+            done, _ = await asyncio.wait({entry[1]}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        if not done:
+            self._abandon(entry)
+            raise self.reject("queue_timeout")
+
+    def release(self, size, duration=None):
+        self.active -= 1
+        self.inflight_bytes -= size
+        self.completed += 1
+        if duration is not None:
+            if self.average_duration is None:
+                self.average_duration = duration
+            else:
+                self.average_duration += DURATION_SMOOTHING * (duration - self.average_duration)
+        self._wake()
+
+    def metrics(self):
+        return {
+            "active": self.active,
+            "queued": len(self.waiters),
+            "inflight_bytes": self.inflight_bytes,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "rejected": dict(self.rejections),
+            "average_duration_seconds": self.average_duration,
+            "limits": {
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "max_inflight_bytes": self.max_inflight_bytes,
+                "max_request_bytes": self.max_request_bytes,
+                "queue_timeout_seconds": self.queue_timeout,
+            },
+        }
+
+
+def rejection_response(rejection, max_request_bytes):
+    """JSON response for an AdmissionRejected, with Retry-After when the client should retry."""
+    headers = {"Retry-After": str(rejection.retry_after)} if rejection.retry_after else None
+    details = {
+        "request_too_large": f"Request exceeds the upload limit of {max_request_bytes} bytes",
+        "queue_full": "Too many uploads in progress, try again later",
+        "queue_timeout": "Timed out waiting for an upload slot, try again later",
+    }
+    return JSONResponse({"detail": details[rejection.reason]}, status_code=rejection.status_code, headers=headers)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to POST requests on some paths.
+
+    Admission happens before the body is read, so a rejected upload never reaches
+    memory or temp disk. Requests without a Content-Length reserve the maximum
+    request size. A body that grows past that size is cut off with 413.
+    The slot is released once the response is sent, before any background tasks
+    run; those are bounded by the app itself.
+    """
+
+    def __init__(self, app, controller, paths):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        try:
+            size = int(headers[b"content-length"])
+        except (KeyError, ValueError):
+            size = self.controller.max_request_bytes
+
+        try:
+            await self.controller.acquire(size)
+        except AdmissionRejected as e:
+            await self._rejection_response(e)(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        received = 0
+        too_large = False
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.controller.release(size, time.monotonic() - started)
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.controller.max_request_bytes:
+                    # Stop the body here; the app's error response is replaced with 413 below
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if too_large:
+                return
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                release()
+
+        try:
+            try:
+                await self.app(scope, limited_receive, guarded_send)
+            except Exception:
+                if not too_large:
+                    raise
+            if too_large:
+                rejection = self.controller.reject("request_too_large", 413)
+                await self._rejection_response(rejection)(scope, receive, send)
+        finally:
+            release()
+
+    def _rejection_response(self, rejection):
+        return rejection_response(rejection, self.controller.max_request_bytes)
@@ -0,0 +1,65 @@
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def file_digest(file_path):
+    """Return the SHA-256 hex digest of a file, read in fixed-size blocks."""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed file store.
+
+    Files are stored once under objects/<first two hex digits>/<sha256><ext>,
+    so identical logs and screenshots from repeated uploads share one copy.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def object_path(self, digest, extension=""):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}{extension.lower()}")
+
+    def put(self, src_path, move=True):
+        """
+        Add a file to the store.
+
+        Args:
+        src_path (str): File to store
+        move (bool): Move the source into the store instead of copying it
+
+        Returns:
+        tuple: (digest, stored path, True if the content was new)
+        """
+        digest = file_digest(src_path)
+        extension = os.path.splitext(src_path)[1]
+        dst = self.object_path(digest, extension)
+        if os.path.exists(dst):
+            logger.debug(f"Artifact already stored: {os.path.basename(src_path)} -> {digest}")
+            return digest, dst, False
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        # Stage next to the destination so the final rename is atomic
+        tmp_path = f"{dst}.{uuid.uuid4().hex}.tmp"
+        if move:
+            shutil.move(src_path, tmp_path)
+        else:
+            shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, dst)
+        logger.info(f"Stored artifact: {os.path.basename(src_path)} -> {digest}")
+        return digest, dst, True
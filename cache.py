@@ -0,0 +1,81 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class VersionedCache:
+    """
+    In-process cache that stays consistent across worker processes.
+
+    Writers bump a version number for the cache name in the shared database.
+    Each worker reads that number at most once per poll interval and drops its
+    entries when the number has changed. Other workers therefore see a change
+    within one poll interval, and the worker that made the change sees it as soon
+    as the change commits.
+    """
+
+    def __init__(self, name, version_loader, poll_interval=DEFAULT_POLL_INTERVAL, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+        name (str): Cache name, as stored in the version table
+        version_loader (callable): Returns the current version of a cache name
+        poll_interval (float): Minimum seconds between two version reads
+        max_entries (int): Least recently used entries beyond this are evicted
+        """
+        self.name = name
+        self.version_loader = version_loader
+        self.poll_interval = poll_interval
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.version = None
+        self.checked_at = 0.0
+        # Bumped whenever entries are dropped, so a load that raced a drop is not stored
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def _check_version(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.checked_at < self.poll_interval:
+                return
+            self.checked_at = now
+        version = self.version_loader(self.name)
+        with self.lock:
+            if version != self.version:
+                if self.version is not None:
+                    logger.debug(f"Cache {self.name} version changed {self.version} -> {version}, clearing")
+                self.entries.clear()
+                self.generation += 1
+                self.version = version
+
+    def get(self, key, loader):
+        """Return the cached value of a key, calling loader() to fill it on a miss."""
+        self._check_version()
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            generation = self.generation
+        value = loader()
+        with self.lock:
+            if generation != self.generation:
+                # Dropped while loading: the value may predate the change, so it is returned but not kept
+                return value
+            self.entries[key] = value
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        """Drop every entry and re-read the version on the next access."""
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+            self.checked_at = 0.0
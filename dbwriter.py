@@ -0,0 +1,149 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 50
+DEFAULT_LINGER_SECONDS = 0.02
+# Key in Session.info of the callbacks to run once the job's transaction has committed
+AFTER_COMMIT_KEY = "after_commit"
+
+
+@contextmanager
+def interprocess_lock(lock_path):
+    """Exclusive lock shared by every process using the same lock file."""
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class WriteQueue:
+    """
+    Single writer for the database.
+
+    Jobs are callables taking a session as first argument. One background
+    thread runs them. Jobs queued at the same time share one transaction and
+    one commit. Across worker processes, each batch holds an exclusive file
+    lock, so only one process writes at a time and read-modify-write jobs
+    (such as upserts by filename) never interleave.
+
+    If a batch fails, its jobs are retried one by one, so a failing job only
+    fails its own future.
+
+    Jobs register work that must only happen once their data is visible, such
+    as cache invalidation, with after_commit(). It runs right after the commit
+    and is dropped when the transaction rolls back.
+    """
+
+    def __init__(self, session_factory, lock_path, max_batch=DEFAULT_MAX_BATCH, linger=DEFAULT_LINGER_SECONDS):
+        self.session_factory = session_factory
+        self.lock_path = lock_path
+        self.max_batch = max_batch
+        self.linger = linger
+        self.jobs = queue.Queue()
+        self.thread = None
+        self.pid = None
+        self.thread_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self.thread_lock:
+            # Restart after a fork: the writer thread does not survive into worker processes
+            if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a write job and return a Future with its result."""
+        future = Future()
+        self._ensure_started()
+        self.jobs.put((fn, args, kwargs, future))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Queue a write job and wait for its result, re-raising its exception."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _next_batch(self):
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def after_commit(db, callback):
+        """Run callback() after the transaction of the session db commits."""
+        callbacks = db.info.setdefault(AFTER_COMMIT_KEY, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+    def _execute(self, batch):
+        db = self.session_factory()
+        try:
+            results = []
+            for fn, args, kwargs, _ in batch:
+                results.append(fn(db, *args, **kwargs))
+                # Later jobs of the batch must see this job's rows
+                db.flush()
+            db.commit()
+            for callback in db.info.pop(AFTER_COMMIT_KEY, []):
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"After-commit callback failed: {str(e)}")
+            return results
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.info.pop(AFTER_COMMIT_KEY, None)
+            db.close()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            with interprocess_lock(self.lock_path):
+                try:
+                    results = self._execute(batch)
+                except Exception as e:
+                    if len(batch) == 1:
+                        batch[0][3].set_exception(e)
+                        continue
+                    logger.warning(f"Write batch of {len(batch)} jobs failed, retrying individually: {e}")
+                    for job in batch:
+                        try:
+                            job[3].set_result(self._execute([job])[0])
+                        except Exception as job_error:
+                            job[3].set_exception(job_error)
+                    continue
+            for job, result in zip(batch, results):
+                job[3].set_result(result)
+            logger.debug(f"Committed write batch of {len(batch)} jobs")
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import logging
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from sqlalchemy import text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# JSON result columns flattened into "<prefix>.<key>" columns
+RESULT_SECTIONS = [
+    ("summary_results", "Summary"),
+    ("dl_test_results", "DL_Test"),
+    ("ul_test_results", "UL_Test"),
+    ("ookla_test_results", "Ookla_Test"),
+]
+BASE_COLUMNS = ["filename", "market", "site_name", "criteria", "criteria_value", "timestamp"]
+FETCH_SIZE = 500
+XLSX_MAX_ROWS = 1048576
+XLSX_MAX_CELL_CHARS = 32767
+
+ROWS_QUERY = """
+    SELECT test_results.filename, sites.market, sites.site_name, sites.criteria, sites.criteria_value,
+           test_results.timestamp, {sections}, test_results.evaluation_results
+    FROM test_results
+    LEFT JOIN sites ON sites.siteid_sectorid = test_results.filename
+    {where}
+    ORDER BY test_results.id
+"""
+
+
+def _market_filter(market):
+    if market is None:
+        return "", {}
+    return "WHERE sites.market = :market", {"market": market}
+
+
+class ExportLayout:
+    """Column layout of an export: base columns, the keys of each JSON section and the evaluated KPIs."""
+
+    def __init__(self, section_keys, kpi_names, has_errors):
+        self.section_keys = section_keys
+        self.kpi_names = kpi_names
+        self.has_errors = has_errors
+
+    @classmethod
+    def discover(cls, db, market=None):
+        """
+        Collect the JSON keys and KPI names present in the table.
+
+        The keys are listed inside SQLite with json_each, so no result row is loaded here.
+        Keys keep the order in which they first appear.
+        """
+        where, params = _market_filter(market)
+        section_keys = {}
+        for column, _ in RESULT_SECTIONS:
+            rows = db.execute(text(f"""
+                SELECT item.key FROM test_results
+                LEFT JOIN sites ON sites.siteid_sectorid = test_results.filename,
+                json_each(test_results.{column}) AS item
+                {where}
+                GROUP BY item.key ORDER BY MIN(test_results.id), MIN(item.id)
+            """), params)
+            section_keys[column] = [key for (key,) in rows]
+
+        kpi_names = [name for (name,) in db.execute(text(f"""
+            SELECT json_extract(item.value, '$.kpi_name') AS kpi_name FROM test_results
+            LEFT JOIN sites ON sites.siteid_sectorid = test_results.filename,
+            json_each(test_results.evaluation_results) AS item
+            {where}
+            GROUP BY kpi_name HAVING kpi_name IS NOT NULL ORDER BY MIN(test_results.id), MIN(item.id)
+        """), params)]
+
+        error_where = f"{where} AND" if where else "WHERE"
+        has_errors = db.execute(text(f"""
+            SELECT 1 FROM test_results
+            LEFT JOIN sites ON sites.siteid_sectorid = test_results.filename,
+            json_each(test_results.evaluation_results) AS item
+            {error_where} json_extract(item.value, '$.error') IS NOT NULL LIMIT 1
+        """), params).first() is not None
+        return cls(section_keys, kpi_names, has_errors)
+
+    def header(self):
+        columns = list(BASE_COLUMNS)
+        for column, prefix in RESULT_SECTIONS:
+            columns.extend(f"{prefix}.{key}" for key in self.section_keys[column])
+        for kpi_name in self.kpi_names:
+            columns.extend([f"{kpi_name} status", f"{kpi_name} result"])
+        if self.has_errors:
+            columns.append("evaluation_error")
+        return columns
+
+    def flatten(self, row):
+        """Turn one result row into a list of values matching header()."""
+        values = list(row[:len(BASE_COLUMNS)])
+        for i, (column, _) in enumerate(RESULT_SECTIONS):
+            data = _load_json(row[len(BASE_COLUMNS) + i]) or {}
+            values.extend(_scalar(data.get(key)) for key in self.section_keys[column])
+
+        evaluations = _load_json(row[-1]) or []
+        by_kpi = {item['kpi_name']: item for item in evaluations if 'kpi_name' in item}
+        for kpi_name in self.kpi_names:
+            item = by_kpi.get(kpi_name, {})
+            values.extend([item.get('status'), _scalar(item.get('result'))])
+        if self.has_errors:
+            values.append("; ".join(item['error'] for item in evaluations if 'error' in item) or None)
+        return values
+
+
+def _load_json(value):
+    if value is None or not isinstance(value, str):
+        return value
+    return json.loads(value)
+
+
+def _scalar(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def iter_export_rows(db, layout, market=None, fetch_size=FETCH_SIZE):
+    """Yield flattened rows, fetched from the cursor fetch_size rows at a time."""
+    where, params = _market_filter(market)
+    sections = ", ".join(f"test_results.{column}" for column, _ in RESULT_SECTIONS)
+    query = text(ROWS_QUERY.format(sections=sections, where=where))
+    result = db.execute(query.execution_options(stream_results=True, yield_per=fetch_size), params)
+    for partition in result.partitions():
+        for row in partition:
+            yield layout.flatten(row)
+
+
+def iter_csv_export(session_factory, market=None, fetch_size=FETCH_SIZE):
+    """
+    Yield the export as CSV text, one chunk per fetched batch.
+
+    The generator owns its session, so it can outlive the request that started it.
+    """
+    db = session_factory()
+    try:
+        layout = ExportLayout.discover(db, market)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(layout.header())
+        count = 0
+        for values in iter_export_rows(db, layout, market, fetch_size):
+            writer.writerow(values)
+            count += 1
+            if count % fetch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        logger.info(f"Exported {count} test results as CSV")
+    finally:
+        db.close()
+
+
+def _xlsx_value(value):
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)[:XLSX_MAX_CELL_CHARS]
+    return value
+
+
+def write_xlsx_export(session_factory, path, market=None, fetch_size=FETCH_SIZE):
+    """
+    Write the export to an XLSX file with openpyxl's write-only mode.
+
+    Rows go to the worksheet's temporary file as they are appended, so memory
+    stays flat. A new sheet is started when one reaches Excel's row limit.
+
+    Returns:
+    int: Number of exported test results
+    """
+    db = session_factory()
+    try:
+        layout = ExportLayout.discover(db, market)
+        header = layout.header()
+        workbook = Workbook(write_only=True)
+        sheet = None
+        sheet_rows = XLSX_MAX_ROWS
+        count = 0
+        for values in iter_export_rows(db, layout, market, fetch_size):
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet(title="test_results" if sheet is None else f"test_results_{len(workbook.worksheets) + 1}")
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append([_xlsx_value(value) for value in values])
+            sheet_rows += 1
+            count += 1
+        if sheet is None:
+            workbook.create_sheet(title="test_results").append(header)
+        workbook.save(path)
+        logger.info(f"Exported {count} test results as XLSX")
+        return count
+    finally:
+        db.close()
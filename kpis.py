@@ -0,0 +1,252 @@
+import ast
+import logging
+from functools import reduce
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Parsed result sections an expression can read; bare names are Summary fields
+SECTIONS = ("Summary", "DL_Test", "UL_Test", "Ookla_Test")
+DEFAULT_SECTION = "Summary"
+
+# KPI name in criteria -> expression; derived KPI definitions add to and override these
+BUILTIN_KPIS = {
+    'PDSCH_Peak': 'DL_Test.PDSCH_Peak',
+    'PUSCH_Peak': 'UL_Test.PUSCH_Peak',
+    'Ping _avg': 'ping_avg',
+    'Ookla_DL(Mbps)': 'Ookla_Test["Ookla_DL(Mbps)_Peak"]',
+    'Ookla_UL(Mbps)': 'Ookla_Test["Ookla_UL(Mbps)_Peak"]',
+    'Attach_Successrate': 'where(attachrequest_count > 0, coalesce(attachcomplete_count, 0) / attachrequest_count * 100, 0)',
+    'PDSCH_Avg': 'DL_Test["Avg_NR_Total_PDSCH Tput(Mbps)"]',
+    'PUSCH_Avg': 'UL_Test["Avg_NR_Total_PUSCH Tput(Mbps)"]',
+}
+
+MAX_EXPRESSION_LENGTH = 1000
+
+
+def _coalesce(*values):
+    return reduce(lambda first, other: np.where(np.isnan(first), other, first), values)
+
+
+FUNCTIONS = {
+    "abs": np.abs,
+    "min": lambda *values: reduce(np.minimum, values),
+    "max": lambda *values: reduce(np.maximum, values),
+    "where": np.where,
+    "coalesce": _coalesce,
+}
+FUNCTION_ARITY = {"abs": (1, 1), "min": (2, None), "max": (2, None), "where": (3, 3), "coalesce": (2, None)}
+BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+COMPARISON_OPERATORS = (ast.Gt, ast.GtE, ast.Lt, ast.LtE, ast.Eq, ast.NotEq)
+
+
+class KpiExpressionError(ValueError):
+    """Raised when a KPI expression is not valid."""
+
+
+class _Compiler(ast.NodeTransformer):
+    """
+    Check an expression against the allowed syntax and rewrite it for eval().
+
+    Field references become the names _f0, _f1, ..., numbers become float64
+    constants _c0, _c1, ... (so `9 ** 9 ** 9` overflows instead of building a huge
+    int), and/or/not and function calls become calls to numpy functions.
+    """
+
+    def __init__(self):
+        self.fields = []
+        self.namespace = {}
+
+    def _bind(self, prefix, value):
+        name = f"{prefix}{len([key for key in self.namespace if key.startswith(prefix)])}"
+        self.namespace[name] = value
+        return ast.Name(id=name, ctx=ast.Load())
+
+    def _field(self, section, key):
+        if (section, key) not in self.fields:
+            self.fields.append((section, key))
+        return ast.Name(id=f"_f{self.fields.index((section, key))}", ctx=ast.Load())
+
+    def _call(self, function, args):
+        return ast.Call(func=self._bind("_g", function), args=args, keywords=[])
+
+    def generic_visit(self, node):
+        raise KpiExpressionError(f"{type(node).__name__} is not allowed in KPI expressions")
+
+    def visit_Expression(self, node):
+        return ast.Expression(body=self.visit(node.body))
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise KpiExpressionError(f"Only numbers are allowed as constants, not {node.value!r}")
+        return self._bind("_c", np.float64(node.value))
+
+    def visit_Name(self, node):
+        if node.id in SECTIONS or node.id in FUNCTIONS:
+            raise KpiExpressionError(f"{node.id} cannot be used as a value")
+        return self._field(DEFAULT_SECTION, node.id)
+
+    def visit_Attribute(self, node):
+        if not isinstance(node.value, ast.Name) or node.value.id not in SECTIONS:
+            raise KpiExpressionError(f"Fields are read as <section>.<field>, with a section in {', '.join(SECTIONS)}")
+        return self._field(node.value.id, node.attr)
+
+    def visit_Subscript(self, node):
+        key = node.slice
+        if (not isinstance(node.value, ast.Name) or node.value.id not in SECTIONS
+                or not isinstance(key, ast.Constant) or not isinstance(key.value, str)):
+            raise KpiExpressionError(f'Fields are read as <section>["<field>"], with a section in {", ".join(SECTIONS)}')
+        return self._field(node.value.id, key.value)
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, BINARY_OPERATORS):
+            raise KpiExpressionError(f"Operator {type(node.op).__name__} is not allowed in KPI expressions")
+        return ast.BinOp(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return self._call(np.logical_not, [self.visit(node.operand)])
+        if not isinstance(node.op, (ast.USub, ast.UAdd)):
+            raise KpiExpressionError(f"Operator {type(node.op).__name__} is not allowed in KPI expressions")
+        return ast.UnaryOp(op=node.op, operand=self.visit(node.operand))
+
+    def visit_BoolOp(self, node):
+        function = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        values = [self.visit(value) for value in node.values]
+        return self._call(lambda *arrays: reduce(function, arrays), values)
+
+    def visit_Compare(self, node):
+        if len(node.ops) != 1 or not isinstance(node.ops[0], COMPARISON_OPERATORS):
+            raise KpiExpressionError("Comparisons take two operands and one of >, >=, <, <=, ==, !=")
+        return ast.Compare(left=self.visit(node.left), ops=node.ops, comparators=[self.visit(node.comparators[0])])
+
+    def visit_IfExp(self, node):
+        return self._call(np.where, [self.visit(node.test), self.visit(node.body), self.visit(node.orelse)])
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise KpiExpressionError(f"Unknown function; available: {', '.join(FUNCTIONS)}")
+        if node.keywords:
+            raise KpiExpressionError(f"{node.func.id}() takes no keyword arguments")
+        low, high = FUNCTION_ARITY[node.func.id]
+        if len(node.args) < low or (high is not None and len(node.args) > high):
+            expected = low if low == high else f"at least {low}"
+            raise KpiExpressionError(f"{node.func.id}() takes {expected} arguments, got {len(node.args)}")
+        return self._call(FUNCTIONS[node.func.id], [self.visit(arg) for arg in node.args])
+
+
+class KpiExpression:
+    """An expression compiled once and evaluated on whole columns of field values."""
+
+    def __init__(self, text):
+        """
+        Args:
+        text (str): Arithmetic over result fields, e.g. `attachcomplete_count / attachrequest_count * 100`
+
+        Raises:
+        KpiExpressionError: The expression is empty, too long, or uses syntax outside the allowed set
+        """
+        self.text = text
+        if not text or not text.strip():
+            raise KpiExpressionError("Expression is empty")
+        if len(text) > MAX_EXPRESSION_LENGTH:
+            raise KpiExpressionError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+        try:
+            tree = ast.parse(text.strip(), mode='eval')
+        except SyntaxError as e:
+            raise KpiExpressionError(f"Invalid expression: {e.msg}")
+        compiler = _Compiler()
+        tree = ast.fix_missing_locations(compiler.visit(tree))
+        self.fields = compiler.fields
+        self.namespace = {"__builtins__": {}, **compiler.namespace}
+        self.code = compile(tree, "<kpi>", "eval")
+
+    def evaluate(self, columns, size):
+        """
+        Args:
+        columns (dict): (section, field) -> float64 array of length size, NaN where missing
+        size (int): Number of rows
+
+        Returns:
+        np.ndarray: float64 values; NaN where a value is missing or not finite
+        """
+        namespace = dict(self.namespace)
+        for i, field in enumerate(self.fields):
+            namespace[f"_f{i}"] = columns[field]
+        with np.errstate(all='ignore'):
+            values = np.broadcast_to(np.asarray(eval(self.code, namespace), dtype=np.float64), (size,))
+        return np.where(np.isfinite(values), values, np.nan)
+
+
+def _to_column(values):
+    # float64 column and a mask of the values that are present but not numbers
+    column = np.full(len(values), np.nan)
+    invalid = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        try:
+            column[i] = float(value)
+        except (ValueError, TypeError):
+            invalid[i] = True
+    return column, invalid
+
+
+class KpiProgram:
+    """
+    The KPI expressions of one criteria set, compiled once.
+
+    evaluate() reads each referenced field once across a batch of files and
+    runs every expression over the whole batch.
+    """
+
+    def __init__(self, kpi_names, definitions=None):
+        """
+        Args:
+        kpi_names (list): KPI names used by the criteria set
+        definitions (dict): Derived KPI name -> expression, added to BUILTIN_KPIS
+        """
+        expressions = {**BUILTIN_KPIS, **(definitions or {})}
+        self.expressions = {}
+        self.errors = {}
+        for name in dict.fromkeys(kpi_names):
+            if name not in expressions:
+                continue
+            try:
+                self.expressions[name] = KpiExpression(expressions[name])
+            except KpiExpressionError as e:
+                logger.error(f"KPI {name} has an invalid expression {expressions[name]!r}: {str(e)}")
+                self.errors[name] = str(e)
+        self.fields = list(dict.fromkeys(field for expression in self.expressions.values() for field in expression.fields))
+
+    def evaluate(self, records):
+        """
+        Args:
+        records (list): Per file, the parsed results by section name (a dict per section)
+
+        Returns:
+        dict: KPI name -> (float64 values, error mask, raw values), one entry per file;
+        an error marks a file where a referenced field is not a number, or the expression
+        is invalid, and raw values holds the first such field's value (None otherwise)
+        """
+        raw = {}
+        columns = {}
+        invalid = {}
+        for section, key in self.fields:
+            raw[(section, key)] = [(record.get(section) or {}).get(key) for record in records]
+            columns[(section, key)], invalid[(section, key)] = _to_column(raw[(section, key)])
+        size = len(records)
+        values = {}
+        for name, expression in self.expressions.items():
+            errors = np.zeros(size, dtype=bool)
+            offending = [None] * size
+            for field in expression.fields:
+                for i in np.flatnonzero(invalid[field] & ~errors):
+                    offending[i] = raw[field][i]
+                errors |= invalid[field]
+            values[name] = (expression.evaluate(columns, size), errors, offending)
+        for name in self.errors:
+            values[name] = (np.full(size, np.nan), np.ones(size, dtype=bool), [None] * size)
+        return values
@@ -0,0 +1,391 @@
+import argparse
+import asyncio
+import csv
+import io
+import ipaddress
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+# One log line per request would swamp the output and slow the client
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+LATENCY_PERCENTILES = (50, 95, 99)
+DEFAULT_SITES = 5
+DEFAULT_ROWS = 2000
+DEFAULT_TIMEOUT = 120.0
+SERVER_START_TIMEOUT = 30.0
+
+SYNTHETIC_MARKET = "LOADTEST"
+SYNTHETIC_CRITERIA = ("loadtest", "v1")
+
+# Bursts of field uploads alongside dashboard polling.
+# Paths may use {site} for a random synthetic site id.
+DEFAULT_SCENARIO = {
+    "duration": 30,
+    "groups": [
+        {
+            "name": "field_uploads",
+            "concurrency": 2,
+            "think_time": 1.0,
+            "requests": [
+                {"name": "process_zip", "method": "POST", "path": "/process_zip/", "upload": True, "weight": 1},
+            ],
+        },
+        {
+            "name": "dashboard",
+            "concurrency": 8,
+            "think_time": 0.2,
+            "requests": [
+                {"name": "test_results", "method": "GET", "path": "/test_results", "weight": 3},
+                {"name": "sites", "method": "GET", "path": "/sites", "weight": 2},
+                {"name": "timeseries", "method": "GET", "path": "/api/timeseries/{site}", "weight": 3},
+                {"name": "timeseries_binary", "method": "GET", "path": "/api/timeseries/{site}?format=binary", "weight": 1},
+            ],
+        },
+    ],
+}
+
+NR_RF_HEADERS = [
+    "Date", "Time", "Latitude", "Longitude", "Call Event", "NR_PCell_Band",
+    "NR_PCell_PCI", "NR_PCell_NR_ARFCN", "NR_PCell_SS-RSRP", "NR_PCell_SS-SINR", "NR_PCell_WB CQI",
+    "NR_PCell_RI", "NR_PCell_DL MCS(Avg)", "NR_PCell_DL Num Layers",
+    "NR_PCell_DL Num RBs", "NR_Total_PDSCH Tput(Mbps)",
+    "NR_Total_PUSCH Tput(Mbps)", "NR_PCell_UL MCS(Avg)",
+    "NR_PCell_DL Modulation", "NR_PCell_UL Modulation", "NR_PCell_PDSCH Tput(Mbps)"
+]
+
+
+def synthetic_nrrf_csv(rows, rng):
+    """An NR_RF log of `rows` samples at 2 Hz with one DL, UL and Ookla test."""
+    # Call events at fixed fractions of the log: DL test, UL test, then Ookla
+    marks = [0.05, 0.25, 0.35, 0.55, 0.65, 0.75, 0.9]
+    labels = [
+        "Iperf - UDP DL Start", "Iperf - UDP DL Success;Iperf - Complete",
+        "Iperf - UDP UL Start", "Iperf - UDP UL Success;Iperf - Complete",
+        "Speedtest - Session Start", "Speedtest - Test Success", "Speedtest - Complete",
+    ]
+    events = {int(rows * mark): label for mark, label in zip(marks, labels)}
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(NR_RF_HEADERS)
+    start = 10 * 3600
+    for i in range(rows):
+        seconds = start + i * 0.5
+        writer.writerow([
+            "10/19/2026",
+            f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:06.3f}",
+            f"{40 + i * 1e-5:.6f}", f"{-74 - i * 1e-5:.6f}",
+            events.get(i, ""), "n41",
+            rng.choice(["101", "101", "202"]), "520110",
+            f"{-80 - rng.random() * 20:.1f}", f"{rng.random() * 30:.1f}",
+            str(rng.randint(5, 15)), "2", f"{rng.random() * 27:.1f}", "4", "200",
+            f"{rng.random() * 900:.2f}", f"{rng.random() * 100:.2f}", "20",
+            rng.choice(["QPSK", "64QAM", "256QAM"]), "64QAM", f"{rng.random() * 800:.2f}",
+        ])
+    return out.getvalue()
+
+
+def synthetic_summary_csv(rng):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Time", "NAS", "Max", "Min", "Avg", "Total", "Success", "Error"])
+    writer.writerow(["1", "RegRequest5G", "", "", "", "", "", ""])
+    writer.writerow(["2", "RegComplete5G", "", "", "", "", "", ""])
+    attempts = rng.randint(8, 12)
+    errors = rng.randint(0, 2)
+    writer.writerow(["3", "", f"{rng.uniform(30, 60):.1f}", f"{rng.uniform(5, 15):.1f}",
+                     f"{rng.uniform(15, 30):.1f}", attempts, attempts - errors, errors])
+    return out.getvalue()
+
+
+def synthetic_zip(site_id, rows=DEFAULT_ROWS, seed=0):
+    """
+    Build a ZIP upload in memory with the same layout as a drive-test export.
+
+    Returns:
+    bytes: ZIP archive with an NR_RF CSV, a Summary CSV and a screenshot
+    """
+    rng = random.Random(f"{site_id}-{seed}")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f"DriveTest_{site_id}_NR_RF.csv", synthetic_nrrf_csv(rows, rng))
+        archive.writestr(f"DriveTest_{site_id}_Summary.csv", synthetic_summary_csv(rng))
+        archive.writestr(f"DriveTest_{site_id}_screen.png", rng.randbytes(2048))
+    return buffer.getvalue()
+
+
+class RouteStats:
+    """Latencies and outcomes of the requests to one route."""
+
+    def __init__(self):
+        self.latencies = []
+        self.status_codes = Counter()
+        self.errors = 0
+
+    def record(self, latency, status_code=None, error=None):
+        self.latencies.append(latency)
+        self.status_codes[str(status_code) if status_code is not None else type(error).__name__] += 1
+        if error is not None or status_code >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        count = len(self.latencies)
+        latencies_ms = np.asarray(self.latencies) * 1000
+        result = {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "throughput_rps": count / elapsed if elapsed else 0.0,
+            "status_codes": dict(self.status_codes),
+            "latency_ms": {},
+        }
+        if count:
+            for p in LATENCY_PERCENTILES:
+                result["latency_ms"][f"p{p}"] = round(float(np.percentile(latencies_ms, p)), 2)
+            result["latency_ms"]["mean"] = round(float(latencies_ms.mean()), 2)
+            result["latency_ms"]["max"] = round(float(latencies_ms.max()), 2)
+        return result
+
+
+class LoadTest:
+    """
+    Runs a scenario against a running instance of the app.
+
+    Each group of the scenario runs `concurrency` virtual users for the test
+    duration. Each user repeatedly picks a request from the group's weighted
+    mix, sends it, then waits `think_time` seconds.
+    """
+
+    def __init__(self, base_url, scenario, sites=DEFAULT_SITES, rows=DEFAULT_ROWS, timeout=DEFAULT_TIMEOUT, seed=0):
+        self.base_url = base_url.rstrip("/")
+        self.scenario = scenario
+        self.site_ids = [f"9{i:03d}-1" for i in range(sites)]
+        self.payloads = {site_id: synthetic_zip(site_id, rows, seed) for site_id in self.site_ids}
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stats = defaultdict(RouteStats)
+
+    async def setup(self, client):
+        """Register the synthetic sites and criteria and ingest one upload per site, outside the measurement."""
+        sites = io.StringIO()
+        writer = csv.writer(sites)
+        writer.writerow(["siteid_sectorid", "market", "site_name", "latitude", "longitude", "criteria", "criteria_value"])
+        for site_id in self.site_ids:
+            writer.writerow([site_id, SYNTHETIC_MARKET, f"Load test {site_id}", 40.0, -74.0, *SYNTHETIC_CRITERIA])
+        response = await client.post("/sites/upload", files={"file": ("loadtest_sites.csv", sites.getvalue(), "text/csv")})
+        response.raise_for_status()
+
+        criteria = io.StringIO()
+        writer = csv.writer(criteria)
+        writer.writerow(["type", "value", "kpi_name", "pass_condition", "pass_value",
+                         "conditional_pass_condition", "conditional_pass_value", "unit"])
+        writer.writerow([*SYNTHETIC_CRITERIA, "PDSCH_Peak", ">=", 500, ">=", 300, "Mbps"])
+        writer.writerow([*SYNTHETIC_CRITERIA, "PUSCH_Peak", ">=", 50, ">=", 30, "Mbps"])
+        response = await client.post("/criteria/upload", files={"file": ("loadtest_criteria.csv", criteria.getvalue(), "text/csv")})
+        response.raise_for_status()
+
+        for site_id in self.site_ids:
+            response = await client.post("/process_zip/", files=self._upload_files(site_id))
+            response.raise_for_status()
+        logger.info(f"Setup done: {len(self.site_ids)} synthetic sites ingested")
+
+    async def cleanup(self, client):
+        """Delete the synthetic test results, sites and criteria written by setup and the uploads."""
+        results = 0
+        for site_id in self.site_ids:
+            # Every upload stored a result, and each DELETE removes one
+            while (await client.delete(f"/test_results/{site_id}")).status_code == 200:
+                results += 1
+            while (await client.delete(f"/site/{site_id}")).status_code == 200:
+                pass
+        response = await client.get("/criteria")
+        response.raise_for_status()
+        for criterion in response.json():
+            if (criterion["type"], criterion["value"]) == SYNTHETIC_CRITERIA:
+                await client.delete(f"/criteria/{criterion['id']}")
+        logger.info(f"Cleanup done: removed {results} test results of {len(self.site_ids)} synthetic sites")
+
+    def _upload_files(self, site_id):
+        return [("files", (f"DriveTest_{site_id}.zip", self.payloads[site_id], "application/zip"))]
+
+    async def _send(self, client, spec):
+        site_id = self.rng.choice(self.site_ids)
+        path = spec["path"].replace("{site}", site_id)
+        kwargs = {"files": self._upload_files(site_id)} if spec.get("upload") else {}
+        started = time.perf_counter()
+        try:
+            response = await client.request(spec.get("method", "GET"), path, **kwargs)
+            await response.aread()
+            self.stats[spec["name"]].record(time.perf_counter() - started, response.status_code)
+        except httpx.HTTPError as e:
+            self.stats[spec["name"]].record(time.perf_counter() - started, error=e)
+
+    async def _user(self, client, group, deadline):
+        requests = group["requests"]
+        weights = [spec.get("weight", 1) for spec in requests]
+        think_time = group.get("think_time", 0)
+        while time.monotonic() < deadline:
+            await self._send(client, self.rng.choices(requests, weights)[0])
+            if think_time:
+                await asyncio.sleep(self.rng.uniform(0, 2 * think_time))
+
+    async def run(self, skip_setup=False, cleanup=False):
+        limits = httpx.Limits(max_connections=sum(group["concurrency"] for group in self.scenario["groups"]) + 1)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            if not skip_setup:
+                await self.setup(client)
+            duration = self.scenario["duration"]
+            logger.info(f"Running for {duration}s against {self.base_url}")
+            started = time.monotonic()
+            deadline = started + duration
+            await asyncio.gather(*(
+                self._user(client, group, deadline)
+                for group in self.scenario["groups"]
+                for _ in range(group["concurrency"])
+            ))
+            # Requests in flight at the deadline are still counted, so measure the real span
+            elapsed = time.monotonic() - started
+            if cleanup:
+                await self.cleanup(client)
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        total = RouteStats()
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            total.status_codes.update(stats.status_codes)
+            total.errors += stats.errors
+        return {
+            "base_url": self.base_url,
+            "elapsed_seconds": round(elapsed, 3),
+            "scenario": self.scenario,
+            "total": total.summary(elapsed),
+            "routes": {name: stats.summary(elapsed) for name, stats in sorted(self.stats.items())},
+        }
+
+
+def is_local_url(base_url):
+    """Whether a base URL points at this machine."""
+    host = urlsplit(base_url).hostname or ""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(workers=1, port=None):
+    """
+    Start uvicorn on the app in a throwaway working directory, so the test
+    database, artifact store, upload sessions and static build do not touch real data.
+    The caller removes the working directory once the process has exited.
+
+    Returns:
+    tuple: (process, base URL, working directory)
+    """
+    port = port or _free_port()
+    work_dir = tempfile.mkdtemp(prefix="loadtest_")
+    env = dict(
+        os.environ,
+        ARTIFACT_STORE_DIR=os.path.join(work_dir, "artifacts"),
+        UPLOAD_SESSION_DIR=os.path.join(work_dir, "upload_sessions"),
+        STATIC_BUILD_DIR=os.path.join(work_dir, ".static_build"),
+    )
+    app_dir = os.path.dirname(os.path.realpath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", app_dir,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=work_dir, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            httpx.get(f"{base_url}/openapi.json", timeout=1.0)
+            logger.info(f"Started uvicorn with {workers} worker(s) at {base_url} in {work_dir}")
+            return process, base_url, work_dir
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    process.wait()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    raise RuntimeError("uvicorn did not start in time")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a load test scenario against the app and report per-route latency.")
+    parser.add_argument("--base-url", help="URL of a running instance; without it a local uvicorn is started")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the local instance")
+    parser.add_argument("--scenario", help="JSON scenario file (duration and groups of weighted requests)")
+    parser.add_argument("--duration", type=float, help="Override the scenario duration in seconds")
+    parser.add_argument("--sites", type=int, default=DEFAULT_SITES, help="Number of synthetic sites")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Rows per synthetic NR_RF log")
+    parser.add_argument("--skip-setup", action="store_true", help="Do not register and ingest the synthetic sites first")
+    parser.add_argument("--allow-remote-setup", action="store_true",
+                        help="Allow setup to write synthetic sites, criteria and results into a --base-url that is not local")
+    parser.add_argument("--keep-data", action="store_true",
+                        help="Keep the synthetic data in a --base-url instance instead of deleting it after the run")
+    parser.add_argument("--output", help="Write the JSON summary to this file instead of stdout")
+    args = parser.parse_args()
+
+    scenario = DEFAULT_SCENARIO
+    if args.scenario:
+        with open(args.scenario, "r") as f:
+            scenario = json.load(f)
+    if args.duration:
+        scenario = dict(scenario, duration=args.duration)
+
+    if args.base_url and not args.skip_setup and not is_local_url(args.base_url) and not args.allow_remote_setup:
+        logger.error(f"Setup writes synthetic data into {args.base_url}; pass --allow-remote-setup or --skip-setup")
+        sys.exit(1)
+
+    process = work_dir = None
+    base_url = args.base_url
+    if base_url is None:
+        process, base_url, work_dir = start_local_server(args.workers)
+    try:
+        load_test = LoadTest(base_url, scenario, sites=args.sites, rows=args.rows)
+        # A local server runs in a throwaway directory; a given instance is cleaned up after the run
+        cleanup = args.base_url is not None and not args.skip_setup and not args.keep_data
+        summary = asyncio.run(load_test.run(skip_setup=args.skip_setup, cleanup=cleanup))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        logger.info(f"Summary written to {args.output}")
+    else:
+        print(output)
@@ -1,3 +1,5 @@
+import gzip
+import hashlib
 import logging
 import os
 import shutil
@@ -5,40 +7,92 @@ import tempfile
 import csv
 import io
 import json
+import math
+import asyncio
 import traceback
 import re
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
 from typing import List, Optional, Dict, Union
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, Depends
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request, Depends, BackgroundTasks, Header
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, Response, FileResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, UniqueConstraint, JSON
+from starlette.background import BackgroundTask
+from sqlalchemy import create_engine, event, func, insert, Column, Integer, String, DateTime, Float, Index, UniqueConstraint, JSON
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 from sqlalchemy.exc import IntegrityError
 
+import numpy as np
 import pandas as pd
 
-from unzip import unzip_cellular_data
+from unzip import unzip_cellular_data, MAX_ARCHIVE_UNCOMPRESSED_BYTES, MAX_COMPRESSION_RATIO, MAX_ARCHIVE_MEMBERS
 from summary import process_summary_csv
-from nrrf4 import process_csv as process_nrrf_csv
+from nrrf4 import process_csv as process_nrrf_csv, preview_csv as preview_nrrf_csv, FAILURE_MARKERS
+from artifacts import ArtifactStore
+from timeseries import (
+    BINARY_MEDIA_TYPE, DATETIME_FORMAT, find_timestamp_column, load_kpi_series, resample_to_grid, select_kpi_columns,
+    iter_timeseries_stream, encode_timeseries_binary, trace_points, format_time_range
+)
+from timeindex import ensure_time_index, load_time_index, parse_timestamps, to_epoch_ms
+from dbwriter import WriteQueue
+from cache import VersionedCache
+from admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, rejection_response
+from export import iter_csv_export, write_xlsx_export
+from static_assets import StaticAssets, etag_matches, negotiate_encoding, variant_etag
+from tiles import CoverageBins, KPI_COLUMNS, MAX_TILE_ZOOM, cell_bounds, tile_source
+from uploads import ChunkedUploads, UploadError
+from kpis import BUILTIN_KPIS, KpiExpression, KpiExpressionError, KpiProgram
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.to_thread(write_queue.run, backfill_cell_kpi_rollups)
+    upload_gc = asyncio.create_task(collect_abandoned_uploads())
+    try:
+        yield
+    finally:
+        upload_gc.cancel()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Cellular Data Processing API",
     description="API for processing and managing cellular network test data",
     version="1.0.0",
     docs_url=None,  # Disable the default docs
     redoc_url=None,  # Disable the default redoc
+    openapi_url=None,  # Served by the cached /openapi.json route below
 )
 
+# Admission control for uploads: limits are per worker process.
+# Added before CORS so rejections still carry CORS headers.
+ingest_admission = AdmissionController(
+    max_concurrent=int(os.environ.get("MAX_CONCURRENT_INGESTS", "2")),
+    max_queued=int(os.environ.get("MAX_QUEUED_INGESTS", "16")),
+    max_inflight_bytes=int(os.environ.get("MAX_INFLIGHT_UPLOAD_BYTES", str(2 * 1024 ** 3))),
+    max_request_bytes=int(os.environ.get("MAX_UPLOAD_REQUEST_BYTES", str(1024 ** 3))),
+    queue_timeout=float(os.environ.get("INGEST_QUEUE_TIMEOUT", "60")),
+)
+app.add_middleware(AdmissionMiddleware, controller=ingest_admission, paths={"/process_zip/"})
+
+# Per-archive extraction limits against malformed or zip-bomb uploads
+ZIP_LIMITS = {
+    "max_archive_bytes": int(os.environ.get("MAX_ARCHIVE_UNCOMPRESSED_BYTES", str(MAX_ARCHIVE_UNCOMPRESSED_BYTES))),
+    "max_compression_ratio": float(os.environ.get("MAX_COMPRESSION_RATIO", str(MAX_COMPRESSION_RATIO))),
+    "max_archive_members": int(os.environ.get("MAX_ARCHIVE_MEMBERS", str(MAX_ARCHIVE_MEMBERS))),
+}
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -51,16 +105,61 @@ app.add_middleware(
 # Setup for static files and templates
 current_dir = os.path.dirname(os.path.realpath(__file__))
 static_dir = os.path.join(current_dir, "static")
+# Fingerprinted, precompressed copies of the static files are built here at startup
+STATIC_BUILD_DIR = os.environ.get("STATIC_BUILD_DIR", os.path.join(current_dir, ".static_build"))
+static_assets = None
 if os.path.exists(static_dir):
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
+    static_assets = StaticAssets(static_dir, STATIC_BUILD_DIR)
+    app.mount("/static", static_assets, name="static")
 templates_dir = os.path.join(current_dir, "templates")
 templates = Jinja2Templates(directory=templates_dir)
 
-FINAL_FOLDER = r"D:\tws\final"
+def static_url(name):
+    return static_assets.url(name) if static_assets else f"/static/{name}"
+
+templates.env.globals["static_url"] = static_url
+
+ARTIFACT_STORE_DIR = os.environ.get("ARTIFACT_STORE_DIR", os.path.join(current_dir, "artifacts"))
+artifact_store = ArtifactStore(ARTIFACT_STORE_DIR)
+
+# Resumable chunked uploads; sessions idle for UPLOAD_SESSION_TTL seconds are removed,
+# checked when the app starts, on every new upload and every UPLOAD_GC_INTERVAL seconds
+UPLOAD_SESSION_DIR = os.environ.get("UPLOAD_SESSION_DIR", os.path.join(current_dir, "upload_sessions"))
+UPLOAD_GC_INTERVAL = float(os.environ.get("UPLOAD_GC_INTERVAL", "3600"))
+chunked_uploads = ChunkedUploads(
+    UPLOAD_SESSION_DIR,
+    max_size=ingest_admission.max_request_bytes,
+    session_ttl=float(os.environ.get("UPLOAD_SESSION_TTL", str(24 * 3600))),
+)
+
+async def collect_abandoned_uploads():
+    while True:
+        try:
+            await asyncio.to_thread(chunked_uploads.collect_garbage)
+        except Exception as e:
+            logger.error(f"Error collecting abandoned uploads: {str(e)}")
+        await asyncio.sleep(UPLOAD_GC_INTERVAL)
 
 # Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLITE_DATABASE_PATH = "./test.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{SQLITE_DATABASE_PATH}"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+
+@event.listens_for(engine, "connect")
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    # WAL lets every worker keep reading while the single writer commits
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+    # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs work with pysqlite
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def begin_sqlite_transaction(conn):
+    conn.exec_driver_sql("BEGIN")
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -104,6 +203,122 @@ class Criteria(Base):
 
     UniqueConstraint('type', 'value', 'kpi_name', name='uix_1')
 
+class Artifact(Base):
+    __tablename__ = "artifacts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    numeric_id = Column(String, index=True)
+    upload = Column(String, index=True)
+    kind = Column(String)
+    name = Column(String)
+    sha256 = Column(String, index=True)
+    path = Column(String)
+    size = Column(Integer)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint('upload', 'kind', 'name', name='uix_artifact'),)
+
+class MarketRollup(Base):
+    __tablename__ = "market_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    market = Column(String, unique=True, index=True)
+    test_count = Column(Integer, default=0)
+
+class MarketKpiRollup(Base):
+    __tablename__ = "market_kpi_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    market = Column(String, index=True)
+    kpi_name = Column(String)
+    status = Column(String)
+    count = Column(Integer, default=0)
+    result_count = Column(Integer, default=0)
+    result_sum = Column(Float, default=0.0)
+
+    __table_args__ = (UniqueConstraint('market', 'kpi_name', 'status', name='uix_market_kpi'),)
+
+class CellRollup(Base):
+    __tablename__ = "cell_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pci = Column(String, index=True)
+    arfcn = Column(String, index=True)
+    test = Column(String)
+    test_count = Column(Integer, default=0)
+    success_count = Column(Integer, default=0)
+
+    __table_args__ = (UniqueConstraint('pci', 'arfcn', 'test', name='uix_cell_test'),)
+
+class CellKpiRollup(Base):
+    """Sum and number of the present values of one KPI per (PCI, ARFCN, test type)."""
+    __tablename__ = "cell_kpi_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pci = Column(String, index=True)
+    arfcn = Column(String, index=True)
+    test = Column(String)
+    kpi = Column(String)
+    sample_count = Column(Integer, default=0)
+    total = Column(Float, default=0.0)
+
+    __table_args__ = (UniqueConstraint('pci', 'arfcn', 'test', 'kpi', name='uix_cell_test_kpi'),)
+
+class RolledUpResult(Base):
+    __tablename__ = "rolled_up_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, unique=True, index=True)
+    market = Column(String)
+
+class CallEvent(Base):
+    __tablename__ = "call_events"
+    __table_args__ = (
+        Index('ix_call_events_event_timestamp', 'event', 'timestamp'),
+        Index('ix_call_events_category_timestamp', 'category', 'timestamp'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, index=True)
+    event_index = Column(Integer)
+    timestamp = Column(DateTime)
+    event = Column(String)
+    category = Column(String)
+    session = Column(String)
+
+class CoverageCell(Base):
+    __tablename__ = "coverage_cells"
+    __table_args__ = (
+        Index('ix_coverage_cells_tile', 'kpi', 'zoom', 'tile_x', 'tile_y'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String, index=True)
+    kpi = Column(String)
+    zoom = Column(Integer)
+    tile_x = Column(Integer)
+    tile_y = Column(Integer)
+    cell_x = Column(Integer)
+    cell_y = Column(Integer)
+    count = Column(Integer)
+    total = Column(Float)
+    minimum = Column(Float)
+    maximum = Column(Float)
+
+class DerivedKpi(Base):
+    """KPI computed from parsed result fields, by name as referenced in criteria."""
+    __tablename__ = "derived_kpis"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)
+    expression = Column(String)
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
 Base.metadata.create_all(bind=engine)
 
 # Pydantic models
@@ -150,10 +365,23 @@ class CriteriaUpdate(BaseModel):
 class CriteriaResponse(CriteriaCreate):
     id: int
 
+class DerivedKpiUpdate(BaseModel):
+    expression: str
+
+class UploadCreate(BaseModel):
+    filename: str
+    size: int
+    chunk_size: Optional[int] = None
+
 class TimeSeriesData(BaseModel):
     data: List[Dict]
     time_range: Dict[str, str]
 
+class TimeSeriesComparison(BaseModel):
+    kpi: str
+    grid: List[float]
+    series: List[Dict]
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -162,6 +390,76 @@ def get_db():
     finally:
         db.close()
 
+# Write coordination and caches shared across workers
+# All workers funnel their writes through one writer; the lock file next to the
+# database serializes the writers of different processes (and the folder watcher).
+write_queue = WriteQueue(SessionLocal, f"{SQLITE_DATABASE_PATH}.writer.lock")
+
+CACHE_POLL_SECONDS = float(os.environ.get("CACHE_POLL_SECONDS", "1.0"))
+TIME_INDEX_CACHE_SIZE = 16
+
+def read_cache_version(name):
+    db = SessionLocal()
+    try:
+        row = db.query(CacheVersion.version).filter(CacheVersion.name == name).first()
+        return row[0] if row else 0
+    finally:
+        db.close()
+
+site_cache = VersionedCache("sites", read_cache_version, CACHE_POLL_SECONDS)
+criteria_cache = VersionedCache("criteria", read_cache_version, CACHE_POLL_SECONDS)
+artifact_cache = VersionedCache("artifacts", read_cache_version, CACHE_POLL_SECONDS)
+caches = {cache.name: cache for cache in (site_cache, criteria_cache, artifact_cache)}
+
+def bump_cache_version(db: Session, name):
+    """
+    Mark a cache stale in every worker. Call it from the write job that changes the cached data.
+
+    This worker's cache is cleared once the job's transaction has committed, so it
+    never reloads the rows that are about to change.
+    """
+    updated = db.query(CacheVersion).filter(CacheVersion.name == name).update(
+        {CacheVersion.version: CacheVersion.version + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.add(CacheVersion(name=name, version=1))
+        db.flush()
+    WriteQueue.after_commit(db, caches[name].invalidate)
+
+def snapshot(instance):
+    """Copy a row's column values into a plain object that is safe to share across sessions and threads."""
+    if instance is None:
+        return None
+    return SimpleNamespace(**{column.name: getattr(instance, column.name) for column in instance.__table__.columns})
+
+def cached_site(db: Session, siteid_sectorid):
+    return site_cache.get(siteid_sectorid, lambda: snapshot(
+        db.query(Site).filter(Site.siteid_sectorid == siteid_sectorid).first()
+    ))
+
+def cached_criteria(db: Session, criteria_type, criteria_value):
+    return criteria_cache.get((criteria_type, criteria_value), lambda: [
+        snapshot(criterion) for criterion in db.query(Criteria).filter(
+            Criteria.type == criteria_type,
+            Criteria.value == criteria_value
+        ).all()
+    ])
+
+def load_derived_kpis(db: Session):
+    return {name: expression for name, expression in db.query(DerivedKpi.name, DerivedKpi.expression)}
+
+def cached_kpi_program(db: Session, criteria_type, criteria_value):
+    # Derived KPI changes bump the criteria version too, so programs never outlive a definition
+    return criteria_cache.get(("kpi_program", criteria_type, criteria_value), lambda: KpiProgram(
+        [criterion.kpi_name for criterion in cached_criteria(db, criteria_type, criteria_value)],
+        criteria_cache.get("derived_kpis", lambda: load_derived_kpis(db))
+    ))
+
+@lru_cache(maxsize=TIME_INDEX_CACHE_SIZE)
+def cached_time_index(csv_path):
+    # Artifacts are content-addressed, so the index under a path never changes
+    return load_time_index(csv_path)
+
 # Utility functions
 def ensure_dir(directory):
     if not os.path.exists(directory):
@@ -183,173 +481,782 @@ def get_numeric_id(filename):
         return match.group(1)
     return filename
 
-# Data processing functions
-def append_to_sqlite(data):
+# Result fields folded into the per-cell rollups, per test type
+# Test type -> (result column, cell rollup KPI -> result key); every test also rolls up CELL_RADIO_FIELDS
+CELL_ROLLUP_FIELDS = {
+    'DL_Test': ('dl_test_results', {'peak_tput': 'PDSCH_Peak', 'tput': 'Avg_NR_Total_PDSCH Tput(Mbps)'}),
+    'UL_Test': ('ul_test_results', {'peak_tput': 'PUSCH_Peak', 'tput': 'Avg_NR_Total_PUSCH Tput(Mbps)'}),
+    'Ookla_Test': ('ookla_test_results', {'peak_tput': 'Ookla_DL(Mbps)_Peak', 'ul_peak_tput': 'Ookla_UL(Mbps)_Peak'}),
+}
+CELL_RADIO_FIELDS = {'rsrp': 'Avg_NR_PCell_SS-RSRP', 'sinr': 'Avg_NR_PCell_SS-SINR'}
+
+def to_float(value, default=0.0):
     try:
-        db = SessionLocal()
-        timestamp = datetime.now()
-        for filename, file_results in data['results'].items():
-            existing_result = db.query(TestResult).filter(TestResult.filename == filename).first()
-            
-            if existing_result:
-                new_result = existing_result
-            else:
-                new_result = TestResult(filename=filename)
-            
-            new_result.timestamp = timestamp
-            new_result.summary_results = file_results.get('summary_results', {}).get(filename, {})
-            
-            nrrf_results = file_results.get('nrrf_results', {}).get(filename, {})
-            new_result.dl_test_results = nrrf_results.get('DL_Test', {})
-            new_result.ul_test_results = nrrf_results.get('UL_Test', {})
-            new_result.ookla_test_results = nrrf_results.get('Ookla_Test', {})
-            new_result.evaluation_results = nrrf_results.get('evaluation', [])
-            
-            if not existing_result:
-                db.add(new_result)
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def dominant_value(distribution, fallback=""):
+    # Distribution strings are "key: pct%; ..." ordered by most common first
+    if distribution:
+        return distribution.split(";")[0].rsplit(":", 1)[0].strip()
+    return fallback or ""
+
+def get_or_create(db: Session, model, **keys):
+    instance = db.query(model).filter_by(**keys).first()
+    if instance is None:
+        instance = model(**keys)
+        db.add(instance)
+        db.flush()
+    return instance
+
+def apply_rollups(db: Session, result: TestResult, market: Optional[str], sign: int):
+    """Add (sign=1) or remove (sign=-1) one test result's contribution to the rollup tables."""
+    if market:
+        market_rollup = get_or_create(db, MarketRollup, market=market)
+        market_rollup.test_count = (market_rollup.test_count or 0) + sign
+
+        for item in result.evaluation_results or []:
+            if 'kpi_name' not in item:
+                continue
+            rollup = get_or_create(db, MarketKpiRollup, market=market, kpi_name=item['kpi_name'], status=item.get('status'))
+            rollup.count = (rollup.count or 0) + sign
+            if isinstance(item.get('result'), (int, float)):
+                rollup.result_count = (rollup.result_count or 0) + sign
+                rollup.result_sum = (rollup.result_sum or 0.0) + sign * item['result']
+
+    for test, pci, arfcn, data in cell_tests(result):
+        rollup = get_or_create(db, CellRollup, pci=pci, arfcn=arfcn, test=test)
+        rollup.test_count = (rollup.test_count or 0) + sign
+        rollup.success_count = (rollup.success_count or 0) + (sign if data['Result'] == 'Success' else 0)
+        apply_cell_kpis(db, test, pci, arfcn, data, sign)
+
+def cell_tests(result: TestResult):
+    """(test, PCI, ARFCN, results) of each test of a result that ran on an identifiable cell."""
+    for test, (column, _) in CELL_ROLLUP_FIELDS.items():
+        data = getattr(result, column) or {}
+        if not data.get('Result'):
+            continue
+        pci = dominant_value(data.get('PCI_Distribution'), data.get('Start_PCI'))
+        arfcn = dominant_value(data.get('ARFCN_Distribution'), data.get('Start_ARFCN'))
+        if pci and arfcn:
+            yield test, pci, arfcn, data
+
+def apply_cell_kpis(db: Session, test, pci, arfcn, data, sign):
+    # Missing or non-numeric values are skipped, so they do not pull the averages toward 0
+    fields = {**CELL_ROLLUP_FIELDS[test][1], **CELL_RADIO_FIELDS}
+    for kpi, key in fields.items():
+        value = to_float(data.get(key), None)
+        if value is None or not math.isfinite(value):
+            continue
+        rollup = get_or_create(db, CellKpiRollup, pci=pci, arfcn=arfcn, test=test, kpi=kpi)
+        rollup.sample_count = (rollup.sample_count or 0) + sign
+        rollup.total = (rollup.total or 0.0) + sign * value
+
+def backfill_cell_kpi_rollups(db: Session):
+    """
+    Write job: fill cell_kpi_rollups from the results rolled up before the table
+    existed, so removing them later keeps the counts consistent. Returns the number of results read.
+    """
+    if db.query(CellKpiRollup.id).first() is not None:
+        return 0
+    count = 0
+    rolled_up = db.query(TestResult).join(RolledUpResult, RolledUpResult.filename == TestResult.filename)
+    for result in rolled_up.yield_per(500):
+        for test, pci, arfcn, data in cell_tests(result):
+            apply_cell_kpis(db, test, pci, arfcn, data, 1)
+        count += 1
+    if count:
+        logger.info(f"Backfilled cell KPI rollups from {count} test results")
+    return count
+
+def remove_from_rollups(db: Session, result: TestResult):
+    rolled_up = db.query(RolledUpResult).filter(RolledUpResult.filename == result.filename).first()
+    if rolled_up:
+        apply_rollups(db, result, rolled_up.market, -1)
+        db.delete(rolled_up)
+        db.flush()
+
+def add_to_rollups(db: Session, result: TestResult):
+    site = db.query(Site).filter(Site.siteid_sectorid == result.filename).first()
+    market = site.market if site else None
+    apply_rollups(db, result, market, 1)
+    db.add(RolledUpResult(filename=result.filename, market=market))
+
+# Data processing functions
+def write_test_results(db: Session, data):
+    """Write job: insert or update the results of an upload and their rollup contributions."""
+    timestamp = datetime.now()
+    for filename, file_results in data['results'].items():
+        existing_result = db.query(TestResult).filter(TestResult.filename == filename).first()
+        
+        if existing_result:
+            new_result = existing_result
+            remove_from_rollups(db, existing_result)
+        else:
+            new_result = TestResult(filename=filename)
+        
+        new_result.timestamp = timestamp
+        new_result.summary_results = file_results.get('summary_results', {}).get(filename, {})
+        
+        nrrf_results = file_results.get('nrrf_results', {}).get(filename, {})
+        new_result.dl_test_results = nrrf_results.get('DL_Test', {})
+        new_result.ul_test_results = nrrf_results.get('UL_Test', {})
+        new_result.ookla_test_results = nrrf_results.get('Ookla_Test', {})
+        new_result.evaluation_results = nrrf_results.get('evaluation', [])
         
-        db.commit()
+        if not existing_result:
+            db.add(new_result)
+
+        add_to_rollups(db, new_result)
+
+def write_upload(db: Session, data, pending_writes=()):
+    """
+    Write job: the artifact index, call events and coverage of the uploads, then
+    their test results, in one transaction, so a failed upload leaves none of them behind.
+
+    Args:
+    data (dict): The uploads' results by numeric id, under "results"
+    pending_writes (list): (write job, args) pairs collected by process_zip_folder
+    """
+    for job, args in pending_writes:
+        job(db, *args)
+    write_test_results(db, data)
+
+def append_to_sqlite(data, pending_writes=()):
+    try:
+        write_queue.run(write_upload, data, pending_writes)
         logger.info("Data successfully appended to SQLite")
         return True
     except IntegrityError as e:
         logger.error(f"IntegrityError while appending to SQLite: {str(e)}")
-        db.rollback()
         return False
     except Exception as e:
         logger.error(f"Error appending to SQLite: {str(e)}")
         logger.error(traceback.format_exc())
-        db.rollback()
         return False
-    finally:
-        db.close()
 
-async def process_zip_file(zip_file: UploadFile, db: Session):
+def upsert_sites(db: Session, rows):
+    """Write job: add or update sites from CSV rows. Returns (added, updated, errors)."""
+    added_count = 0
+    updated_count = 0
+    error_count = 0
+    for row in rows:
+        try:
+            with db.begin_nested():
+                existing_site = db.query(Site).filter(Site.siteid_sectorid == row['siteid_sectorid']).first()
+                if existing_site:
+                    # Update existing site
+                    for key, value in row.items():
+                        setattr(existing_site, key, value)
+                    updated_count += 1
+                    logger.info(f"Updated site: {existing_site.siteid_sectorid}")
+                else:
+                    # Add new site
+                    new_site = Site(**row)
+                    db.add(new_site)
+                    added_count += 1
+                    logger.info(f"Added new site: {new_site.siteid_sectorid}")
+        except Exception as e:
+            logger.error(f"Error processing row: {row}. Error: {str(e)}")
+            error_count += 1
+    bump_cache_version(db, 'sites')
+    return added_count, updated_count, error_count
+
+def update_site_row(db: Session, siteid_sectorid, fields):
+    """Write job: update one site. Returns a snapshot of the updated site, or None if it does not exist."""
+    db_site = db.query(Site).filter(Site.siteid_sectorid == siteid_sectorid).first()
+    if db_site is None:
+        return None
+    for key, value in fields.items():
+        setattr(db_site, key, value)
+    db.flush()
+    bump_cache_version(db, 'sites')
+    return snapshot(db_site)
+
+def delete_site_row(db: Session, siteid_sectorid):
+    """Write job: delete one site. Returns False if it does not exist."""
+    db_site = db.query(Site).filter(Site.siteid_sectorid == siteid_sectorid).first()
+    if db_site is None:
+        return False
+    db.delete(db_site)
+    bump_cache_version(db, 'sites')
+    return True
+
+def upsert_criteria(db: Session, rows):
+    """Write job: add or update criteria from CSV rows. Returns (added, updated, errors, changed criteria sets)."""
+    added_count = 0
+    updated_count = 0
+    error_count = 0
+    changed_sets = set()
+    for row in rows:
+        try:
+            with db.begin_nested():
+                existing_criteria = db.query(Criteria).filter(
+                    Criteria.type == row['type'],
+                    Criteria.value == row['value'],
+                    Criteria.kpi_name == row['kpi_name']
+                ).first()
+                if existing_criteria:
+                    # Update existing criteria
+                    for key, value in row.items():
+                        setattr(existing_criteria, key, value)
+                    updated_count += 1
+                    logger.info(f"Updated criteria: {existing_criteria.type} - {existing_criteria.kpi_name}")
+                else:
+                    # Add new criteria
+                    new_criteria = Criteria(**row)
+                    db.add(new_criteria)
+                    added_count += 1
+                    logger.info(f"Added new criteria: {new_criteria.type} - {new_criteria.kpi_name}")
+            changed_sets.add((row['type'], row['value']))
+        except Exception as e:
+            logger.error(f"Error processing row: {row}. Error: {str(e)}")
+            error_count += 1
+    bump_cache_version(db, 'criteria')
+    return added_count, updated_count, error_count, changed_sets
+
+def update_criteria_row(db: Session, criteria_id, fields):
+    """
+    Write job: update one criterion.
+
+    Returns:
+    tuple: (snapshot of the updated criterion, its (type, value) before the update), or None if it does not exist
+    """
+    db_criteria = db.query(Criteria).filter(Criteria.id == criteria_id).first()
+    if db_criteria is None:
+        return None
+    previous_set = (db_criteria.type, db_criteria.value)
+    for key, value in fields.items():
+        setattr(db_criteria, key, value)
+    db.flush()
+    bump_cache_version(db, 'criteria')
+    return snapshot(db_criteria), previous_set
+
+def delete_criteria_row(db: Session, criteria_id):
+    """Write job: delete one criterion. Returns its (type, value), or None if it does not exist."""
+    db_criteria = db.query(Criteria).filter(Criteria.id == criteria_id).first()
+    if db_criteria is None:
+        return None
+    criteria_set = (db_criteria.type, db_criteria.value)
+    db.delete(db_criteria)
+    bump_cache_version(db, 'criteria')
+    return criteria_set
+
+def criteria_sets_using(db: Session, kpi_names):
+    """(type, value) of every criteria set that references one of the KPI names."""
+    return set(db.query(Criteria.type, Criteria.value).filter(Criteria.kpi_name.in_(list(kpi_names))).distinct())
+
+def upsert_derived_kpis(db: Session, definitions):
+    """Write job: add or replace derived KPI definitions. Returns (added, updated, criteria sets using them)."""
+    added_count = 0
+    updated_count = 0
+    for name, expression in definitions.items():
+        existing = db.query(DerivedKpi).filter(DerivedKpi.name == name).first()
+        if existing:
+            existing.expression = expression
+            updated_count += 1
+        else:
+            db.add(DerivedKpi(name=name, expression=expression))
+            added_count += 1
+        logger.info(f"Defined KPI {name} = {expression}")
+    bump_cache_version(db, 'criteria')
+    return added_count, updated_count, criteria_sets_using(db, definitions)
+
+def delete_derived_kpi(db: Session, name):
+    """Write job: remove a derived KPI definition. Returns the criteria sets using it, or None if it did not exist."""
+    existing = db.query(DerivedKpi).filter(DerivedKpi.name == name).first()
+    if existing is None:
+        return None
+    db.delete(existing)
+    bump_cache_version(db, 'criteria')
+    return criteria_sets_using(db, [name])
+
+def delete_test_result_row(db: Session, filename):
+    """Write job: delete a test result and its rollup contribution. Returns False if it does not exist."""
+    result = db.query(TestResult).filter(TestResult.filename == filename).first()
+    if result is None:
+        return False
+    remove_from_rollups(db, result)
+    db.delete(result)
+    db.query(CallEvent).filter(CallEvent.filename == filename).delete(synchronize_session=False)
+    db.query(CoverageCell).filter(CoverageCell.filename == filename).delete(synchronize_session=False)
+    return True
+
+def event_category(event_text):
+    """Classify a call event as 'failure', 'success' or 'info'."""
+    lowered = event_text.lower()
+    if any(marker in lowered for marker in FAILURE_MARKERS):
+        return 'failure'
+    if 'success' in lowered:
+        return 'success'
+    return 'info'
+
+def replace_call_events(db: Session, rows_by_file):
+    """Write job: replace the stored call events of each file."""
+    for filename, rows in rows_by_file.items():
+        db.query(CallEvent).filter(CallEvent.filename == filename).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(CallEvent), rows)
+
+def call_event_rows(events_by_file):
+    """CallEvent rows, one per occurrence, of the call events collected while parsing NR_RF logs, by file."""
+    rows_by_file = {}
+    for filename, events in events_by_file.items():
+        timestamps = [None] * len(events)
+        if events:
+            dates = [date for _, date, _, _, _ in events]
+            epoch_ms = parse_timestamps(dates if any(dates) else None, [time for _, _, time, _, _ in events])
+            if epoch_ms.any():
+                timestamps = pd.to_datetime(epoch_ms, unit='ms').to_pydatetime().tolist()
+        rows_by_file[filename] = [
+            {
+                "filename": filename,
+                "event_index": index,
+                "timestamp": timestamp,
+                "event": event_text,
+                "category": event_category(event_text),
+                "session": session,
+            }
+            for (index, _, _, event_text, session), timestamp in zip(events, timestamps)
+        ]
+    return rows_by_file
+
+def replace_coverage_cells(db: Session, rows_by_file):
+    """Write job: replace the stored coverage cells of each file."""
+    for filename, rows in rows_by_file.items():
+        db.query(CoverageCell).filter(CoverageCell.filename == filename).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(CoverageCell), rows)
+
+def coverage_rows(coverage_by_file):
+    """CoverageCell rows of the per-cell KPI aggregates binned while parsing NR_RF logs, by file."""
+    rows_by_file = {filename: coverage.records(filename) for filename, coverage in coverage_by_file.items()}
+    if rows_by_file:
+        logger.info(f"Binned {sum(len(rows) for rows in rows_by_file.values())} coverage cells for {len(rows_by_file)} files")
+    return rows_by_file
+
+def artifact_kind(filename):
+    name = filename.lower()
+    if 'summary' in name and name.endswith('.csv'):
+        return 'summary'
+    if filename.endswith('_NR_RF.csv'):
+        return 'nr_rf'
+    if name.endswith(('.png', '.jpg', '.jpeg')):
+        return 'screenshot'
+    return None
+
+def index_artifacts(db: Session, entries):
+    """Write job: record stored artifacts by upload, kind and name."""
+    for entry in entries:
+        artifact = db.query(Artifact).filter(
+            Artifact.upload == entry['upload'],
+            Artifact.kind == entry['kind'],
+            Artifact.name == entry['name']
+        ).first()
+        if artifact is None:
+            artifact = Artifact(upload=entry['upload'], kind=entry['kind'], name=entry['name'])
+            db.add(artifact)
+        artifact.numeric_id = entry['numeric_id']
+        artifact.sha256 = entry['sha256']
+        artifact.path = entry['path']
+        artifact.size = entry['size']
+        artifact.timestamp = datetime.now()
+    bump_cache_version(db, 'artifacts')
+
+def store_artifacts(manifest):
+    """Move extracted files into the artifact store. Returns their index entries for index_artifacts."""
+    entries = []
+    for entry in manifest:
+        kind = artifact_kind(entry['name'])
+        if kind is None:
+            continue
+        digest, path, created = artifact_store.put(entry['path'])
+        if kind == 'nr_rf':
+            ensure_time_index(path)
+        name = rename_file(entry['name']) if kind != 'screenshot' else entry['name']
+        entries.append({
+            "upload": entry['archive'],
+            "kind": kind,
+            "name": name,
+            "numeric_id": get_numeric_id(entry['name'] if kind != 'screenshot' else entry['archive']),
+            "sha256": digest,
+            "path": path,
+            "size": entry['size'],
+        })
+        logger.info(f"{'Stored' if created else 'Deduplicated'} {kind} artifact: {entry['name']} as {name}")
+    return entries
+
+def resolve_artifact(db: Session, numeric_id, kind):
+    """Return the most recent artifact of a kind for a numeric id, or None."""
+    return artifact_cache.get((numeric_id, kind), lambda: snapshot(db.query(Artifact).filter(
+        Artifact.numeric_id == numeric_id,
+        Artifact.kind == kind
+    ).order_by(Artifact.timestamp.desc(), Artifact.id.desc()).first()))
+
+def kpi_sections(summary_data, dl_test_data, ul_test_data, ookla_test_data):
+    """Parsed test results of one file by the section names KPI expressions read."""
+    return {"Summary": summary_data, "DL_Test": dl_test_data, "UL_Test": ul_test_data, "Ookla_Test": ookla_test_data}
+
+def evaluate_kpis(criteria_list, program: KpiProgram, records):
+    """
+    Evaluate a batch of files against one criteria set.
+
+    Args:
+    criteria_list (list): Criteria of the set
+    program (KpiProgram): The set's compiled KPI expressions
+    records (list): Per file, the parsed results by section (see kpi_sections)
+
+    Returns:
+    list: Per file, the evaluation results
+    """
+    values = program.evaluate(records)
+    for criterion in criteria_list:
+        if criterion.kpi_name not in values:
+            logger.warning(f"KPI {criterion.kpi_name} not found in data")
+
+    batch_results = []
+    for i in range(len(records)):
+        evaluation_results = []
+        for criterion in criteria_list:
+            result, status = None, "No data"
+            if criterion.kpi_name in values:
+                kpi_values, errors, offending = values[criterion.kpi_name]
+                if errors[i]:
+                    # The value that could not be read as a number, as before expressions
+                    result, status = offending[i], "Error"
+                    logger.error(f"Error converting {result} to float for {criterion.kpi_name}")
+                else:
+                    result = None if np.isnan(kpi_values[i]) else kpi_values[i].item()
+                    status = evaluate_criterion(criterion, result)
+            evaluation_results.append({
+                "kpi_name": criterion.kpi_name,
+                "result": result,
+                "status": status,
+                "pass_value": criterion.pass_value,
+                "conditional_pass_value": criterion.conditional_pass_value,
+                "unit": criterion.unit
+            })
+        batch_results.append(evaluation_results)
+    return batch_results
+
+def evaluate_results(results, db: Session):
+    """Evaluate parsed NR_RF results against the criteria of each file's site, in place, one batch per criteria set."""
+    batches = {}
+    for filename in results['nrrf_results']:
+        site = cached_site(db, filename)
+        if site:
+            logger.debug(f"Found site for filename {filename}: {site.siteid_sectorid}")
+            batches.setdefault((site.criteria, site.criteria_value), []).append(filename)
+        else:
+            logger.warning(f"No site found for {filename}")
+            results['nrrf_results'][filename]['evaluation'] = [{"error": "No site found in database"}]
+
+    for (criteria_type, criteria_value), filenames in batches.items():
+        criteria_list = cached_criteria(db, criteria_type, criteria_value)
+        logger.debug(f"Criteria {criteria_type}={criteria_value} for {filenames}: {[c.kpi_name for c in criteria_list]}")
+        records = []
+        for filename in filenames:
+            file_results = results['nrrf_results'][filename]
+            records.append(kpi_sections(
+                results['summary_results'].get(filename, {}),
+                file_results.get('DL_Test', {}),
+                file_results.get('UL_Test', {}),
+                file_results.get('Ookla_Test', {})
+            ))
+        program = cached_kpi_program(db, criteria_type, criteria_value)
+        for filename, evaluation_results in zip(filenames, evaluate_kpis(criteria_list, program, records)):
+            results['nrrf_results'][filename]['evaluation'] = evaluation_results
+
+def process_zip_folder(folder, db: Session, mode="full", pending_writes=None):
+    """
+    Extract, parse and evaluate every ZIP file in a working folder.
+
+    Nothing is written to the database here. In "full" mode the artifact index,
+    call event and coverage writes are added to pending_writes, for append_to_sqlite
+    to run in the same transaction as the results. In "preview" mode NR_RF logs are
+    sampled with preview_nrrf_csv, and only the results are produced; artifacts,
+    call events and coverage are left to the full run.
+    """
+    manifest = unzip_cellular_data(folder, **ZIP_LIMITS)
+
+    summary_results = {}
+    nrrf_results = {}
+    call_events = {}
+    coverage = {}
+
+    for entry in manifest:
+        file, file_path = entry['name'], entry['path']
+        if 'summary' in file.lower():
+            summary_results[file] = process_summary_csv(file_path)
+        elif 'nr_rf' in file.lower() and mode == "preview":
+            nrrf_results[file] = preview_nrrf_csv(file_path)
+        elif 'nr_rf' in file.lower():
+            events = []
+            bins = CoverageBins()
+            nrrf_results[file] = process_nrrf_csv(file_path, file_path, event_sink=events, coverage=bins)
+            if nrrf_results[file] is not None:
+                call_events[get_numeric_id(file)] = events
+                coverage[get_numeric_id(file)] = bins
+
+    writes = []
+    if mode == "full":
+        artifact_entries = store_artifacts(manifest)
+        if artifact_entries:
+            writes.append((index_artifacts, (artifact_entries,)))
+        if call_events:
+            writes.append((replace_call_events, (call_event_rows(call_events),)))
+        if coverage:
+            writes.append((replace_coverage_cells, (coverage_rows(coverage),)))
+
+    renamed_summary_results = {get_numeric_id(k): v for k, v in summary_results.items()}
+    renamed_nrrf_results = {get_numeric_id(k): v for k, v in nrrf_results.items()}
+
+    results = {
+        "summary_results": renamed_summary_results,
+        "nrrf_results": renamed_nrrf_results
+    }
+
+    evaluate_results(results, db)
+    if writes:
+        pending_writes.extend(writes)
+    return results
+
+def process_zip_path(zip_path, db: Session, mode="full", pending_writes=None):
+    """Run the upload pipeline on a ZIP file that is already on disk."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_path = os.path.join(temp_dir, os.path.basename(zip_path))
+        try:
+            os.link(zip_path, work_path)
+        except OSError:
+            shutil.copyfile(zip_path, work_path)
+        return process_zip_folder(temp_dir, db, mode, pending_writes)
+
+async def process_zip_file(zip_file: UploadFile, db: Session, pending_writes):
     with tempfile.TemporaryDirectory() as temp_dir:
         zip_path = os.path.join(temp_dir, zip_file.filename)
         with open(zip_path, "wb") as buffer:
             shutil.copyfileobj(zip_file.file, buffer)
         
         try:
-            extracted_folder = unzip_cellular_data(temp_dir)
-            
-            summary_results = {}
-            nrrf_results = {}
-            
-            for file in os.listdir(extracted_folder):
-                file_path = os.path.join(extracted_folder, file)
-                if 'summary' in file.lower():
-                    summary_results[file] = process_summary_csv(file_path)
-                elif 'nr_rf' in file.lower():
-                    nrrf_results[file] = process_nrrf_csv(file_path, file_path)
-            
-            ensure_dir(FINAL_FOLDER)
-            
-            for file in os.listdir(extracted_folder):
-                src = os.path.join(extracted_folder, file)
-                if 'summary' in file.lower() or file.endswith('_NR_RF.csv'):
-                    new_name = rename_file(file)
-                    dst = os.path.join(FINAL_FOLDER, new_name)
-                    shutil.move(src, dst)
-                    logger.info(f"Moved and renamed file: {file} to {new_name}")
-                elif file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    screenshots_folder = os.path.join(FINAL_FOLDER, "Screenshots")
-                    ensure_dir(screenshots_folder)
-                    dst = os.path.join(screenshots_folder, file)
-                    shutil.copy2(src, dst)
-                    logger.info(f"Copied screenshot: {file}")
-            
-            renamed_summary_results = {get_numeric_id(k): v for k, v in summary_results.items()}
-            renamed_nrrf_results = {get_numeric_id(k): v for k, v in nrrf_results.items()}
-
-            results = {
-                "summary_results": renamed_summary_results,
-                "nrrf_results": renamed_nrrf_results
-            }
-
-            # Evaluate results against criteria
-            for filename, file_results in results['nrrf_results'].items():
-                site = db.query(Site).filter(Site.siteid_sectorid == filename).first()
-                if site:
-                    logger.debug(f"Found site for filename {filename}: {site.siteid_sectorid}")
-                    criteria_list = db.query(Criteria).filter(
-                        Criteria.type == site.criteria,
-                        Criteria.value == site.criteria_value
-                    ).all()
-                    logger.debug(f"Criteria for site {filename}: {[c.kpi_name for c in criteria_list]}")
-                    
-                    evaluation_results = []
-                    summary_data = results['summary_results'].get(filename, {})
-                    dl_test_data = file_results.get('DL_Test', {})
-                    ul_test_data = file_results.get('UL_Test', {})
-                    ookla_test_data = file_results.get('Ookla_Test', {})
-
-                    logger.debug(f"Summary data for {filename}: {summary_data}")
-                    logger.debug(f"DL test data for {filename}: {dl_test_data}")
-                    logger.debug(f"UL test data for {filename}: {ul_test_data}")
-                    logger.debug(f"Ookla test data for {filename}: {ookla_test_data}")
-
-                    kpi_data = {
-                        'PDSCH_Peak': dl_test_data.get('PDSCH_Peak'),
-                        'PUSCH_Peak': ul_test_data.get('PUSCH_Peak'),
-                        'Ping _avg': summary_data.get('ping_avg'),
-                        'Ookla_DL(Mbps)': ookla_test_data.get('Ookla_DL(Mbps)_Peak'),
-                        'Ookla_UL(Mbps)': ookla_test_data.get('Ookla_UL(Mbps)_Peak'),
-                        'Attach_Successrate': (float(summary_data.get('attachcomplete_count', 0)) / float(summary_data.get('attachrequest_count', 1))) * 100 if float(summary_data.get('attachrequest_count', 0)) > 0 else 0,
-                        'PDSCH_Avg': dl_test_data.get('Avg_NR_Total_PDSCH Tput(Mbps)'),
-                        'PUSCH_Avg': ul_test_data.get('Avg_NR_Total_PUSCH Tput(Mbps)')
-                    }
-
-                    logger.debug(f"KPI data for {filename}: {kpi_data}")
-
-                    for criterion in criteria_list:
-                        logger.debug(f"Evaluating criterion: {criterion.kpi_name}")
-                        if criterion.kpi_name in kpi_data:
-                            value = kpi_data[criterion.kpi_name]
-                            logger.debug(f"Value for {criterion.kpi_name}: {value}")
-                            try:
-                                result = float(value) if value is not None else None
-                                status = evaluate_criterion(criterion, result)
-                                evaluation_results.append({
-                                    "kpi_name": criterion.kpi_name,
-                                    "result": result,
-                                    "status": status,
-                                    "pass_value": criterion.pass_value,
-                                    "conditional_pass_value": criterion.conditional_pass_value,
-                                    "unit": criterion.unit
-                                })
-                            except (ValueError, TypeError) as e:
-                                logger.error(f"Error converting {value} to float for {criterion.kpi_name}: {str(e)}")
-                                evaluation_results.append({
-                                    "kpi_name": criterion.kpi_name,
-                                    "result": value,
-                                    "status": "Error",
-                                    "pass_value": criterion.pass_value,
-                                    "conditional_pass_value": criterion.conditional_pass_value,
-                                    "unit": criterion.unit
-                                })
-                        else:
-                            logger.warning(f"KPI {criterion.kpi_name} not found in data")
-                            evaluation_results.append({
-                                "kpi_name": criterion.kpi_name,
-                                "result": None,
-                                "status": "No data",
-                                "pass_value": criterion.pass_value,
-                                "conditional_pass_value": criterion.conditional_pass_value,
-                                "unit": criterion.unit
-                            })
-                    
-                    results['nrrf_results'][filename]['evaluation'] = evaluation_results
-                else:
-                    logger.warning(f"No site found for {filename}")
-                    results['nrrf_results'][filename]['evaluation'] = [{"error": "No site found in database"}]
-
-            return results
+            # Parsing runs off the event loop so one worker can serve other requests meanwhile
+            return await asyncio.to_thread(process_zip_folder, temp_dir, db, "full", pending_writes)
 
         except Exception as e:
             logger.error(f"Error processing {zip_file.filename}: {str(e)}")
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail=f"Error processing {zip_file.filename}: {str(e)}")
 
+async def preview_zip_file(zip_file: UploadFile, db: Session):
+    """
+    Preview a ZIP file and keep it on disk for the full analysis.
+
+    Returns:
+    tuple: (preview results, path of the kept ZIP file)
+    """
+    pending_dir = tempfile.mkdtemp(prefix="full-analysis-")
+    zip_path = os.path.join(pending_dir, zip_file.filename)
+    with open(zip_path, "wb") as buffer:
+        shutil.copyfileobj(zip_file.file, buffer)
+
+    try:
+        return await asyncio.to_thread(process_zip_path, zip_path, db, "preview"), zip_path
+    except Exception as e:
+        shutil.rmtree(pending_dir, ignore_errors=True)
+        logger.error(f"Error previewing {zip_file.filename}: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error previewing {zip_file.filename}: {str(e)}")
+
+# Full analyses queued by preview uploads; they replace the preview results when done.
+# They run after the upload's admission slot is released, at most FULL_ANALYSIS_CONCURRENCY at once.
+FULL_ANALYSIS_CONCURRENCY = int(os.getenv("FULL_ANALYSIS_CONCURRENCY", "1"))
+full_analysis_slots = threading.BoundedSemaphore(FULL_ANALYSIS_CONCURRENCY)
+analysis_jobs = {}
+analysis_jobs_lock = threading.Lock()
+
+def _update_analysis_job(job_id, **fields):
+    with analysis_jobs_lock:
+        analysis_jobs[job_id].update(fields)
+
+def create_analysis_job(numeric_id, filename):
+    job_id = uuid.uuid4().hex
+    with analysis_jobs_lock:
+        analysis_jobs[job_id] = {
+            "id": job_id,
+            "filename": numeric_id,
+            "upload": filename,
+            "status": "pending",
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+    return job_id
+
+def preview_superseded(db: Session, numeric_id, scheduled_at):
+    # Any result written after the preview (a later upload, in any worker) wins over this analysis
+    result = db.query(TestResult).filter(TestResult.filename == numeric_id).first()
+    return result is not None and result.timestamp is not None and result.timestamp > scheduled_at
+
+def run_full_analysis(job_id, numeric_id, zip_path, scheduled_at):
+    """
+    Run the full pipeline on a previewed ZIP file and replace the preview results.
+
+    At most FULL_ANALYSIS_CONCURRENCY analyses run at once per worker. The kept
+    ZIP file is removed afterwards.
+    """
+    db = SessionLocal()
+    try:
+        with full_analysis_slots:
+            if preview_superseded(db, numeric_id, scheduled_at):
+                _update_analysis_job(job_id, status="superseded", finished_at=datetime.now().isoformat())
+                return
+            _update_analysis_job(job_id, status="running", started_at=datetime.now().isoformat())
+            pending_writes = []
+            results = process_zip_path(zip_path, db, pending_writes=pending_writes)
+            db.rollback()
+            if preview_superseded(db, numeric_id, scheduled_at):
+                _update_analysis_job(job_id, status="superseded", finished_at=datetime.now().isoformat())
+                return
+            if not append_to_sqlite({"results": {numeric_id: results}}, pending_writes):
+                raise RuntimeError("Failed to save data to SQLite")
+        _update_analysis_job(job_id, status="completed", finished_at=datetime.now().isoformat())
+        logger.info(f"Full analysis {job_id} of {numeric_id} completed")
+    except Exception as e:
+        logger.error(f"Full analysis {job_id} of {numeric_id} failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        _update_analysis_job(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+    finally:
+        db.close()
+        shutil.rmtree(os.path.dirname(zip_path), ignore_errors=True)
+
+async def save_ingest_results(background_tasks: BackgroundTasks, mode, processed_files, errors, results, pending_analyses,
+                              pending_writes=()):
+    """
+    Save processed uploads to SQLite, with their pending_writes, and build the /process_zip/ response.
+
+    In preview mode the full analysis of each previewed ZIP in pending_analyses
+    (numeric id -> (upload name, kept ZIP path)) is queued as a background task.
+    """
+    response_data = {
+        "message": "All files processed successfully" if not errors else "Some files could not be processed",
+        "processed": processed_files,
+        "errors": errors,
+        "results": results
+    }
+
+    # Append to SQLite
+    sqlite_saved = await asyncio.to_thread(append_to_sqlite, response_data, pending_writes)
+    if sqlite_saved:
+        response_data["sqlite_status"] = "Data successfully saved to SQLite"
+    else:
+        response_data["sqlite_status"] = "Failed to save data to SQLite"
+        logger.error("Failed to save data to SQLite. Check logs for details.")
+
+    if mode == "preview":
+        response_data["mode"] = "preview"
+        response_data["full_analysis"] = {}
+        scheduled_at = datetime.now()
+        for numeric_id, (filename, zip_path) in pending_analyses.items():
+            job_id = create_analysis_job(numeric_id, filename)
+            background_tasks.add_task(run_full_analysis, job_id, numeric_id, zip_path, scheduled_at)
+            response_data["full_analysis"][numeric_id] = job_id
+
+    status_code = 200 if not errors else 207  # Multi-Status
+    return JSONResponse(content=response_data, status_code=status_code)
+
+# Re-evaluation of stored results after criteria changes
+REEVALUATION_BATCH_SIZE = 200
+reevaluation_jobs = {}
+reevaluation_jobs_lock = threading.Lock()
+
+def _update_job(job_id, **fields):
+    with reevaluation_jobs_lock:
+        reevaluation_jobs[job_id].update(fields)
+
+def create_reevaluation_job(criteria_type, criteria_value):
+    job_id = uuid.uuid4().hex
+    with reevaluation_jobs_lock:
+        reevaluation_jobs[job_id] = {
+            "id": job_id,
+            "type": criteria_type,
+            "value": criteria_value,
+            "status": "pending",
+            "total": 0,
+            "processed": 0,
+            "updated": 0,
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+    return job_id
+
+def reevaluate_batch(db: Session, filenames, criteria_list, program: KpiProgram):
+    """Write job: re-evaluate one batch of stored results and update the rollups. Returns the number changed."""
+    updated = 0
+    stored_results = db.query(TestResult).filter(TestResult.filename.in_(filenames)).all()
+    records = [kpi_sections(
+        result.summary_results or {},
+        result.dl_test_results or {},
+        result.ul_test_results or {},
+        result.ookla_test_results or {}
+    ) for result in stored_results]
+    for result, evaluation_results in zip(stored_results, evaluate_kpis(criteria_list, program, records)):
+        if evaluation_results != result.evaluation_results:
+            remove_from_rollups(db, result)
+            result.evaluation_results = evaluation_results
+            add_to_rollups(db, result)
+            updated += 1
+    return updated
+
+def run_reevaluation(job_id, criteria_type, criteria_value):
+    """
+    Recompute evaluation_results from the stored JSON results of every test result
+    whose site uses the (type, value) criteria set. Each batch is one write job,
+    so rollups are updated in the same transaction as the batch.
+    """
+    db = SessionLocal()
+    _update_job(job_id, status="running", started_at=datetime.now().isoformat())
+    try:
+        # Read directly rather than through the cache: the job runs right after a criteria change
+        criteria_list = [snapshot(criterion) for criterion in db.query(Criteria).filter(
+            Criteria.type == criteria_type,
+            Criteria.value == criteria_value
+        ).all()]
+        program = KpiProgram([criterion.kpi_name for criterion in criteria_list], load_derived_kpis(db))
+        site_ids = [site_id for (site_id,) in db.query(Site.siteid_sectorid).filter(
+            Site.criteria == criteria_type,
+            Site.criteria_value == criteria_value
+        )]
+        filenames = [filename for (filename,) in db.query(TestResult.filename).filter(TestResult.filename.in_(site_ids))]
+        db.close()
+        _update_job(job_id, total=len(filenames))
+        logger.info(f"Re-evaluating {len(filenames)} test results for criteria {criteria_type}={criteria_value}")
+
+        processed = updated = 0
+        for start in range(0, len(filenames), REEVALUATION_BATCH_SIZE):
+            batch = filenames[start:start + REEVALUATION_BATCH_SIZE]
+            updated += write_queue.run(reevaluate_batch, batch, criteria_list, program)
+            processed += len(batch)
+            _update_job(job_id, processed=processed, updated=updated)
+
+        _update_job(job_id, status="completed", finished_at=datetime.now().isoformat())
+        logger.info(f"Re-evaluation {job_id} completed: {updated} of {processed} results changed")
+    except Exception as e:
+        logger.error(f"Re-evaluation {job_id} failed: {str(e)}")
+        logger.error(traceback.format_exc())
+        _update_job(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+    finally:
+        db.close()
+
+def schedule_reevaluation(background_tasks: BackgroundTasks, criteria_sets):
+    """Queue one re-evaluation job per distinct (type, value) and return the job ids."""
+    job_ids = []
+    for criteria_type, criteria_value in sorted(set(criteria_sets)):
+        job_id = create_reevaluation_job(criteria_type, criteria_value)
+        background_tasks.add_task(run_reevaluation, job_id, criteria_type, criteria_value)
+        job_ids.append(job_id)
+    return job_ids
+
 def evaluate_criterion(criterion: Criteria, value: Optional[float]) -> str:
     if value is None:
         return "No data"
@@ -399,11 +1306,20 @@ async def edit_criteria(request: Request):
     return templates.TemplateResponse("EditCriteria.html", {"request": request})
 
 @app.post("/process_zip/")
-async def process_zip(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+async def process_zip(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    mode: str = Query("full", description="'full', or 'preview' for sampled results now and the full analysis in the background"),
+    db: Session = Depends(get_db)
+):
     """
     Process uploaded ZIP files containing cellular network test data.
 
     - **files**: One or more ZIP files containing test data
+    - **mode**: With 'preview', NR_RF logs are sampled: session results and start info are
+      exact, KPI values are approximate and each test carries a "Preview" entry with their
+      error bounds. The full analysis then runs in the background and replaces them; poll
+      `/process_zip/jobs/{job_id}` with the ids in "full_analysis"
     - Returns a summary of processed files, any errors encountered, and evaluation results
     """
     logger.info(f"Received request to process files")
@@ -412,7 +1328,11 @@ async def process_zip(files: List[UploadFile] = File(...), db: Session = Depends
     processed_files = []
     errors = []
     results = {}
+    pending_analyses = {}
+    pending_writes = []
 
+    if mode not in ("full", "preview"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'preview'")
     if not files:
         logger.warning("No files were uploaded")
         raise HTTPException(status_code=400, detail="No files were uploaded")
@@ -421,7 +1341,11 @@ async def process_zip(files: List[UploadFile] = File(...), db: Session = Depends
         logger.info(f"Processing file: {file.filename}")
         if file.filename.endswith('.zip'):
             try:
-                file_results = await process_zip_file(file, db)
+                if mode == "preview":
+                    file_results, zip_path = await preview_zip_file(file, db)
+                    pending_analyses[get_numeric_id(file.filename)] = (file.filename, zip_path)
+                else:
+                    file_results = await process_zip_file(file, db, pending_writes)
                 numeric_id = get_numeric_id(file.filename)
                 processed_files.append(numeric_id)
                 results[numeric_id] = file_results
@@ -434,26 +1358,146 @@ async def process_zip(files: List[UploadFile] = File(...), db: Session = Depends
             logger.warning(f"Skipped non-ZIP file: {file.filename}")
             errors.append({"file": file.filename, "error": "Not a ZIP file"})
 
-    response_data = {
-        "message": "All files processed successfully" if not errors else "Some files could not be processed",
-        "processed": processed_files,
-        "errors": errors,
-        "results": results
-    }
+    return await save_ingest_results(background_tasks, mode, processed_files, errors, results, pending_analyses, pending_writes)
 
-    # Append to SQLite
-    sqlite_saved = append_to_sqlite(response_data)
-    if sqlite_saved:
-        response_data["sqlite_status"] = "Data successfully saved to SQLite"
-    else:
-        response_data["sqlite_status"] = "Failed to save data to SQLite"
-        logger.error("Failed to save data to SQLite. Check logs for details.")
+@app.get("/process_zip/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """
+    Status of the background full analysis queued by a preview upload:
+    pending, running, completed, superseded (a newer upload of the same logs) or failed.
+    """
+    with analysis_jobs_lock:
+        job = analysis_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Analysis job not found")
+        return dict(job)
 
-    status_code = 200 if not errors else 207  # Multi-Status
-    return JSONResponse(content=response_data, status_code=status_code)
+def _upload_error(e: UploadError):
+    return HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.post("/uploads/")
+async def create_upload(upload: UploadCreate):
+    """
+    Start a resumable upload of a ZIP file.
+
+    - **filename**, **size**: Name and total size in bytes of the ZIP file
+    - **chunk_size**: Optional bytes per chunk (8 MiB by default)
+    - Returns the upload_id and the chunk layout. Send each chunk with
+      `PUT /uploads/{upload_id}/chunks/{index}`, then `POST /uploads/{upload_id}/finalize`
+    """
+    if not upload.filename.endswith('.zip'):
+        raise HTTPException(status_code=400, detail="Not a ZIP file")
+    try:
+        return await asyncio.to_thread(chunked_uploads.create, upload.filename, upload.size, upload.chunk_size)
+    except UploadError as e:
+        raise _upload_error(e)
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(None, description="SHA-256 of the chunk, hex")
+):
+    """
+    Store one chunk of an upload. The body is the raw chunk: bytes
+    [index * chunk_size, (index + 1) * chunk_size) of the file, written to disk as it arrives.
+    Chunks can be sent in any order and re-sent; a chunk whose size or
+    X-Chunk-SHA256 does not match is rejected and has to be sent again.
+    """
+    try:
+        return await chunked_uploads.write_chunk(upload_id, index, request.stream(), x_chunk_sha256)
+    except UploadError as e:
+        raise _upload_error(e)
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """
+    Progress of an upload: received byte ranges, missing chunk numbers and
+    when the session expires. A client resuming after a dropped connection
+    sends the missing chunks only.
+    """
+    try:
+        return await asyncio.to_thread(chunked_uploads.status, upload_id)
+    except UploadError as e:
+        raise _upload_error(e)
+
+@app.delete("/uploads/{upload_id}")
+async def delete_upload(upload_id: str):
+    """Cancel an upload and remove its chunks."""
+    try:
+        await asyncio.to_thread(chunked_uploads.delete, upload_id)
+    except UploadError as e:
+        raise _upload_error(e)
+    return {"message": f"Upload {upload_id} cancelled"}
+
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    mode: str = Query("full", description="'full', or 'preview' as in /process_zip/"),
+    sha256: Optional[str] = Query(None, description="Optional SHA-256 of the whole file, hex"),
+    db: Session = Depends(get_db)
+):
+    """
+    Process a complete upload like a ZIP file sent to /process_zip/ and return the same response.
+    Finalizing waits for an ingest slot like /process_zip/ does, and likewise
+    releases it before a preview's background analysis starts.
+    """
+    if mode not in ("full", "preview"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'preview'")
+    try:
+        size = (await asyncio.to_thread(chunked_uploads.status, upload_id))["size"]
+    except UploadError as e:
+        raise _upload_error(e)
+
+    try:
+        await ingest_admission.acquire(size)
+    except AdmissionRejected as e:
+        return rejection_response(e, ingest_admission.max_request_bytes)
+
+    started = time.monotonic()
+    try:
+        try:
+            zip_path = await asyncio.to_thread(chunked_uploads.finalize, upload_id, sha256)
+        except UploadError as e:
+            raise _upload_error(e)
+
+        filename = os.path.basename(zip_path)
+        numeric_id = get_numeric_id(filename)
+        processed_files, errors, results, pending_analyses, pending_writes = [], [], {}, {}, []
+        keep_zip = False
+        try:
+            results[numeric_id] = await asyncio.to_thread(process_zip_path, zip_path, db, mode, pending_writes)
+            processed_files.append(numeric_id)
+            if mode == "preview":
+                # The full analysis removes the finalized upload when it is done
+                pending_analyses[numeric_id] = (filename, zip_path)
+                keep_zip = True
+            logger.info(f"Successfully processed upload {upload_id}: {filename}")
+        except Exception as e:
+            logger.error(f"Error processing upload {upload_id} ({filename}): {str(e)}")
+            logger.error(traceback.format_exc())
+            errors.append({"file": filename, "error": str(e)})
+        finally:
+            if not keep_zip:
+                shutil.rmtree(os.path.dirname(zip_path), ignore_errors=True)
+
+        return await save_ingest_results(background_tasks, mode, processed_files, errors, results, pending_analyses,
+                                         pending_writes)
+    finally:
+        ingest_admission.release(size, time.monotonic() - started)
+
+@app.get("/metrics/ingest")
+async def get_ingest_metrics():
+    """
+    Upload admission state of this worker: active and queued ingests, in-flight bytes,
+    rejection counts by reason and the configured limits.
+    """
+    return ingest_admission.metrics()
 
 @app.post("/sites/upload")
-async def upload_sites(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_sites(file: UploadFile = File(...)):
     """
     Upload a CSV file containing site information.
 
@@ -466,31 +1510,8 @@ async def upload_sites(file: UploadFile = File(...), db: Session = Depends(get_d
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
     content = await file.read()
-    csv_reader = csv.DictReader(io.StringIO(content.decode('utf-8')))
-    
-    added_count = 0
-    updated_count = 0
-    error_count = 0
-    for row in csv_reader:
-        try:
-            existing_site = db.query(Site).filter(Site.siteid_sectorid == row['siteid_sectorid']).first()
-            if existing_site:
-                # Update existing site
-                for key, value in row.items():
-                    setattr(existing_site, key, value)
-                updated_count += 1
-                logger.info(f"Updated site: {existing_site.siteid_sectorid}")
-            else:
-                # Add new site
-                new_site = Site(**row)
-                db.add(new_site)
-                added_count += 1
-                logger.info(f"Added new site: {new_site.siteid_sectorid}")
-            db.commit()
-        except Exception as e:
-            logger.error(f"Error processing row: {row}. Error: {str(e)}")
-            db.rollback()
-            error_count += 1
+    rows = list(csv.DictReader(io.StringIO(content.decode('utf-8'))))
+    added_count, updated_count, error_count = await asyncio.to_thread(write_queue.run, upsert_sites, rows)
     
     logger.info(f"Sites upload completed. Added: {added_count}, Updated: {updated_count}, Errors: {error_count}")
     return {"message": f"{added_count} sites added, {updated_count} sites updated successfully", "errors": error_count}
@@ -515,77 +1536,48 @@ async def read_site(siteid_sectorid: str, db: Session = Depends(get_db)):
     return site
 
 @app.put("/site/{siteid_sectorid}", response_model=SiteResponse)
-async def update_site(siteid_sectorid: str, site_update: SiteUpdate, db: Session = Depends(get_db)):
-    db_site = db.query(Site).filter(Site.siteid_sectorid == siteid_sectorid).first()
-    if db_site is None:
-        raise HTTPException(status_code=404, detail="Site not found")
-    
-    for key, value in site_update.dict(exclude_unset=True).items():
-        setattr(db_site, key, value)
-    
+async def update_site(siteid_sectorid: str, site_update: SiteUpdate):
     try:
-        db.commit()
-        db.refresh(db_site)
-        logger.info(f"Updated site: {siteid_sectorid}")
+        db_site = await asyncio.to_thread(
+            write_queue.run, update_site_row, siteid_sectorid, site_update.dict(exclude_unset=True)
+        )
     except IntegrityError:
-        db.rollback()
         logger.error(f"Update failed for site: {siteid_sectorid}")
         raise HTTPException(status_code=400, detail="Update failed due to integrity constraint")
-    
+    if db_site is None:
+        raise HTTPException(status_code=404, detail="Site not found")
+    logger.info(f"Updated site: {siteid_sectorid}")
     return db_site
 
 @app.delete("/site/{siteid_sectorid}")
-async def delete_site(siteid_sectorid: str, db: Session = Depends(get_db)):
-    db_site = db.query(Site).filter(Site.siteid_sectorid == siteid_sectorid).first()
-    if db_site is None:
+async def delete_site(siteid_sectorid: str):
+    deleted = await asyncio.to_thread(write_queue.run, delete_site_row, siteid_sectorid)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Site not found")
-    
-    db.delete(db_site)
-    db.commit()
     logger.info(f"Deleted site: {siteid_sectorid}")
     
     return {"message": f"Site {siteid_sectorid} deleted successfully"}
 
 @app.post("/criteria/upload")
-async def upload_criteria(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_criteria(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     logger.info(f"Received request to upload criteria CSV: {file.filename}")
     if not file.filename.endswith('.csv'):
         logger.error(f"Invalid file type: {file.filename}")
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
     content = await file.read()
-    csv_reader = csv.DictReader(io.StringIO(content.decode('utf-8')))
-    
-    added_count = 0
-    updated_count = 0
-    error_count = 0
-    for row in csv_reader:
-        try:
-            existing_criteria = db.query(Criteria).filter(
-                Criteria.type == row['type'],
-                Criteria.value == row['value'],
-                Criteria.kpi_name == row['kpi_name']
-            ).first()
-            if existing_criteria:
-                # Update existing criteria
-                for key, value in row.items():
-                    setattr(existing_criteria, key, value)
-                updated_count += 1
-                logger.info(f"Updated criteria: {existing_criteria.type} - {existing_criteria.kpi_name}")
-            else:
-                # Add new criteria
-                new_criteria = Criteria(**row)
-                db.add(new_criteria)
-                added_count += 1
-                logger.info(f"Added new criteria: {new_criteria.type} - {new_criteria.kpi_name}")
-            db.commit()
-        except Exception as e:
-            logger.error(f"Error processing row: {row}. Error: {str(e)}")
-            db.rollback()
-            error_count += 1
+    rows = list(csv.DictReader(io.StringIO(content.decode('utf-8'))))
+    added_count, updated_count, error_count, changed_sets = await asyncio.to_thread(
+        write_queue.run, upsert_criteria, rows
+    )
     
+    job_ids = schedule_reevaluation(background_tasks, changed_sets)
     logger.info(f"Criteria upload completed. Added: {added_count}, Updated: {updated_count}, Errors: {error_count}")
-    return {"message": f"{added_count} criteria added, {updated_count} criteria updated successfully", "errors": error_count}
+    return {
+        "message": f"{added_count} criteria added, {updated_count} criteria updated successfully",
+        "errors": error_count,
+        "reevaluation_jobs": job_ids
+    }
 
 @app.get("/criteria", response_model=List[CriteriaResponse])
 async def read_criteria(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -600,37 +1592,129 @@ async def read_criteria_by_id(id: int, db: Session = Depends(get_db)):
     return criteria
 
 @app.put("/criteria/{id}", response_model=CriteriaResponse)
-async def update_criteria(id: int, criteria_update: CriteriaUpdate, db: Session = Depends(get_db)):
-    db_criteria = db.query(Criteria).filter(Criteria.id == id).first()
-    if db_criteria is None:
-        raise HTTPException(status_code=404, detail="Criteria not found")
-    
-    update_data = criteria_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_criteria, key, value)
-    
+async def update_criteria(id: int, criteria_update: CriteriaUpdate, background_tasks: BackgroundTasks):
     try:
-        db.commit()
-        db.refresh(db_criteria)
-        logger.info(f"Updated criteria: {id}")
+        updated = await asyncio.to_thread(
+            write_queue.run, update_criteria_row, id, criteria_update.dict(exclude_unset=True)
+        )
     except IntegrityError:
-        db.rollback()
         logger.error(f"Update failed for criteria: {id}")
         raise HTTPException(status_code=400, detail="Update failed due to integrity constraint")
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Criteria not found")
+    db_criteria, previous_set = updated
+    logger.info(f"Updated criteria: {id}")
     
+    schedule_reevaluation(background_tasks, [previous_set, (db_criteria.type, db_criteria.value)])
     return db_criteria
 
 @app.delete("/criteria/{id}")
-async def delete_criteria(id: int, db: Session = Depends(get_db)):
-    db_criteria = db.query(Criteria).filter(Criteria.id == id).first()
-    if db_criteria is None:
+async def delete_criteria(id: int, background_tasks: BackgroundTasks):
+    criteria_set = await asyncio.to_thread(write_queue.run, delete_criteria_row, id)
+    if criteria_set is None:
         raise HTTPException(status_code=404, detail="Criteria not found")
-    
-    db.delete(db_criteria)
-    db.commit()
     logger.info(f"Deleted criteria: {id}")
     
-    return {"message": f"Criteria {id} deleted successfully"}
+    job_ids = schedule_reevaluation(background_tasks, [criteria_set])
+    return {"message": f"Criteria {id} deleted successfully", "reevaluation_jobs": job_ids}
+
+@app.post("/criteria/reevaluate")
+async def reevaluate_criteria(
+    background_tasks: BackgroundTasks,
+    type: str = Query(..., description="Criteria type"),
+    value: str = Query(..., description="Criteria value"),
+):
+    """
+    Re-evaluate stored test results of all sites using a criteria set, without re-uploading ZIPs.
+
+    - Returns the id of the background job; poll `/criteria/reevaluate/{job_id}` for progress
+    """
+    job_ids = schedule_reevaluation(background_tasks, [(type, value)])
+    return {"job_id": job_ids[0]}
+
+@app.get("/criteria/reevaluate/{job_id}")
+async def get_reevaluation_job(job_id: str):
+    """
+    Progress of a re-evaluation job: status, total, processed and updated result counts.
+    """
+    with reevaluation_jobs_lock:
+        job = reevaluation_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Re-evaluation job not found")
+        return dict(job)
+
+@app.get("/kpis")
+async def read_kpis(db: Session = Depends(get_db)):
+    """
+    KPI names criteria can reference, with their expressions. Derived KPIs
+    override built-in ones of the same name.
+    """
+    derived = load_derived_kpis(db)
+    kpis = [{"name": name, "expression": expression, "source": "builtin"}
+            for name, expression in BUILTIN_KPIS.items() if name not in derived]
+    kpis.extend({"name": name, "expression": expression, "source": "derived"} for name, expression in derived.items())
+    return kpis
+
+@app.post("/kpis/upload")
+async def upload_kpis(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """
+    Define derived KPIs from a CSV with name and expression columns.
+
+    Expressions are arithmetic (+ - * / // % **), comparisons, and/or/not, `a if c else b`
+    and abs/min/max/where/coalesce over result fields: bare names read Summary fields,
+    `DL_Test.PDSCH_Peak` or `DL_Test["Avg_NR_Total_PDSCH Tput(Mbps)"]` read a test section
+    (Summary, DL_Test, UL_Test, Ookla_Test). Rows with an invalid expression are reported
+    and skipped. Criteria sets using a changed KPI are re-evaluated in the background.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
+
+    content = await file.read()
+    definitions = {}
+    errors = []
+    for row in csv.DictReader(io.StringIO(content.decode('utf-8'))):
+        name = (row.get('name') or "").strip()
+        expression = (row.get('expression') or "").strip()
+        try:
+            if not name:
+                raise KpiExpressionError("name is required")
+            KpiExpression(expression)
+            definitions[name] = expression
+        except KpiExpressionError as e:
+            errors.append({"name": name, "expression": expression, "error": str(e)})
+
+    added_count, updated_count, changed_sets = await asyncio.to_thread(
+        write_queue.run, upsert_derived_kpis, definitions
+    )
+    job_ids = schedule_reevaluation(background_tasks, changed_sets)
+    logger.info(f"KPI upload completed. Added: {added_count}, Updated: {updated_count}, Errors: {len(errors)}")
+    return {
+        "message": f"{added_count} KPIs added, {updated_count} KPIs updated successfully",
+        "errors": errors,
+        "reevaluation_jobs": job_ids
+    }
+
+@app.put("/kpis/{name}")
+async def update_kpi(name: str, kpi_update: DerivedKpiUpdate, background_tasks: BackgroundTasks):
+    """Define or replace one derived KPI; see /kpis/upload for the expression syntax."""
+    try:
+        KpiExpression(kpi_update.expression)
+    except KpiExpressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _, _, changed_sets = await asyncio.to_thread(
+        write_queue.run, upsert_derived_kpis, {name: kpi_update.expression.strip()}
+    )
+    job_ids = schedule_reevaluation(background_tasks, changed_sets)
+    return {"name": name, "expression": kpi_update.expression.strip(), "reevaluation_jobs": job_ids}
+
+@app.delete("/kpis/{name}")
+async def delete_kpi(name: str, background_tasks: BackgroundTasks):
+    """Remove a derived KPI; a built-in KPI of the same name applies again."""
+    changed_sets = await asyncio.to_thread(write_queue.run, delete_derived_kpi, name)
+    if changed_sets is None:
+        raise HTTPException(status_code=404, detail="Derived KPI not found")
+    job_ids = schedule_reevaluation(background_tasks, changed_sets)
+    return {"message": f"KPI {name} deleted successfully", "reevaluation_jobs": job_ids}
 
 @app.get("/test_results")
 async def get_test_results(db: Session = Depends(get_db)):
@@ -666,65 +1750,394 @@ async def get_test_result(filename: str, db: Session = Depends(get_db)):
     }
 
 @app.delete("/test_results/{filename}")
-async def delete_test_result(filename: str, db: Session = Depends(get_db)):
-    result = db.query(TestResult).filter(TestResult.filename == filename).first()
-    if result is None:
+async def delete_test_result(filename: str):
+    deleted = await asyncio.to_thread(write_queue.run, delete_test_result_row, filename)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Test result not found")
-    
-    db.delete(result)
-    db.commit()
     logger.info(f"Deleted test result: {filename}")
     
     return {"message": f"Test result {filename} deleted successfully"}
 
-@app.get("/api/timeseries/{filename}", response_model=TimeSeriesData)
-async def get_timeseries_data(filename: str):
-    file_path = os.path.join(FINAL_FOLDER, f"{filename}_NR_RF.csv")
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="CSV file not found")
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
 
-    df = pd.read_csv(file_path)
+@app.get("/export/test_results")
+async def export_test_results(
+    format: str = Query("csv", description="'csv' or 'xlsx'"),
+    market: Optional[str] = Query(None, description="Only export results of sites in this market"),
+):
+    """
+    Export every test result as one flat row: site, market, the KPIs from the JSON
+    columns, and the status and value of each evaluated KPI.
 
-    # Find the timestamp column (assuming it contains 'time' in its name)
-    timestamp_column = next((col for col in df.columns if 'time' in col.lower()), None)
-    if timestamp_column:
-        # Convert the timestamp column to datetime
-        df[timestamp_column] = pd.to_datetime(df[timestamp_column], format="%H:%M:%S.%f")
-    else:
-        raise HTTPException(status_code=400, detail="Timestamp column not found in the CSV file")
-
-    desired_kpis = [
-        "NR_PCELL_PCI",
-        "NR_PCell_PDSCH Tput(Mbps)",
-        "NR_PCell_SS-RSRP",
-        "NR_PCell_SS-SINR",
-        "NR_PCell_WB CQI",
-        "NR_PCell_DL MCS(Avg)",
-        "NR_PCell_DL Modulation"
+    - Rows are read from a cursor in batches, so memory stays flat for any table size
+    - CSV is streamed as it is produced; XLSX is built with openpyxl's write-only mode
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'xlsx'")
+    filename = f"test_results.{format}"
+
+    if format == "csv":
+        return StreamingResponse(
+            iter_csv_export(SessionLocal, market),
+            media_type=EXPORT_MEDIA_TYPES["csv"],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(write_xlsx_export, SessionLocal, path, market)
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(path, media_type=EXPORT_MEDIA_TYPES["xlsx"], filename=filename,
+                        background=BackgroundTask(os.remove, path))
+
+@app.get("/markets/{market}/summary")
+async def get_market_summary(market: str, db: Session = Depends(get_db)):
+    """
+    Pass rates and average results per KPI for a market, read from the rollup tables.
+    """
+    market_rollup = db.query(MarketRollup).filter(MarketRollup.market == market).first()
+    if market_rollup is None or not market_rollup.test_count:
+        raise HTTPException(status_code=404, detail="Market not found")
+
+    kpis = {}
+    for rollup in db.query(MarketKpiRollup).filter(MarketKpiRollup.market == market).all():
+        if not rollup.count:
+            continue
+        kpi = kpis.setdefault(rollup.kpi_name, {"total": 0, "statuses": {}, "result_count": 0, "result_sum": 0.0})
+        kpi["total"] += rollup.count
+        kpi["statuses"][rollup.status] = rollup.count
+        kpi["result_count"] += rollup.result_count or 0
+        kpi["result_sum"] += rollup.result_sum or 0.0
+
+    for kpi in kpis.values():
+        kpi["pass_rate"] = kpi["statuses"].get("Pass", 0) / kpi["total"] * 100
+        kpi["avg_result"] = kpi["result_sum"] / kpi["result_count"] if kpi["result_count"] else None
+        del kpi["result_count"], kpi["result_sum"]
+
+    return {"market": market, "test_count": market_rollup.test_count, "kpis": kpis}
+
+@app.get("/cells/{pci}/{arfcn}/summary")
+async def get_cell_summary(pci: str, arfcn: str, db: Session = Depends(get_db)):
+    """
+    Merged throughput and radio KPIs per test type for a (PCI, ARFCN), read from the rollup tables.
+    """
+    rollups = db.query(CellRollup).filter(CellRollup.pci == pci, CellRollup.arfcn == arfcn).all()
+    tests = {}
+    for rollup in rollups:
+        if not rollup.test_count:
+            continue
+        count = rollup.test_count
+        tests[rollup.test] = {
+            "test_count": count,
+            "success_rate": rollup.success_count / count * 100,
+        }
+        # Averages over the tests that reported the value; None when none did
+        for kpi in {**CELL_ROLLUP_FIELDS[rollup.test][1], **CELL_RADIO_FIELDS}:
+            tests[rollup.test][f"avg_{kpi}"] = None
+    if not tests:
+        raise HTTPException(status_code=404, detail="Cell not found")
+
+    kpi_rollups = db.query(CellKpiRollup).filter(CellKpiRollup.pci == pci, CellKpiRollup.arfcn == arfcn).all()
+    for rollup in kpi_rollups:
+        if rollup.test in tests and rollup.sample_count:
+            tests[rollup.test][f"avg_{rollup.kpi}"] = rollup.total / rollup.sample_count
+    return {"pci": pci, "arfcn": arfcn, "tests": tests}
+
+EVENT_GROUPS = {
+    'site': CallEvent.filename,
+    'market': Site.market,
+    'session': CallEvent.session,
+    'day': func.strftime('%Y-%m-%d', CallEvent.timestamp),
+    'hour': func.strftime('%Y-%m-%d %H:00', CallEvent.timestamp),
+}
+
+def filter_call_events(query, start, end, market=None, site=None, session=None):
+    if start is not None:
+        query = query.filter(CallEvent.timestamp >= start.replace(tzinfo=None))
+    if end is not None:
+        query = query.filter(CallEvent.timestamp <= end.replace(tzinfo=None))
+    if market is not None:
+        query = query.filter(Site.market == market)
+    if site is not None:
+        query = query.filter(CallEvent.filename == site)
+    if session is not None:
+        query = query.filter(CallEvent.session == session)
+    return query
+
+@app.get("/events/failures")
+async def get_failure_histogram(
+    start: Optional[datetime] = Query(None, description="Only events at or after this date and time"),
+    end: Optional[datetime] = Query(None, description="Only events at or before this date and time"),
+    market: Optional[str] = Query(None, description="Only sites in this market"),
+    site: Optional[str] = Query(None, description="Only this site (numeric id of the logs)"),
+    session: Optional[str] = Query(None, description="DL_Test, UL_Test or Ookla_Test"),
+    group_by: Optional[str] = Query(None, description="'site', 'market', 'session', 'day' or 'hour'"),
+    db: Session = Depends(get_db)
+):
+    """
+    Histogram of failure reasons from the indexed call events of every ingested log.
+
+    - Failure events are those containing unable, fail, busy or error
+    - **group_by** adds one histogram per site, market, test session, day or hour
+    """
+    if group_by is not None and group_by not in EVENT_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(EVENT_GROUPS)}")
+
+    columns = [CallEvent.event, func.count(CallEvent.id)]
+    if group_by is not None:
+        columns.insert(0, EVENT_GROUPS[group_by])
+    query = db.query(*columns).outerjoin(Site, Site.siteid_sectorid == CallEvent.filename)
+    query = filter_call_events(query.filter(CallEvent.category == 'failure'), start, end, market, site, session)
+    rows = query.group_by(*columns[:-1]).all()
+
+    reasons = {}
+    groups = {}
+    for row in rows:
+        event_text, count = row[-2], row[-1]
+        reasons[event_text] = reasons.get(event_text, 0) + count
+        if group_by is not None:
+            groups.setdefault(row[0], {})[event_text] = count
+
+    def histogram(counts):
+        return [{"event": event_text, "count": count} for event_text, count in sorted(counts.items(), key=lambda item: -item[1])]
+
+    response = {"total": sum(reasons.values()), "reasons": histogram(reasons)}
+    if group_by is not None:
+        response["group_by"] = group_by
+        response["groups"] = {str(group): histogram(counts) for group, counts in sorted(groups.items(), key=lambda item: str(item[0]))}
+    return response
+
+@app.get("/events/files")
+async def get_files_with_event(
+    event: str = Query(..., description="Call event text"),
+    match: str = Query("exact", description="'exact', or 'contains' for a case-insensitive substring match"),
+    start: Optional[datetime] = Query(None, description="Only events at or after this date and time"),
+    end: Optional[datetime] = Query(None, description="Only events at or before this date and time"),
+    db: Session = Depends(get_db)
+):
+    """
+    Every ingested log containing a call event, with its occurrence count and first and last time.
+    """
+    if match not in ("exact", "contains"):
+        raise HTTPException(status_code=400, detail="match must be 'exact' or 'contains'")
+
+    condition = CallEvent.event == event if match == "exact" else CallEvent.event.contains(event)
+    query = db.query(
+        CallEvent.filename,
+        func.count(CallEvent.id),
+        func.min(CallEvent.timestamp),
+        func.max(CallEvent.timestamp)
+    ).filter(condition)
+    rows = filter_call_events(query, start, end).group_by(CallEvent.filename).order_by(CallEvent.filename).all()
+    return [
+        {"filename": filename, "count": count, "first_seen": first_seen, "last_seen": last_seen}
+        for filename, count, first_seen, last_seen in rows
     ]
 
-    available_kpis = [col for col in df.columns if any(kpi.lower() in col.lower() for kpi in desired_kpis)]
+@app.get("/tiles/{kpi}/{z}/{x}/{y}")
+async def get_coverage_tile(
+    kpi: str,
+    z: int,
+    x: int,
+    y: int,
+    market: Optional[str] = Query(None, description="Only logs of sites in this market"),
+    site: Optional[str] = Query(None, description="Only this site (numeric id of the logs)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Coverage of one slippy-map tile, from the cells aggregated at ingest.
+
+    - **kpi**: rsrp, sinr, dl_tput or ul_tput
+    - Each tile holds up to 16x16 cells with the count, mean, min and max of the KPI
+      over every ingested log; up to zoom 15 stored cells are merged, deeper
+      tiles return the zoom-15 cells that overlap them
+    """
+    if kpi not in KPI_COLUMNS:
+        raise HTTPException(status_code=404, detail=f"Unknown KPI {kpi}; use one of {', '.join(KPI_COLUMNS)}")
+    if not 0 <= z <= MAX_TILE_ZOOM or not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+        raise HTTPException(status_code=400, detail=f"Invalid tile {z}/{x}/{y}")
+
+    source = tile_source(z, x, y)
+    cell_x = CoverageCell.cell_x.op('>>')(source.shift)
+    cell_y = CoverageCell.cell_y.op('>>')(source.shift)
+    query = db.query(
+        cell_x,
+        cell_y,
+        func.sum(CoverageCell.count),
+        func.sum(CoverageCell.total),
+        func.min(CoverageCell.minimum),
+        func.max(CoverageCell.maximum)
+    ).filter(
+        CoverageCell.kpi == kpi,
+        CoverageCell.zoom == source.zoom,
+        CoverageCell.tile_x.between(*source.tile_x),
+        CoverageCell.tile_y.between(*source.tile_y),
+        CoverageCell.cell_x.between(*source.cell_x),
+        CoverageCell.cell_y.between(*source.cell_y)
+    )
+    if market is not None:
+        query = query.join(Site, Site.siteid_sectorid == CoverageCell.filename).filter(Site.market == market)
+    if site is not None:
+        query = query.filter(CoverageCell.filename == site)
+    rows = query.group_by(cell_x, cell_y).order_by(cell_y, cell_x).all()
+
+    return {
+        "kpi": kpi,
+        "tile": {"z": z, "x": x, "y": y},
+        "cell_zoom": source.cell_zoom,
+        "cells": [
+            {
+                "x": cx,
+                "y": cy,
+                "bounds": cell_bounds(cx, cy, source.cell_zoom),
+                "count": count,
+                "mean": total / count,
+                "min": minimum,
+                "max": maximum,
+            }
+            for cx, cy, count, total, minimum, maximum in rows
+        ],
+    }
+
+@app.get("/api/timeseries/compare", response_model=TimeSeriesComparison)
+async def compare_timeseries(
+    files: str = Query(..., description="Comma-separated file ids, e.g. pre and post drive logs"),
+    kpi: str = Query(..., description="KPI column to compare"),
+    points: int = Query(500, ge=2, le=10000, description="Number of points on the shared time grid"),
+    db: Session = Depends(get_db)
+):
+    """
+    Overlay one KPI from several logs, aligned on elapsed time since each session start.
+
+    - Only the timestamp and KPI columns are read from each file, concurrently
+    - Series are averaged onto a shared grid of elapsed seconds
+    """
+    filenames = [f.strip() for f in files.split(",") if f.strip()]
+    if not filenames:
+        raise HTTPException(status_code=400, detail="No files requested")
+
+    paths = {}
+    for filename in filenames:
+        artifact = resolve_artifact(db, filename, 'nr_rf')
+        if artifact is None or not os.path.exists(artifact.path):
+            raise HTTPException(status_code=404, detail=f"CSV file not found: {filename}")
+        paths[filename] = artifact.path
+
+    try:
+        indexes = await asyncio.gather(*(asyncio.to_thread(cached_time_index, paths[f]) for f in filenames))
+        loaded = await asyncio.gather(*(
+            asyncio.to_thread(load_kpi_series, paths[f], index, kpi) for f, index in zip(filenames, indexes)
+        ))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e).strip("'"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    duration = max((elapsed.max() for _, _, elapsed, _ in loaded if len(elapsed)), default=0.0)
+    grid_edges = np.linspace(0.0, max(duration, 1e-3), points + 1)
+
+    series = []
+    for filename, (kpi_column, start, elapsed, values) in zip(filenames, loaded):
+        series.append({
+            "name": filename,
+            "kpi_column": kpi_column,
+            "start": start.strftime(DATETIME_FORMAT) if not pd.isna(start) else None,
+            "duration": float(elapsed.max()) if len(elapsed) else 0.0,
+            "y": resample_to_grid(elapsed, values, grid_edges) if len(elapsed) else [None] * points,
+        })
+
+    return TimeSeriesComparison(kpi=kpi, grid=grid_edges[:-1].tolist(), series=series)
+
+@app.get(
+    "/api/timeseries/{filename}",
+    response_model=TimeSeriesData,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+async def get_timeseries_data(
+    filename: str,
+    request: Request,
+    start: Optional[datetime] = Query(None, description="Only return samples at or after this date and time"),
+    end: Optional[datetime] = Query(None, description="Only return samples at or before this date and time"),
+    format: Optional[str] = Query(None, description="'binary' for the compact typed-array encoding"),
+    db: Session = Depends(get_db)
+):
+    """
+    Time-series data for the plot page.
+
+    - Timestamps combine the Date and Time columns, so logs crossing midnight stay ordered
+    - **start**/**end** select a time window; only the matching rows of the CSV are read
+    - JSON by default
+    - With `format=binary` or `Accept: application/octet-stream`, a compact encoding:
+      a JSON header followed by an int64 epoch-ms time column and float32 arrays per KPI
+    """
+    artifact = resolve_artifact(db, filename, 'nr_rf')
+    if artifact is None or not os.path.exists(artifact.path):
+        raise HTTPException(status_code=404, detail="CSV file not found")
+    file_path = artifact.path
+
+    try:
+        # Building a missing index and parsing rows are blocking file work, kept off the event loop
+        index = await asyncio.to_thread(cached_time_index, file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    timestamp_column = find_timestamp_column(index.columns)
+    available_kpis = select_kpi_columns(index.columns)
     
     if not available_kpis:
         raise HTTPException(status_code=400, detail="No matching KPI columns found in the CSV file")
+
+    usecols = [timestamp_column] + [kpi for kpi in available_kpis if kpi != timestamp_column]
+    rows = index.select(to_epoch_ms(start), to_epoch_ms(end))
+    df = await asyncio.to_thread(index.read_rows, file_path, rows, usecols=usecols, timestamp_column=timestamp_column)
+    if df.empty:
+        raise HTTPException(status_code=404, detail="No samples in the requested time window")
+
+    time_range = format_time_range(df[timestamp_column])
+
+    if format == "binary" or BINARY_MEDIA_TYPE in request.headers.get("accept", ""):
+        content = await asyncio.to_thread(encode_timeseries_binary, df, timestamp_column, available_kpis, time_range)
+        return Response(content=content, media_type=BINARY_MEDIA_TYPE)
     
     traces = []
     for kpi in available_kpis:
-        valid_data = df[[timestamp_column, kpi]].dropna()
-        
-        traces.append({
-            "x": valid_data[timestamp_column].dt.strftime('%H:%M:%S.%f').tolist(),
-            "y": valid_data[kpi].tolist(),
-            "name": kpi
-        })
-    
-    time_range = {
-        "start": df[timestamp_column].min().strftime('%H:%M:%S.%f'),
-        "end": df[timestamp_column].max().strftime('%H:%M:%S.%f')
-    }
+        x, y = trace_points(df, timestamp_column, kpi)
+        traces.append({"x": x, "y": y, "name": kpi})
     
     return TimeSeriesData(data=traces, time_range=time_range)
 
+@app.get("/api/timeseries/{filename}/stream")
+async def stream_timeseries_data(
+    filename: str,
+    start: Optional[datetime] = Query(None, description="Only stream samples at or after this date and time"),
+    end: Optional[datetime] = Query(None, description="Only stream samples at or before this date and time"),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream time-series data as NDJSON: a coarse overview per KPI first, then full-resolution chunks.
+    """
+    artifact = resolve_artifact(db, filename, 'nr_rf')
+    if artifact is None or not os.path.exists(artifact.path):
+        raise HTTPException(status_code=404, detail="CSV file not found")
+
+    def generate():
+        try:
+            index = cached_time_index(artifact.path)
+            rows = index.select(to_epoch_ms(start), to_epoch_ms(end))
+            for message in iter_timeseries_stream(artifact.path, index, rows):
+                yield json.dumps(message) + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming time series for {filename}: {str(e)}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.get("/plot/{filename}", response_class=HTMLResponse)
 async def get_plot(request: Request, filename: str):
     """
@@ -739,13 +2152,31 @@ async def custom_swagger_ui_html():
         openapi_url="/openapi.json",
         title="Cellular Data Processing API - Swagger UI",
         oauth2_redirect_url="/docs/oauth2-redirect",
-        swagger_js_url="/static/swagger-ui-bundle.js",
-        swagger_css_url="/static/swagger-ui.css",
+        swagger_js_url=static_url("swagger-ui-bundle.js"),
+        swagger_css_url=static_url("swagger-ui.css"),
     )
 
+openapi_cache = {}
+
 @app.get("/openapi.json", include_in_schema=False)
-async def get_open_api_endpoint():
-    return JSONResponse(get_openapi(title="Cellular Data Processing API", version="1.0.0", routes=app.routes))
+async def get_open_api_endpoint(request: Request):
+    # Routes do not change after startup, so the document is rendered and compressed once
+    if not openapi_cache:
+        body = json.dumps(get_openapi(title="Cellular Data Processing API", version="1.0.0", routes=app.routes)).encode('utf-8')
+        openapi_cache.update(
+            body=body,
+            gzip=gzip.compress(body, compresslevel=9),
+            etag=f'"{hashlib.sha256(body).hexdigest()[:12]}"'
+        )
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), ["gzip"])
+    headers = {"ETag": variant_etag(openapi_cache["etag"], encoding), "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding == "gzip":
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=openapi_cache["gzip"], media_type="application/json", headers=headers)
+    return Response(content=openapi_cache["body"], media_type="application/json", headers=headers)
 
 
 if __name__ == "__main__":
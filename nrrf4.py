@@ -1,284 +1,876 @@
+import bisect
+import copy
+from abc import ABC, abstractmethod
 import csv
+import io
+import math
+import mmap
 import os
+import re
 import sys
-import statistics
 from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_csv(input_file, output_file):
+REQUIRED_HEADERS = [
+    "Date", "Time", "Latitude", "Longitude", "Call Event", "NR_PCell_Band",
+    "NR_PCell_PCI", "NR_PCell_NR_ARFCN", "NR_PCell_SS-RSRP", "NR_PCell_SS-SINR", "NR_PCell_WB CQI",
+    "NR_PCell_RI", "NR_PCell_DL MCS(Avg)", "NR_PCell_DL Num Layers",
+    "NR_PCell_DL Num RBs", "NR_Total_PDSCH Tput(Mbps)",
+    "NR_Total_PUSCH Tput(Mbps)", "NR_PCell_UL MCS(Avg)",
+    "NR_PCell_DL Modulation", "NR_PCell_UL Modulation"
+]
+
+MODULATION_HEADERS = ["NR_PCell_DL Modulation", "NR_PCell_UL Modulation"]
+START_INFO_HEADERS = ["Date", "Time", "Latitude", "Longitude", "NR_PCell_PCI", "NR_PCell_NR_ARFCN"]
+FAILURE_MARKERS = ["unable", "fail", "busy", "error"]
+
+TESTS = ("DL_Test", "UL_Test", "Ookla_Test")
+
+# Distinct header signatures (tool versions) whose compiled extractors are kept
+EXTRACTOR_CACHE_SIZE = 32
+
+# Every call event that opens or closes a test window contains one of these
+SESSION_MARKERS = ["Iperf", "Speedtest"]
+# Bytes of the test windows decoded at a time
+PARSE_BLOCK_BYTES = 8 * 1024 * 1024
+QUOTED_LINE_RE = re.compile(rb'[^\n]*"[^\n]*')
+
+# Preview mode: rows sampled per test window, and windows small enough to read in full
+PREVIEW_SAMPLE_ROWS = 2000
+PREVIEW_EXACT_BYTES = 4 * 1024 * 1024
+# Normal quantile of a two-sided 95% confidence interval
+Z_95 = 1.96
+
+
+def prepare_dist_string(counter):
+    total = sum(counter.values())
+    return "; ".join([f"{key}: {count/total*100:.2f}%" for key, count in counter.most_common()])
+
+
+class Aggregator(ABC):
+    """
+    Base class for KPIs computed in the single pass of process_csv.
+
+    One instance is created per test (DL_Test, UL_Test or Ookla_Test). The
+    parser calls init() once with the CSV headers, update() for every call
+    event while the test's window is open, and finalize() to get the keys
+    added to that test's results. merge() folds in another instance's state,
+    so partial results (for example from separate parts of a file) can be
+    combined.
+
+    The window attribute selects when update() is called:
+    - "active": from a test's Start event until the next Complete event
+    - "session": from the first Start event until that session is completed
+
+    In preview mode update() only sees a sample of the window's rows, and
+    error_bounds() describes how far each finalize() value may be off.
+
+    update(), merge() and finalize() are abstract, so an aggregator missing one
+    fails when it is created rather than partway through a log.
+    """
+
+    window = "active"
+
+    def init(self, headers):
+        pass
+
+    @abstractmethod
+    def update(self, row, event):
+        pass
+
+    @abstractmethod
+    def merge(self, other):
+        pass
+
+    @abstractmethod
+    def finalize(self):
+        pass
+
+    def error_bounds(self, rows):
+        """
+        Error bounds of the finalize() values when update() only saw `rows`,
+        a uniform sample of the window. Keys without a bound are left out.
+        """
+        return {}
+
+
+class PeakAggregator(Aggregator):
+    """Maximum of one or more throughput columns; a row counts only if all of them parse."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.peaks = {key: 0 for key in columns}
+
+    def init(self, headers):
+        self.positions = [(key, headers.get(column)) for key, column in self.columns.items()]
+
+    def update(self, row, event):
+        try:
+            values = [(key, float(row[i])) for key, i in self.positions]
+        except (ValueError, TypeError, IndexError):
+            return
+        for key, value in values:
+            if value > self.peaks[key]:
+                self.peaks[key] = value
+
+    def merge(self, other):
+        for key, value in other.peaks.items():
+            self.peaks[key] = max(self.peaks[key], value)
+
+    def finalize(self):
+        return {key: f"{value:.2f}" for key, value in self.peaks.items()}
+
+    def error_bounds(self, rows):
+        # The sampled peak is a lower bound. By the rule of three, with 95% confidence
+        # fewer than 3/n of the window's rows exceed it.
+        sampled = 0
+        for row in rows:
+            try:
+                [float(row[i]) for _, i in self.positions]
+            except (ValueError, TypeError, IndexError):
+                continue
+            sampled += 1
+        if not sampled:
+            return {}
+        return {key: {"lower_bound": True, "share_above_95": round(min(1.0, 3 / sampled), 6)} for key in self.peaks}
+
+
+class DistributionAggregator(Aggregator):
+    """Share of samples per distinct non-blank value of a column."""
+
+    def __init__(self, column, key):
+        self.column = column
+        self.key = key
+        self.counter = Counter()
+
+    def init(self, headers):
+        self.position = headers.get(self.column)
+
+    def update(self, row, event):
+        if self.position is not None:
+            value = row[self.position]
+            if value.strip():
+                self.counter[value] += 1
+
+    def merge(self, other):
+        self.counter.update(other.counter)
+
+    def finalize(self):
+        return {self.key: prepare_dist_string(self.counter)}
+
+    def error_bounds(self, rows):
+        # Half-width of the 95% interval of each share, in percentage points
+        total = sum(self.counter.values())
+        if not total:
+            return {}
+        return {self.key: {"ci95_pct": {
+            key: round(Z_95 * math.sqrt(count / total * (1 - count / total) / total) * 100, 2)
+            for key, count in self.counter.most_common()
+        }}}
+
+
+def _add_exact(partials, x):
+    # Shewchuk's running sum: partials stay exact, so math.fsum(partials) matches a sum over all values
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    partials[i:] = [x]
+
+
+class AverageAggregator(Aggregator):
+    """Mean of every numeric KPI column over the test session, reported as Avg_<column>."""
+
+    window = "session"
+
+    def init(self, headers):
+        # Same column selection as the original report: present KPI headers after the first seven
+        present = [header for header in REQUIRED_HEADERS if header in headers]
+        self.positions = [(header, headers[header]) for header in present[7:] if header not in MODULATION_HEADERS]
+        self.sums = {header: [] for header, _ in self.positions}
+        self.counts = {header: 0 for header, _ in self.positions}
+
+    def update(self, row, event):
+        for header, i in self.positions:
+            try:
+                value = float(row[i])
+            except ValueError:
+                continue
+            _add_exact(self.sums[header], value)
+            self.counts[header] += 1
+
+    def merge(self, other):
+        for header, partials in other.sums.items():
+            sums = self.sums.setdefault(header, [])
+            for value in partials:
+                _add_exact(sums, value)
+            self.counts[header] = self.counts.get(header, 0) + other.counts[header]
+
+    def finalize(self):
+        return {
+            f"Avg_{header}": f"{math.fsum(self.sums[header]) / self.counts[header] if self.counts[header] else 0:.2f}"
+            for header in self.sums
+        }
+
+    def error_bounds(self, rows):
+        # Half-width of the 95% interval of each mean, from the sample standard deviation
+        bounds = {}
+        for header, i in self.positions:
+            values = []
+            for row in rows:
+                try:
+                    values.append(float(row[i]))
+                except ValueError:
+                    continue
+            if len(values) < 2:
+                continue
+            mean = math.fsum(values) / len(values)
+            variance = math.fsum((value - mean) ** 2 for value in values) / (len(values) - 1)
+            bounds[f"Avg_{header}"] = {"ci95": round(Z_95 * math.sqrt(variance / len(values)), 2)}
+        return bounds
+
+
+# Registry of aggregator factories: name -> callable(test) returning an Aggregator, or None to skip that test
+AGGREGATORS = {}
+
+
+def register_aggregator(name):
+    """Decorator registering an aggregator factory under a name."""
+    def decorator(factory):
+        AGGREGATORS[name] = factory
+        return factory
+    return decorator
+
+
+@register_aggregator("peak")
+def _peak_aggregator(test):
+    columns = {
+        "DL_Test": {"PDSCH_Peak": "NR_Total_PDSCH Tput(Mbps)"},
+        "UL_Test": {"PUSCH_Peak": "NR_Total_PUSCH Tput(Mbps)"},
+        "Ookla_Test": {
+            "Ookla_DL(Mbps)_Peak": "NR_Total_PDSCH Tput(Mbps)",
+            "Ookla_UL(Mbps)_Peak": "NR_Total_PUSCH Tput(Mbps)",
+        },
+    }
+    return PeakAggregator(columns[test])
+
+
+@register_aggregator("pci_distribution")
+def _pci_distribution_aggregator(test):
+    return DistributionAggregator("NR_PCell_PCI", "PCI_Distribution")
+
+
+@register_aggregator("arfcn_distribution")
+def _arfcn_distribution_aggregator(test):
+    return DistributionAggregator("NR_PCell_NR_ARFCN", "ARFCN_Distribution")
+
+
+@register_aggregator("dl_modulation_distribution")
+def _dl_modulation_distribution_aggregator(test):
+    if test == "DL_Test":
+        return DistributionAggregator("NR_PCell_DL Modulation", "Modulation_Distribution")
+    if test == "Ookla_Test":
+        return DistributionAggregator("NR_PCell_DL Modulation", "DL_Modulation_Distribution")
+    return None
+
+
+@register_aggregator("ul_modulation_distribution")
+def _ul_modulation_distribution_aggregator(test):
+    if test == "UL_Test":
+        return DistributionAggregator("NR_PCell_UL Modulation", "Modulation_Distribution")
+    if test == "Ookla_Test":
+        return DistributionAggregator("NR_PCell_UL Modulation", "UL_Modulation_Distribution")
+    return None
+
+
+@register_aggregator("averages")
+def _average_aggregator(test):
+    return AverageAggregator()
+
+
+def enabled_aggregators():
+    """Names of the aggregators to run: NRRF_AGGREGATORS (comma-separated) or all registered ones."""
+    configured = os.environ.get("NRRF_AGGREGATORS")
+    if not configured:
+        return list(AGGREGATORS)
+    names = [name.strip() for name in configured.split(",") if name.strip()]
+    unknown = [name for name in names if name not in AGGREGATORS]
+    if unknown:
+        logger.warning(f"Ignoring unknown aggregators: {unknown}")
+    return [name for name in names if name in AGGREGATORS]
+
+
+def create_aggregators(names, headers):
+    """Instantiate the named aggregators for every test and initialise them with the header positions."""
+    aggregators = {test: [] for test in TESTS}
+    for name in names:
+        for test in TESTS:
+            aggregator = AGGREGATORS[name](test)
+            if aggregator is not None:
+                aggregator.init(headers)
+                aggregators[test].append(aggregator)
+    return aggregators
+
+
+class RowExtractor:
+    """
+    Column layout of one header signature, compiled once.
+
+    Logs exported by the same tool version share a header row. For them, the
+    column positions, the start-info getter and the initialised aggregators
+    are resolved once and reused for every file. Each file only clones the
+    aggregator prototypes.
+    """
+
+    def __init__(self, header_row, aggregator_names):
+        self.width = len(header_row)
+        self.headers = {}
+        for i, header in enumerate(header_row):
+            self.headers.setdefault(header, i)
+        self.event_index = self.headers.get("Call Event")
+        self.date_index = self.headers.get("Date")
+        self.time_index = self.headers.get("Time")
+
+        positions = [self.headers.get(header) for header in START_INFO_HEADERS]
+        if None in positions:
+            self.start_info = lambda row: tuple(row[i] if i is not None else "" for i in positions)
+        else:
+            self.start_info = itemgetter(*positions)
+
+        self.prototypes = create_aggregators(aggregator_names, self.headers)
+
+    def new_aggregators(self):
+        """Fresh aggregators for one file, by test."""
+        return copy.deepcopy(self.prototypes)
+
+
+@lru_cache(maxsize=EXTRACTOR_CACHE_SIZE)
+def compile_extractor(signature, aggregator_names):
+    """
+    Return the extractor of a header signature, compiling it on first use.
+
+    Args:
+    signature (tuple): The CSV header row
+    aggregator_names (tuple): Names of the aggregators to run
+    """
+    logger.info(f"Compiling row extractor for a {len(signature)}-column header")
+    return RowExtractor(signature, aggregator_names)
+
+
+def _test_result(events, start, end, success_marker, failure_markers):
+    # First success or failure event between the start and completion events
+    if start is None or end is None:
+        return ""
+    for index, event in events:
+        if index < start:
+            continue
+        if index > end:
+            break
+        if success_marker in event:
+            return "Success"
+        if any(x in event for x in failure_markers):
+            return event
+    return "Failure"
+
+
+class SessionTracker:
+    """
+    Test window state driven by call events.
+
+    Tracks the Start and Complete events of the Iperf DL/UL and Speedtest
+    sessions, the active and session test after every event, the start info
+    of each test and the non-empty events the results are decided from.
+    """
+
+    def __init__(self, start_info):
+        self.start_info = start_info
+        self.events = []
+        self.iperf_dl_start = self.iperf_dl_end = self.iperf_ul_start = self.iperf_ul_end = None
+        self.ookla_start = self.ookla_end = None
+        self.start_infos = {test: None for test in TESTS}
+        self.active_test = None
+        self.session_test = None
+
+    def advance(self, index, event, row):
+        """
+        Apply one call event of a row.
+
+        Returns:
+        tuple: (stripped event, session open before the event)
+        """
+        stripped = event.strip()
+        if stripped:
+            self.events.append((index, stripped))
+
+        if "Iperf - UDP DL Start" in event:
+            self.iperf_dl_start = index
+            self.start_infos["DL_Test"] = self.start_info(row)
+            self.active_test = "DL_Test"
+        elif "Iperf - UDP UL Start" in event:
+            self.iperf_ul_start = index
+            self.start_infos["UL_Test"] = self.start_info(row)
+            self.active_test = "UL_Test"
+        elif "Speedtest - Session Start" in event:
+            self.ookla_start = index
+            self.start_infos["Ookla_Test"] = self.start_info(row)
+            self.active_test = "Ookla_Test"
+        elif "Iperf - Complete" in event:
+            if self.iperf_dl_start is not None and self.iperf_dl_end is None:
+                self.iperf_dl_end = index
+            elif self.iperf_ul_start is not None and self.iperf_ul_end is None:
+                self.iperf_ul_end = index
+            if self.active_test != "Ookla_Test":
+                self.active_test = None
+        elif "Speedtest - Complete" in event:
+            self.ookla_end = index
+            if self.active_test == "Ookla_Test":
+                self.active_test = None
+
+        previous_session = self.session_test
+        if self.iperf_dl_start is not None and self.iperf_dl_end is None:
+            self.session_test = "DL_Test"
+        elif self.iperf_ul_start is not None and self.iperf_ul_end is None:
+            self.session_test = "UL_Test"
+        elif self.ookla_start is not None and self.ookla_end is None:
+            self.session_test = "Ookla_Test"
+        else:
+            self.session_test = None
+        return stripped, previous_session
+
+    def results(self):
+        """Success, the failure event, "Failure" or "" (never run) per test."""
+        return {
+            "DL_Test": _test_result(self.events, self.iperf_dl_start, self.iperf_dl_end, "Iperf - UDP DL Success", FAILURE_MARKERS),
+            "UL_Test": _test_result(self.events, self.iperf_ul_start, self.iperf_ul_end, "Iperf - UDP UL Success", FAILURE_MARKERS),
+            "Ookla_Test": _test_result(self.events, self.ookla_start, self.ookla_end, "Speedtest - Test Success", []),
+        }
+
+
+def _test_pairs(tracker, test_aggregators):
+    # Result, start info and aggregated KPIs of every test
+    results = tracker.results()
+    kv_pairs = {}
+    for test in TESTS:
+        start_info = tracker.start_infos[test]
+        test_pairs = {
+            "Result": results[test],
+            "Start_Date": start_info[0] if start_info else "",
+            "Start_Time": start_info[1] if start_info else "",
+            "Start_Latitude": start_info[2] if start_info else "",
+            "Start_Longitude": start_info[3] if start_info else "",
+            "Start_PCI": start_info[4] if start_info else "",
+            "Start_ARFCN": start_info[5] if start_info else "",
+        }
+        for aggregator in test_aggregators[test]:
+            test_pairs.update(aggregator.finalize())
+        kv_pairs[test] = test_pairs
+    return kv_pairs
+
+
+def _process_rows(reader, extractor, names, event_sink=None, coverage=None):
+    """
+    Run the session state machine and the aggregators over CSV rows.
+
+    Returns:
+    tuple: (DL_Test, UL_Test and Ookla_Test results, number of rows)
+    """
+    test_aggregators = extractor.new_aggregators()
+    active_aggregators = {test: [a for a in aggs if a.window == "active"] for test, aggs in test_aggregators.items()}
+    session_aggregators = {test: [a for a in aggs if a.window == "session"] for test, aggs in test_aggregators.items()}
+
+    event_i = extractor.event_index
+    width = extractor.width
+    date_i = extractor.date_index
+    time_i = extractor.time_index
+    bin_row = coverage.bind(extractor.headers) if coverage is not None else None
+
+    tracker = SessionTracker(extractor.start_info)
+    event_count = 0
+    total_rows = 0
+    # Aggregators to update for the current window state; only events change it
+    active_updates = session_updates = ()
+
+    for row in reader:
+        total_rows += 1
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+        if bin_row is not None:
+            bin_row(row)
+        call_events = row[event_i]
+        if not call_events:
+            # Most rows carry no call event and leave the windows unchanged
+            event_count += 1
+            for aggregator in active_updates:
+                aggregator.update(row, call_events)
+            for aggregator in session_updates:
+                aggregator.update(row, call_events)
+            continue
+
+        for event in call_events.split(";"):
+            index = event_count
+            event_count += 1
+            stripped, previous_session = tracker.advance(index, event, row)
+
+            if event_sink is not None and stripped:
+                # Completion events close their session, so they belong to the one open before
+                event_sink.append((
+                    index,
+                    row[date_i] if date_i is not None else "",
+                    row[time_i] if time_i is not None else "",
+                    stripped,
+                    tracker.session_test or previous_session,
+                ))
+
+            active_test, session_test = tracker.active_test, tracker.session_test
+            active_updates = active_aggregators[active_test] if active_test is not None else ()
+            session_updates = session_aggregators[session_test] if session_test is not None else ()
+            for aggregator in active_updates:
+                aggregator.update(row, event)
+            for aggregator in session_updates:
+                aggregator.update(row, event)
+
+    return _test_pairs(tracker, test_aggregators), total_rows
+
+
+def process_csv(input_file, output_file, aggregators=None, event_sink=None, coverage=None):
+    """
+    Summarise the Iperf DL/UL and Speedtest sessions of an NR_RF CSV.
+
+    Without an event sink or coverage, a byte-level pre-pass over the memory-mapped
+    file (locate_sessions) finds the test windows, and only their rows are parsed and
+    aggregated; rows outside every window cannot change the results. The call events
+    and coverage need every row, so with either of them, and for files with records
+    spanning several lines, the whole file is read in one row-by-row pass that fills
+    the results, events and coverage together.
+
+    Args:
+    input_file (str): Path to the NR_RF CSV
+    output_file (str): Kept for compatibility; nothing is written
+    aggregators (list): Names of registered aggregators to run, default enabled_aggregators()
+    event_sink (list): If given, receives (event index, date, time, event, session) for every
+        non-empty call event; session is the test whose window the event belongs to, or None
+    coverage (CoverageBins): If given, bins the KPIs of every row by location
+
+    Returns:
+    dict: DL_Test, UL_Test and Ookla_Test results, or None on error
+    """
     logger.info(f"Processing file: {input_file}")
     logger.info(f"Output file will be: {output_file}")
 
-    required_headers = [
-        "Date", "Time", "Latitude", "Longitude", "Call Event", "NR_PCell_Band",
-        "NR_PCell_PCI", "NR_PCell_NR_ARFCN", "NR_PCell_SS-RSRP", "NR_PCell_SS-SINR", "NR_PCell_WB CQI",
-        "NR_PCell_RI", "NR_PCell_DL MCS(Avg)", "NR_PCell_DL Num Layers",
-        "NR_PCell_DL Num RBs", "NR_Total_PDSCH Tput(Mbps)",
-        "NR_Total_PUSCH Tput(Mbps)", "NR_PCell_UL MCS(Avg)",
-        "NR_PCell_DL Modulation", "NR_PCell_UL Modulation"
-    ]
-
     try:
-        with open(input_file, 'r') as csvfile:
-            reader = csv.DictReader(csvfile)
-            headers = reader.fieldnames
+        names = enabled_aggregators() if aggregators is None else aggregators
+        with open(input_file, 'rb') as f:
+            header_line = f.readline()
+            header_row = next(csv.reader(io.StringIO(header_line.decode('utf-8'), newline='')), [])
+            extractor = compile_extractor(tuple(header_row), tuple(names))
 
-            if "Call Event" not in headers:
+            if extractor.event_index is None:
                 logger.error(f"Error: 'Call Event' column not found in {input_file}")
                 return None
 
-            header_indices = {header: headers.index(header) for header in required_headers if header in headers}
-            present_headers = [header for header in required_headers if header in header_indices]
-
-            data = []
-            iperf_dl_start = iperf_dl_end = iperf_ul_start = iperf_ul_end = None
-            ookla_start = ookla_end = None
-            iperf_dl_result = iperf_ul_result = ookla_result = ""
-            dl_averages = {header: [] for header in present_headers[7:] if header in headers and header not in ["NR_PCell_DL Modulation", "NR_PCell_UL Modulation"]}
-            ul_averages = {header: [] for header in present_headers[7:] if header in headers and header not in ["NR_PCell_DL Modulation", "NR_PCell_UL Modulation"]}
-            ookla_averages = {header: [] for header in present_headers[7:] if header in headers and header not in ["NR_PCell_DL Modulation", "NR_PCell_UL Modulation"]}
-
-            dl_pci_counter = Counter()
-            dl_arfcn_counter = Counter()
-            dl_mod_counter = Counter()
-
-            ul_pci_counter = Counter()
-            ul_arfcn_counter = Counter()
-            ul_mod_counter = Counter()
-
-            ookla_pci_counter = Counter()
-            ookla_arfcn_counter = Counter()
-            ookla_dl_mod_counter = Counter()
-            ookla_ul_mod_counter = Counter()
-
-            max_pdsch_tput = max_pusch_tput = max_ookla_dl_tput = max_ookla_ul_tput = 0
-
-            dl_start_info = ul_start_info = ookla_start_info = None
-
-            total_rows = 0
-            iperf_dl_active = iperf_ul_active = ookla_active = False
-
-            for row in reader:
-                total_rows += 1
-                call_events = row["Call Event"].split(";")
-                for event in call_events:
-                    new_row = [row.get(header, "") for header in present_headers]
-                    new_row[present_headers.index("Call Event")] = event.strip()
-                    new_row.append(str(len(call_events)))
-                    data.append(new_row)
-
-                    if "Iperf - UDP DL Start" in event:
-                        iperf_dl_start = len(data) - 1
-                        dl_start_info = (row["Date"], row["Time"], row["Latitude"], row["Longitude"], row["NR_PCell_PCI"], row["NR_PCell_NR_ARFCN"])
-                        iperf_dl_active = True
-                        iperf_ul_active = ookla_active = False
-                    elif "Iperf - UDP UL Start" in event:
-                        iperf_ul_start = len(data) - 1
-                        ul_start_info = (row["Date"], row["Time"], row["Latitude"], row["Longitude"], row["NR_PCell_PCI"], row["NR_PCell_NR_ARFCN"])
-                        iperf_ul_active = True
-                        iperf_dl_active = ookla_active = False
-                    elif "Speedtest - Session Start" in event:
-                        ookla_start = len(data) - 1
-                        ookla_start_info = (row["Date"], row["Time"], row["Latitude"], row["Longitude"], row["NR_PCell_PCI"], row["NR_PCell_NR_ARFCN"])
-                        ookla_active = True
-                        iperf_dl_active = iperf_ul_active = False
-                    elif "Iperf - Complete" in event:
-                        if iperf_dl_start is not None and iperf_dl_end is None:
-                            iperf_dl_end = len(data) - 1
-                        elif iperf_ul_start is not None and iperf_ul_end is None:
-                            iperf_ul_end = len(data) - 1
-                        iperf_dl_active = iperf_ul_active = False
-                    elif "Speedtest - Complete" in event:
-                        ookla_end = len(data) - 1
-                        ookla_active = False
-
-                    if iperf_dl_active:
-                        if row.get("NR_PCell_PCI", "").strip():
-                            dl_pci_counter[row["NR_PCell_PCI"]] += 1
-                        if row.get("NR_PCell_NR_ARFCN", "").strip():
-                            dl_arfcn_counter[row["NR_PCell_NR_ARFCN"]] += 1
-                        if row.get("NR_PCell_DL Modulation", "").strip():
-                            dl_mod_counter[row["NR_PCell_DL Modulation"]] += 1
-                        try:
-                            pdsch_tput = float(row["NR_Total_PDSCH Tput(Mbps)"])
-                            max_pdsch_tput = max(max_pdsch_tput, pdsch_tput)
-                        except (ValueError, KeyError):
-                            pass
-                    elif iperf_ul_active:
-                        if row.get("NR_PCell_PCI", "").strip():
-                            ul_pci_counter[row["NR_PCell_PCI"]] += 1
-                        if row.get("NR_PCell_NR_ARFCN", "").strip():
-                            ul_arfcn_counter[row["NR_PCell_NR_ARFCN"]] += 1
-                        if row.get("NR_PCell_UL Modulation", "").strip():
-                            ul_mod_counter[row["NR_PCell_UL Modulation"]] += 1
-                        try:
-                            pusch_tput = float(row["NR_Total_PUSCH Tput(Mbps)"])
-                            max_pusch_tput = max(max_pusch_tput, pusch_tput)
-                        except (ValueError, KeyError):
-                            pass
-                    elif ookla_active:
-                        if row.get("NR_PCell_PCI", "").strip():
-                            ookla_pci_counter[row["NR_PCell_PCI"]] += 1
-                        if row.get("NR_PCell_NR_ARFCN", "").strip():
-                            ookla_arfcn_counter[row["NR_PCell_NR_ARFCN"]] += 1
-                        if row.get("NR_PCell_DL Modulation", "").strip():
-                            ookla_dl_mod_counter[row["NR_PCell_DL Modulation"]] += 1
-                        if row.get("NR_PCell_UL Modulation", "").strip():
-                            ookla_ul_mod_counter[row["NR_PCell_UL Modulation"]] += 1
-                        try:
-                            ookla_dl_tput = float(row["NR_Total_PDSCH Tput(Mbps)"])
-                            ookla_ul_tput = float(row["NR_Total_PUSCH Tput(Mbps)"])
-                            max_ookla_dl_tput = max(max_ookla_dl_tput, ookla_dl_tput)
-                            max_ookla_ul_tput = max(max_ookla_ul_tput, ookla_ul_tput)
-                        except (ValueError, KeyError):
-                            pass
-
-                    if iperf_dl_start is not None and iperf_dl_end is None:
-                        for header in dl_averages:
-                            try:
-                                value = float(row[header])
-                                dl_averages[header].append(value)
-                            except (ValueError, KeyError):
-                                pass
-                    elif iperf_ul_start is not None and iperf_ul_end is None:
-                        for header in ul_averages:
-                            try:
-                                value = float(row[header])
-                                ul_averages[header].append(value)
-                            except (ValueError, KeyError):
-                                pass
-                    elif ookla_start is not None and ookla_end is None:
-                        for header in ookla_averages:
-                            try:
-                                value = float(row[header])
-                                ookla_averages[header].append(value)
-                            except (ValueError, KeyError):
-                                pass
+            kv_pairs = None
+            file_size = os.fstat(f.fileno()).st_size
+            if event_sink is None and coverage is None and file_size > len(header_line):
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    if _single_line_records(buffer, len(header_line)):
+                        location = locate_sessions(buffer, len(header_line), file_size, extractor)
+                        ranges = location.parse_ranges()
+                        kv_pairs, parsed_rows = _process_rows(csv.reader(_iter_range_lines(buffer, ranges)), extractor, names)
+                        parsed_bytes = sum(end - start for start, end in ranges)
+                        logger.info(f"Parsed {parsed_rows} rows in the test windows ({parsed_bytes} of {file_size} bytes)")
+
+        if kv_pairs is not None:
+            return kv_pairs
 
+        with open(input_file, 'r', newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, [])
+            kv_pairs, total_rows = _process_rows(reader, extractor, names, event_sink, coverage)
             logger.info(f"Total rows processed: {total_rows}")
+            return kv_pairs
+
+    except Exception as e:
+        logger.error(f"Error processing file {input_file}: {str(e)}")
+        return None
 
-            # Check Iperf DL result
-            if iperf_dl_start is not None and iperf_dl_end is not None:
-                for i in range(iperf_dl_start, iperf_dl_end + 1):
-                    if "Iperf - UDP DL Success" in data[i][present_headers.index("Call Event")]:
-                        iperf_dl_result = "Success"
-                        break
-                    elif any(x in data[i][present_headers.index("Call Event")] for x in ["unable", "fail", "busy", "error"]):
-                        iperf_dl_result = data[i][present_headers.index("Call Event")]
-                        break
-                if not iperf_dl_result:
-                    iperf_dl_result = "Failure"
-
-            # Check Iperf UL result
-            if iperf_ul_start is not None and iperf_ul_end is not None:
-                for i in range(iperf_ul_start, iperf_ul_end + 1):
-                    if "Iperf - UDP UL Success" in data[i][present_headers.index("Call Event")]:
-                        iperf_ul_result = "Success"
-                        break
-                    elif any(x in data[i][present_headers.index("Call Event")] for x in ["unable", "fail", "busy", "error"]):
-                        iperf_ul_result = data[i][present_headers.index("Call Event")]
-                        break
-                if not iperf_ul_result:
-                    iperf_ul_result = "Failure"
-
-            # Check Ookla result
-            if ookla_start is not None and ookla_end is not None:
-                for i in range(ookla_start, ookla_end + 1):
-                    if "Speedtest - Test Success" in data[i][present_headers.index("Call Event")]:
-                        ookla_result = "Success"
-                        break
-                if not ookla_result:
-                    ookla_result = "Failure"
-
-            # Calculate final averages
-            final_dl_averages = {header: statistics.mean(values) if values else 0 for header, values in dl_averages.items()}
-            final_ul_averages = {header: statistics.mean(values) if values else 0 for header, values in ul_averages.items()}
-            final_ookla_averages = {header: statistics.mean(values) if values else 0 for header, values in ookla_averages.items()}
-
-            # Prepare distribution strings
-            def prepare_dist_string(counter):
-                total = sum(counter.values())
-                return "; ".join([f"{key}: {count/total*100:.2f}%" for key, count in counter.most_common()])
-
-            dl_pci_dist = prepare_dist_string(dl_pci_counter)
-            dl_arfcn_dist = prepare_dist_string(dl_arfcn_counter)
-            dl_mod_dist = prepare_dist_string(dl_mod_counter)
-
-            ul_pci_dist = prepare_dist_string(ul_pci_counter)
-            ul_arfcn_dist = prepare_dist_string(ul_arfcn_counter)
-            ul_mod_dist = prepare_dist_string(ul_mod_counter)
-
-            ookla_pci_dist = prepare_dist_string(ookla_pci_counter)
-            ookla_arfcn_dist = prepare_dist_string(ookla_arfcn_counter)
-            ookla_dl_mod_dist = prepare_dist_string(ookla_dl_mod_counter)
-            ookla_ul_mod_dist = prepare_dist_string(ookla_ul_mod_counter)
-
-            # Prepare key-value pairs
-            kv_pairs = {
-                "DL_Test": {
-                    "Result": iperf_dl_result,
-                    "Start_Date": dl_start_info[0] if dl_start_info else "",
-                    "Start_Time": dl_start_info[1] if dl_start_info else "",
-                    "Start_Latitude": dl_start_info[2] if dl_start_info else "",
-                    "Start_Longitude": dl_start_info[3] if dl_start_info else "",
-                    "Start_PCI": dl_start_info[4] if dl_start_info else "",
-                    "Start_ARFCN": dl_start_info[5] if dl_start_info else "",
-                    "PDSCH_Peak": f"{max_pdsch_tput:.2f}",
-                    "PCI_Distribution": dl_pci_dist,
-                    "ARFCN_Distribution": dl_arfcn_dist,
-                    "Modulation_Distribution": dl_mod_dist,
-                },
-                "UL_Test": {
-                    "Result": iperf_ul_result,
-                    "Start_Date": ul_start_info[0] if ul_start_info else "",
-                    "Start_Time": ul_start_info[1] if ul_start_info else "",
-                    "Start_Latitude": ul_start_info[2] if ul_start_info else "",
-                    "Start_Longitude": ul_start_info[3] if ul_start_info else "",
-                    "Start_PCI": ul_start_info[4] if ul_start_info else "",
-                    "Start_ARFCN": ul_start_info[5] if ul_start_info else "",
-                    "PUSCH_Peak": f"{max_pusch_tput:.2f}",
-                    "PCI_Distribution": ul_pci_dist,
-                    "ARFCN_Distribution": ul_arfcn_dist,
-                    "Modulation_Distribution": ul_mod_dist,
-                },
-                "Ookla_Test": {
-                    "Result": ookla_result,
-                    "Start_Date": ookla_start_info[0] if ookla_start_info else "",
-                    "Start_Time": ookla_start_info[1] if ookla_start_info else "",
-                    "Start_Latitude": ookla_start_info[2] if ookla_start_info else "",
-                    "Start_Longitude": ookla_start_info[3] if ookla_start_info else "",
-                    "Start_PCI": ookla_start_info[4] if ookla_start_info else "",
-                    "Start_ARFCN": ookla_start_info[5] if ookla_start_info else "",
-                    "Ookla_DL(Mbps)_Peak": f"{max_ookla_dl_tput:.2f}",
-                    "Ookla_UL(Mbps)_Peak": f"{max_ookla_ul_tput:.2f}",
-                    "PCI_Distribution": ookla_pci_dist,
-                    "ARFCN_Distribution": ookla_arfcn_dist,
-                    "DL_Modulation_Distribution": ookla_dl_mod_dist,
-                    "UL_Modulation_Distribution": ookla_ul_mod_dist,
-                }
-            }
-
-            for key, value in final_dl_averages.items():
-                if key not in ["NR_PCell_DL Modulation", "NR_PCell_UL Modulation"]:
-                    kv_pairs["DL_Test"][f"Avg_{key}"] = f"{value:.2f}"
-            
-            for key, value in final_ul_averages.items():
-                if key not in ["NR_PCell_DL Modulation", "NR_PCell_UL Modulation"]:
-                    kv_pairs["UL_Test"][f"Avg_{key}"] = f"{value:.2f}"
-            
-            for key, value in final_ookla_averages.items():
-                if key not in ["NR_PCell_DL Modulation", "NR_PCell_UL Modulation"]:
-                    kv_pairs["Ookla_Test"][f"Avg_{key}"] = f"{value:.2f}"
 
+def find_marker_lines(buffer, start, markers):
+    """
+    Byte ranges of the lines from `start` that contain any of the markers.
+
+    Each marker is located with the buffer's find(), a C-level search, so the
+    rows in between are never decoded.
+
+    Returns:
+    list: Sorted (line start, line end) pairs
+    """
+    lines = {}
+    for marker in markers:
+        marker = marker.encode()
+        position = buffer.find(marker, start)
+        while position != -1:
+            line_start = buffer.rfind(b"\n", start, position) + 1 or start
+            line_end = buffer.find(b"\n", position) + 1 or len(buffer)
+            lines[line_start] = line_end
+            position = buffer.find(marker, line_end)
+    return sorted(lines.items())
+
+
+class SessionLocation:
+    """
+    Test windows of a file as byte ranges, from the replayed call events of its marker lines.
+
+    segments are the (start, end, (active test, session test)) ranges between
+    event lines, and event_lines the (start, end, row, [(event, active, session)])
+    of the event lines themselves, with the state after each of their events.
+    """
+
+    def __init__(self, tracker, segments, event_lines):
+        self.tracker = tracker
+        self.segments = segments
+        self.event_lines = event_lines
+        self.segment_starts = [start for start, _, _ in segments]
+
+    def state_at(self, offset):
+        """(active test, session test) of a row outside the event lines."""
+        return self.segments[bisect.bisect_right(self.segment_starts, offset) - 1][2]
+
+    def window_ranges(self, test, window):
+        """Byte ranges of the rows, event lines excluded, where `window` ("active" or "session") is `test`."""
+        position = 0 if window == "active" else 1
+        return [(start, end) for start, end, state in self.segments if state[position] == test and end > start]
+
+    def parse_ranges(self):
+        """Merged byte ranges holding every row inside a window, and every event line."""
+        ranges = sorted(
+            [(start, end) for start, end, state in self.segments if state != (None, None) and end > start]
+            + [(start, end) for start, end, _, _ in self.event_lines]
+        )
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        return merged
+
+
+def locate_sessions(buffer, start, end, extractor, markers=SESSION_MARKERS):
+    """
+    Find the test windows of a file without parsing its rows.
+
+    Only the lines containing a marker are parsed, and their call events are
+    replayed through a SessionTracker. Every event that opens or closes a window
+    mentions Iperf or Speedtest, so with the default markers the windows are exact.
+
+    Args:
+    buffer (mmap.mmap): The file
+    start (int): Offset of the first row, after the header
+    end (int): Size of the file
+    extractor (RowExtractor): Column layout of the file
+    markers (list): Strings selecting the lines to replay
+
+    Returns:
+    SessionLocation: The windows, and the tracker with the replayed events
+    """
+    event_i = extractor.event_index
+    tracker = SessionTracker(extractor.start_info)
+    segments = []
+    event_lines = []
+    segment_start = start
+    state = (None, None)
+    event_count = 0
+    for line_start, line_end in find_marker_lines(buffer, start, markers):
+        row = _parse_line(buffer[line_start:line_end], extractor.width)
+        if not row[event_i]:
+            # The marker was in another column
+            continue
+        segments.append((segment_start, line_start, state))
+        states = []
+        for event in row[event_i].split(";"):
+            tracker.advance(event_count, event, row)
+            event_count += 1
+            states.append((event, tracker.active_test, tracker.session_test))
+        event_lines.append((line_start, line_end, row, states))
+        state = (tracker.active_test, tracker.session_test)
+        segment_start = line_end
+    segments.append((segment_start, end, state))
+    return SessionLocation(tracker, segments, event_lines)
+
+
+def _single_line_records(buffer, start):
+    # A line with an odd number of quotes opens a quoted field that continues on the next line
+    if buffer.find(b'"', start) == -1:
+        return True
+    return all(line.count(b'"') % 2 == 0 for line in QUOTED_LINE_RE.findall(buffer, start))
+
+
+def _iter_range_lines(buffer, ranges):
+    # Decoded lines of the byte ranges, a block at a time
+    for start, end in ranges:
+        while start < end:
+            stop = min(end, start + PARSE_BLOCK_BYTES)
+            if stop < end:
+                stop = buffer.rfind(b"\n", start, stop) + 1 or end
+            yield from io.StringIO(buffer[start:stop].decode('utf-8'), newline='')
+            start = stop
+
+
+def _parse_line(line, width):
+    row = next(csv.reader([line.decode('utf-8', errors='replace')]), [])
+    if len(row) < width:
+        row.extend([""] * (width - len(row)))
+    return row
+
+
+def _read_window(buffer, ranges, width, sample_rows):
+    """
+    Rows of the byte ranges of a window, with their offsets: every row when the
+    window is small, otherwise sample_rows rows at an even byte stride.
+
+    Returns:
+    tuple: (list of (offset, row), exact, estimated number of rows)
+    """
+    total_bytes = sum(end - start for start, end in ranges)
+    rows = []
+    if total_bytes <= PREVIEW_EXACT_BYTES:
+        for start, end in ranges:
+            buffer.seek(start)
+            offset = start
+            while offset < end:
+                line = buffer.readline()
+                if not line:
+                    break
+                rows.append((offset, _parse_line(line, width)))
+                offset += len(line)
+        return rows, True, len(rows)
+
+    stride = total_bytes / sample_rows
+    sampled_bytes = 0
+    targets = iter(int((i + 0.5) * stride) for i in range(sample_rows))
+    target = next(targets, None)
+    skipped = 0
+    for start, end in ranges:
+        while target is not None and target < skipped + (end - start):
+            buffer.seek(start + target - skipped)
+            if target > skipped:
+                # Landed inside a line: move to the start of the next one
+                buffer.readline()
+            offset = buffer.tell()
+            if offset < end:
+                line = buffer.readline()
+                rows.append((offset, _parse_line(line, width)))
+                sampled_bytes += len(line)
+            target = next(targets, None)
+        skipped += end - start
+    estimated_rows = round(total_bytes / (sampled_bytes / len(rows))) if rows else 0
+    return rows, False, estimated_rows
+
+
+def preview_csv(input_file, aggregators=None, sample_rows=PREVIEW_SAMPLE_ROWS):
+    """
+    Approximate process_csv results from a sample of rows, for fast triage of large logs.
+
+    locate_sessions replays every call event mentioning Iperf, Speedtest or a
+    failure marker. These are the only events that move the test windows or decide a
+    result, so Result and the Start_* values are exact. The KPI aggregators then see
+    a stride sample of up to sample_rows rows of each test window. Windows under
+    PREVIEW_EXACT_BYTES are read in full and give the process_csv values. Each test
+    gets a "Preview" entry with the sampled and estimated row counts and the error
+    bounds of its approximate values.
+
+    Assumes one CSV record per line, as in the NR_RF exports.
+
+    Args:
+    input_file (str): Path to the NR_RF CSV
+    aggregators (list): Names of registered aggregators to run, default enabled_aggregators()
+    sample_rows (int): Rows sampled per test window
+
+    Returns:
+    dict: DL_Test, UL_Test and Ookla_Test results, or None on error
+    """
+    logger.info(f"Previewing file: {input_file}")
+
+    try:
+        with open(input_file, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            header_line = f.readline()
+            header_row = next(csv.reader([header_line.decode('utf-8', errors='replace')]), [])
+            names = enabled_aggregators() if aggregators is None else aggregators
+            extractor = compile_extractor(tuple(header_row), tuple(names))
+
+            event_i = extractor.event_index
+            if event_i is None:
+                logger.error(f"Error: 'Call Event' column not found in {input_file}")
+                return None
+            if file_size <= len(header_line):
+                return _process_rows([], extractor, names)[0]
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                location = locate_sessions(buffer, len(header_line), file_size, extractor, SESSION_MARKERS + FAILURE_MARKERS)
+                test_aggregators = extractor.new_aggregators()
+                previews = {}
+                for test in TESTS:
+                    windows = {window: location.window_ranges(test, window) for window in ("active", "session")}
+                    ranges = sorted(set(windows["active"]) | set(windows["session"]))
+                    rows, exact, estimated_rows = _read_window(buffer, ranges, extractor.width, sample_rows)
+
+                    # Updates as process_csv makes them: once per call event, with the state after it
+                    updates = [
+                        (offset, row, [(event, location.state_at(offset)) for event in row[event_i].split(";")])
+                        for offset, row in rows
+                    ]
+                    if exact:
+                        updates.extend(
+                            (offset, row, [(event, (active, session)) for event, active, session in states])
+                            for offset, _, row, states in location.event_lines
+                            if any(test in (active, session) for _, active, session in states)
+                        )
+                        updates.sort(key=lambda update: update[0])
+
+                    window_rows = {"active": [], "session": []}
+                    for _, row, row_updates in updates:
+                        for event, (active, session) in row_updates:
+                            for aggregator in test_aggregators[test]:
+                                if (active if aggregator.window == "active" else session) == test:
+                                    aggregator.update(row, event)
+                        for position, window in enumerate(("active", "session")):
+                            if any(update_state[position] == test for _, update_state in row_updates):
+                                window_rows[window].append(row)
+
+                    error_bounds = {}
+                    if not exact:
+                        for aggregator in test_aggregators[test]:
+                            error_bounds.update(aggregator.error_bounds(window_rows[aggregator.window]))
+                    previews[test] = {
+                        "exact": exact,
+                        "sampled_rows": len(updates),
+                        "estimated_rows": estimated_rows + (len(updates) - len(rows)),
+                        "error_bounds": error_bounds,
+                    }
+
+            kv_pairs = _test_pairs(location.tracker, test_aggregators)
+            for test in TESTS:
+                kv_pairs[test]["Preview"] = previews[test]
+            logger.info(f"Previewed {input_file} from {sum(p['sampled_rows'] for p in previews.values())} rows")
             return kv_pairs
 
     except Exception as e:
-        logger.error(f"Error processing file {input_file}: {str(e)}")
+        logger.error(f"Error previewing file {input_file}: {str(e)}")
         return None
 
+
 def main(folder_path):
     if not os.path.isdir(folder_path):
         logger.error(f"Error: {folder_path} is not a valid directory")
@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import sys
+import uuid
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always built
+    brotli = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+FINGERPRINT_LENGTH = 12
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.html', '.svg', '.json', '.txt', '.map'}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+ENTITY_TAG_RE = re.compile(r'(?:W/)?"[^"]*"')
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Pick the best encoding in `available` that the client accepts, or None for identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding, _ in ENCODINGS:
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def variant_etag(etag, encoding):
+    """ETag of one encoding of a resource: the identity ETag with the encoding added, e.g. "abc-gzip"."""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header matches an ETag (RFC 9110 section 13.1.2).
+
+    Handles "*", lists of entity-tags and weak comparison, so W/"x" matches "x".
+    """
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == opaque for tag in ENTITY_TAG_RE.findall(if_none_match))
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _fingerprinted_name(name, digest):
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{extension}"
+
+
+def build_assets(static_dir, build_dir):
+    """
+    Fingerprint and precompress every file of static_dir into build_dir.
+
+    Each file is copied as <name>.<hash><ext>, with .gz (and .br when brotli
+    is installed) variants for text assets when they are smaller. Variants
+    that already exist for the same content are not rebuilt.
+
+    Returns:
+    dict: Original name -> {"path", "etag", "encodings"}
+    """
+    os.makedirs(build_dir, exist_ok=True)
+    manifest = {}
+    for name in sorted(os.listdir(static_dir)):
+        src = os.path.join(static_dir, name)
+        if name.startswith('.') or not os.path.isfile(src):
+            continue
+        with open(src, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        fingerprinted = _fingerprinted_name(name, digest)
+        target = os.path.join(build_dir, fingerprinted)
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+
+        encodings = []
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            compressors = {"gzip": lambda raw: gzip.compress(raw, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressors["br"] = lambda raw: brotli.compress(raw, quality=11)
+            for encoding, suffix in ENCODINGS:
+                if encoding not in compressors:
+                    continue
+                variant = target + suffix
+                if not os.path.exists(variant):
+                    compressed = compressors[encoding](data)
+                    if len(compressed) >= len(data):
+                        continue
+                    _write_atomic(variant, compressed)
+                encodings.append(encoding)
+
+        manifest[name] = {"path": fingerprinted, "etag": f'"{digest[:FINGERPRINT_LENGTH]}"', "encodings": encodings}
+
+    _write_atomic(os.path.join(build_dir, MANIFEST_FILENAME), json.dumps(manifest, indent=2).encode('utf-8'))
+    logger.info(f"Built {len(manifest)} static assets in {build_dir} (brotli {'on' if brotli else 'off'})")
+    return manifest
+
+
+class StaticAssets:
+    """
+    ASGI app serving fingerprinted, precompressed static assets.
+
+    Fingerprinted URLs (from url()) are served with an immutable Cache-Control.
+    Plain names still work, with no-cache and an ETag so old links revalidate.
+    Both pick the br or gzip variant from Accept-Encoding; each variant has its own ETag.
+    """
+
+    def __init__(self, static_dir, build_dir, mount_path="/static"):
+        self.build_dir = build_dir
+        self.mount_path = mount_path.rstrip("/")
+        self.manifest = build_assets(static_dir, build_dir)
+        self.fingerprinted = {entry["path"]: name for name, entry in self.manifest.items()}
+
+    def url(self, name):
+        """URL of an asset; the fingerprinted one when the asset is known."""
+        entry = self.manifest.get(name)
+        return f"{self.mount_path}/{entry['path'] if entry else name}"
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope)
+        if request.method not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+        else:
+            response = self.get_response(request)
+        await response(scope, receive, send)
+
+    def get_response(self, request):
+        requested = request.path_params.get("path") or request.url.path[len(self.mount_path):].lstrip("/")
+        if requested in self.fingerprinted:
+            name, cache_control = self.fingerprinted[requested], IMMUTABLE_CACHE_CONTROL
+        elif requested in self.manifest:
+            name, cache_control = requested, REVALIDATE_CACHE_CONTROL
+        else:
+            return PlainTextResponse("Not Found", status_code=404)
+
+        entry = self.manifest[name]
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), entry["encodings"])
+        etag = variant_etag(entry["etag"], encoding)
+        headers = {"Cache-Control": cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        path = os.path.join(self.build_dir, entry["path"])
+        if encoding is not None:
+            path += dict(ENCODINGS)[encoding]
+            headers["Content-Encoding"] = encoding
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        manifest = build_assets(sys.argv[1], sys.argv[2])
+        for name, entry in manifest.items():
+            print(f"{name} -> {entry['path']} {entry['encodings']}")
+    else:
+        print("Usage: python static_assets.py <static_dir> <build_dir>")
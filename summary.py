@@ -4,66 +4,218 @@ import os
 import sys
 import argparse
 import logging
+import math
+from collections import Counter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_summary_csv(file_path):
-    attachrequest_count = 0
-    attachcomplete_count = 0
-    ping_max = float('-inf')
-    ping_min = float('inf')
-    ping_avg = 0
-    ping_attempt_count = 0
-    ping_success_count = 0
-    ping_error_count = 0
-    ping_avg_count = 0
-
-    with open(file_path, 'r') as csvfile:
-        reader = csv.DictReader(csvfile)
+# Columns read from the summary export; positions are resolved once per file.
+SUMMARY_COLUMNS = ('NAS', 'Max', 'Min', 'Avg', 'Total', 'Success', 'Error')
+# Percentiles of the per-row Avg values (one per ping test), reported as ping_avg_p<N>
+PING_PERCENTILES = (50, 90, 95, 99)
+# Files larger than this are read in chunks through pandas when engine="auto".
+CHUNKED_THRESHOLD_BYTES = 256 * 1024 * 1024
+CHUNK_SIZE = 100_000
+
+
+class _SummaryStats:
+    """Running counters shared by the csv and pandas engines."""
+
+    def __init__(self):
+        self.nas_counts = Counter()
+        self.ping_max = float('-inf')
+        self.ping_min = float('inf')
+        self.avg_samples = []
+        self.avg_weights = []
+        self.ping_attempt_count = 0
+        self.ping_success_count = 0
+        self.ping_error_count = 0
+
+
+def _percentile(sorted_values, pct):
+    # Nearest-rank percentile on an already sorted list
+    if not sorted_values:
+        return 0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _number(text):
+    # Like pandas.to_numeric(errors='coerce'): blank and non-numeric values are missing
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return None if math.isnan(value) else value
+
+
+def _read_with_csv(file_path, stats):
+    with open(file_path, 'r', newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        positions = {name: header.index(name) if name in header else None for name in SUMMARY_COLUMNS}
+        nas_i, max_i, min_i, avg_i, total_i, success_i, error_i = (positions[name] for name in SUMMARY_COLUMNS)
+        width = len(header)
+
+        nas_counts = stats.nas_counts
+        avg_samples = stats.avg_samples
+        avg_weights = stats.avg_weights
+        ping_max = stats.ping_max
+        ping_min = stats.ping_min
+        attempts = successes = errors = 0
+
         for row in reader:
-            # Count attach requests and completes
-            if row.get('NAS') == 'RegRequest5G':
-                attachrequest_count += 1
-            elif row.get('NAS') == 'RegComplete5G':
-                attachcomplete_count += 1
-
-            # Calculate ping statistics
-            if row.get('Max'):
-                ping_max = max(ping_max, float(row['Max']))
-            if row.get('Min'):
-                ping_min = min(ping_min, float(row['Min']))
-            if row.get('Avg'):
-                ping_avg += float(row['Avg'])
-                ping_avg_count += 1
-            if row.get('Total'):
-                ping_attempt_count += int(row['Total'])
-            if row.get('Success'):
-                ping_success_count += int(row['Success'])
-            if row.get('Error'):
-                ping_error_count += int(row['Error'])
-
-    # Calculate overall ping average
-    ping_avg = ping_avg / ping_avg_count if ping_avg_count > 0 else 0
+            if len(row) < width:
+                row.extend([''] * (width - len(row)))
+
+            if nas_i is not None and row[nas_i]:
+                nas_counts[row[nas_i]] += 1
+
+            if max_i is not None:
+                value = _number(row[max_i])
+                if value is not None and value > ping_max:
+                    ping_max = value
+            if min_i is not None:
+                value = _number(row[min_i])
+                if value is not None and value < ping_min:
+                    ping_min = value
+
+            success = _number(row[success_i]) if success_i is not None else None
+            if success is not None:
+                successes += success
+            if total_i is not None:
+                attempts += _number(row[total_i]) or 0
+            if error_i is not None:
+                errors += _number(row[error_i]) or 0
+
+            if avg_i is not None:
+                value = _number(row[avg_i])
+                if value is not None:
+                    avg_samples.append(value)
+                    avg_weights.append(int(success) if success is not None and success > 0 else 1)
+
+        stats.ping_max = ping_max
+        stats.ping_min = ping_min
+        stats.ping_attempt_count += int(attempts)
+        stats.ping_success_count += int(successes)
+        stats.ping_error_count += int(errors)
+
+
+def _read_with_pandas(file_path, stats, chunksize):
+    import pandas as pd
+
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = [name for name in SUMMARY_COLUMNS if name in header]
+    if not usecols:
+        return
+
+    numeric = [name for name in usecols if name != 'NAS']
+    for chunk in pd.read_csv(file_path, usecols=usecols, dtype={'NAS': str}, chunksize=chunksize):
+        if 'NAS' in chunk:
+            counts = chunk['NAS'].dropna()
+            stats.nas_counts.update(counts[counts != ''].value_counts().to_dict())
+        if numeric:
+            chunk[numeric] = chunk[numeric].apply(pd.to_numeric, errors='coerce')
+        if 'Max' in chunk and chunk['Max'].notna().any():
+            stats.ping_max = max(stats.ping_max, float(chunk['Max'].max()))
+        if 'Min' in chunk and chunk['Min'].notna().any():
+            stats.ping_min = min(stats.ping_min, float(chunk['Min'].min()))
+        if 'Total' in chunk:
+            stats.ping_attempt_count += int(chunk['Total'].fillna(0).sum())
+        if 'Success' in chunk:
+            stats.ping_success_count += int(chunk['Success'].fillna(0).sum())
+        if 'Error' in chunk:
+            stats.ping_error_count += int(chunk['Error'].fillna(0).sum())
+        if 'Avg' in chunk:
+            mask = chunk['Avg'].notna()
+            stats.avg_samples.extend(chunk.loc[mask, 'Avg'].astype(float).tolist())
+            if 'Success' in chunk:
+                weights = chunk.loc[mask, 'Success'].fillna(0)
+                stats.avg_weights.extend(weights.where(weights > 0, 1).astype(int).tolist())
+            else:
+                stats.avg_weights.extend([1] * int(mask.sum()))
+
+
+def _finalize(stats):
+    samples = stats.avg_samples
+    ping_avg = sum(samples) / len(samples) if samples else 0
+
+    total_weight = sum(stats.avg_weights)
+    ping_weighted_avg = (
+        sum(value * weight for value, weight in zip(samples, stats.avg_weights)) / total_weight
+        if total_weight > 0 else 0
+    )
+
+    # The jitter and the percentiles below work on the per-row Avg values, not on
+    # individual pings; the jitter is the mean absolute difference between consecutive rows
+    ping_avg_jitter = (
+        sum(abs(b - a) for a, b in zip(samples, samples[1:])) / (len(samples) - 1)
+        if len(samples) > 1 else 0
+    )
 
     # Handle case where no valid ping data was found
-    if ping_max == float('-inf'):
-        ping_max = 0
-    if ping_min == float('inf'):
-        ping_min = 0
-
-    return {
-        'attachrequest_count': attachrequest_count/2,
-        'attachcomplete_count': attachcomplete_count,
+    ping_max = stats.ping_max if stats.ping_max != float('-inf') else 0
+    ping_min = stats.ping_min if stats.ping_min != float('inf') else 0
+
+    nas_counts = stats.nas_counts
+    results = {
+        'attachrequest_count': nas_counts.get('RegRequest5G', 0)/2,
+        'attachcomplete_count': nas_counts.get('RegComplete5G', 0),
         'ping_max': f"{ping_max:.2f}",
         'ping_min': f"{ping_min:.2f}",
         'ping_avg': f"{ping_avg:.2f}",
-        'ping_attempt_count': ping_attempt_count,
-        'ping_success_count': ping_success_count,
-        'ping_error_count': ping_error_count
+        'ping_attempt_count': stats.ping_attempt_count,
+        'ping_success_count': stats.ping_success_count,
+        'ping_error_count': stats.ping_error_count,
+        'ping_weighted_avg': f"{ping_weighted_avg:.2f}",
+        'ping_avg_jitter': f"{ping_avg_jitter:.2f}",
+        'nas_counts': dict(nas_counts.most_common()),
     }
 
-def main(folder_path):
+    sorted_samples = sorted(samples)
+    for pct in PING_PERCENTILES:
+        results[f'ping_avg_p{pct}'] = f"{_percentile(sorted_samples, pct):.2f}"
+
+    return results
+
+
+def process_summary_csv(file_path, engine="auto", chunksize=CHUNK_SIZE):
+    """
+    Compute attach and ping statistics from a summary CSV in a single read.
+
+    Args:
+    file_path (str): Path to the summary CSV file
+    engine (str): "csv" for the column-indexed reader, "pandas" for chunked
+        reads, or "auto" to use pandas only for very large files
+    chunksize (int): Rows per chunk for the pandas engine
+
+    Returns:
+    dict: Attach counts, per-type NAS counts and ping statistics; ping_avg_jitter and
+    ping_avg_p<N> are computed over the per-row Avg values, not individual pings
+    """
+    if engine == "auto":
+        engine = "csv"
+        if os.path.getsize(file_path) >= CHUNKED_THRESHOLD_BYTES:
+            try:
+                import pandas  # noqa: F401
+                engine = "pandas"
+            except ImportError:
+                logger.warning("pandas not available, reading large summary file with csv engine")
+
+    stats = _SummaryStats()
+    if engine == "pandas":
+        _read_with_pandas(file_path, stats, chunksize)
+    elif engine == "csv":
+        _read_with_csv(file_path, stats)
+    else:
+        raise ValueError(f"Unknown summary engine: {engine}")
+
+    return _finalize(stats)
+
+def main(folder_path, engine="auto"):
     # Find all CSV files with 'summary' in the name in the specified directory
     summary_files = glob.glob(os.path.join(folder_path, '*summary*.csv'))
 
@@ -73,7 +225,7 @@ def main(folder_path):
     else:
         for file in summary_files:
             logger.info(f"Processing file: {file}")
-            file_results = process_summary_csv(file)
+            file_results = process_summary_csv(file, engine=engine)
             results[os.path.basename(file)] = file_results
             logger.info(f"Processed {file}")
 
@@ -82,11 +234,12 @@ def main(folder_path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process summary CSV files in a specified folder.")
     parser.add_argument("folder_path", help="Path to the folder containing summary CSV files")
+    parser.add_argument("--engine", choices=["auto", "csv", "pandas"], default="auto", help="Reader used for the summary files")
     args = parser.parse_args()
 
     if not os.path.isdir(args.folder_path):
         logger.error(f"Error: The specified path is not a valid directory: {args.folder_path}")
         sys.exit(1)
 
-    results = main(args.folder_path)
+    results = main(args.folder_path, engine=args.engine)
     print(results)
\ No newline at end of file
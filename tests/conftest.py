@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
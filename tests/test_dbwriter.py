@@ -0,0 +1,154 @@
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from dbwriter import WriteQueue, interprocess_lock
+
+Base = declarative_base()
+session_numbers = itertools.count()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def write_queue(database, tmp_path):
+    return WriteQueue(database, str(tmp_path / "test.db.writer.lock"))
+
+
+def add_item(db, name):
+    """Write job: add an item. Returns a number identifying the job's session."""
+    db.add(Item(name=name))
+    return db.info.setdefault("number", next(session_numbers))
+
+
+def names(session_factory):
+    db = session_factory()
+    try:
+        return sorted(item.name for item in db.query(Item))
+    finally:
+        db.close()
+
+
+def queue_behind_blocker(write_queue, jobs):
+    """Submit jobs while the writer is busy, so they are taken as one batch when it is released."""
+    started, release = threading.Event(), threading.Event()
+
+    def blocker(db):
+        started.set()
+        release.wait(5)
+
+    blocked = write_queue.submit(blocker)
+    assert started.wait(5)
+    futures = [write_queue.submit(fn, *args) for fn, *args in jobs]
+    release.set()
+    blocked.result(5)
+    return futures
+
+
+def test_jobs_queued_together_share_one_transaction(write_queue, database):
+    futures = queue_behind_blocker(write_queue, [(add_item, f"item-{i}") for i in range(5)])
+    sessions = {future.result(5) for future in futures}
+    assert len(sessions) == 1
+    assert names(database) == [f"item-{i}" for i in range(5)]
+
+
+def test_failed_batch_is_retried_job_by_job(write_queue, database):
+    futures = queue_behind_blocker(write_queue, [
+        (add_item, "first"),
+        (add_item, "duplicate"),
+        (add_item, "duplicate"),
+        (add_item, "last"),
+    ])
+    assert futures[0].result(5) is not None
+    assert futures[1].result(5) is not None
+    with pytest.raises(IntegrityError):
+        futures[2].result(5)
+    assert futures[3].result(5) is not None
+    # Each retried job ran in its own session
+    assert len({futures[i].result(5) for i in (0, 1, 3)}) == 3
+    assert names(database) == ["duplicate", "first", "last"]
+
+
+def test_after_commit_runs_once_after_commit(write_queue, database):
+    seen = []
+
+    def job(db):
+        add_item(db, "item")
+        WriteQueue.after_commit(db, lambda: seen.append(names(database)))
+
+    write_queue.run(job)
+    assert seen == [["item"]]
+
+
+def test_after_commit_is_dropped_on_rollback(write_queue, database):
+    calls = []
+
+    def failing(db):
+        add_item(db, "never")
+        WriteQueue.after_commit(db, lambda: calls.append("failing"))
+        raise RuntimeError("job failed")
+
+    def succeeding(db):
+        add_item(db, "kept")
+        WriteQueue.after_commit(db, lambda: calls.append("succeeding"))
+
+    with pytest.raises(RuntimeError):
+        write_queue.run(failing)
+    assert calls == []
+
+    # In a failed batch, only the callbacks of the jobs that commit on retry run, once each
+    futures = queue_behind_blocker(write_queue, [(succeeding,), (failing,)])
+    futures[0].result(5)
+    with pytest.raises(RuntimeError):
+        futures[1].result(5)
+    assert calls == ["succeeding"]
+    assert names(database) == ["kept"]
+
+
+def test_writer_waits_for_the_interprocess_lock(write_queue, database):
+    with interprocess_lock(write_queue.lock_path):
+        future = write_queue.submit(add_item, "item")
+        time.sleep(0.2)
+        assert not future.done()
+    future.result(5)
+    assert names(database) == ["item"]
+
+
+def test_interprocess_lock_excludes_other_processes(tmp_path):
+    lock_path = str(tmp_path / "writer.lock")
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = (
+        "import sys, time\n"
+        "from dbwriter import interprocess_lock\n"
+        "with interprocess_lock(sys.argv[1]):\n"
+        "    print(time.time(), flush=True)\n"
+    )
+    with interprocess_lock(lock_path):
+        child = subprocess.Popen([sys.executable, "-c", script, lock_path], cwd=repo_dir,
+                                 stdout=subprocess.PIPE, text=True)
+        time.sleep(0.5)
+        assert child.poll() is None
+        released_at = time.time()
+    output, _ = child.communicate(timeout=10)
+    assert child.returncode == 0
+    assert float(output) >= released_at
@@ -0,0 +1,110 @@
+import math
+
+import pytest
+
+from kpis import BUILTIN_KPIS, KpiExpression, KpiExpressionError, KpiProgram
+
+
+def old_kpi_data(summary, dl, ul, ookla):
+    """The KPI mapping main.build_kpi_data built before KPIs became expressions."""
+    return {
+        'PDSCH_Peak': dl.get('PDSCH_Peak'),
+        'PUSCH_Peak': ul.get('PUSCH_Peak'),
+        'Ping _avg': summary.get('ping_avg'),
+        'Ookla_DL(Mbps)': ookla.get('Ookla_DL(Mbps)_Peak'),
+        'Ookla_UL(Mbps)': ookla.get('Ookla_UL(Mbps)_Peak'),
+        'Attach_Successrate': (float(summary.get('attachcomplete_count', 0)) / float(summary.get('attachrequest_count', 1))) * 100 if float(summary.get('attachrequest_count', 0)) > 0 else 0,
+        'PDSCH_Avg': dl.get('Avg_NR_Total_PDSCH Tput(Mbps)'),
+        'PUSCH_Avg': ul.get('Avg_NR_Total_PUSCH Tput(Mbps)'),
+    }
+
+
+def old_value(value):
+    """What evaluate_kpis made of an old mapping value: None, a float, or an error."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return "error"
+
+
+RECORDS = [
+    {
+        "Summary": {"ping_avg": "23.50", "attachrequest_count": 4, "attachcomplete_count": 3},
+        "DL_Test": {"PDSCH_Peak": "812.44", "Avg_NR_Total_PDSCH Tput(Mbps)": "401.20"},
+        "UL_Test": {"PUSCH_Peak": "95.10", "Avg_NR_Total_PUSCH Tput(Mbps)": "60.02"},
+        "Ookla_Test": {"Ookla_DL(Mbps)_Peak": "700.00", "Ookla_UL(Mbps)_Peak": "80.50"},
+    },
+    # No attachcomplete_count: the success rate is 0, not missing
+    {"Summary": {"ping_avg": 18.25, "attachrequest_count": 2.0}, "DL_Test": {"PDSCH_Peak": 512}},
+    # No attach requests
+    {"Summary": {"attachrequest_count": 0, "attachcomplete_count": 0}},
+    # Values that do not convert to numbers are errors
+    {"Summary": {"ping_avg": "N/A"}, "DL_Test": {"PDSCH_Peak": "0.00", "Avg_NR_Total_PDSCH Tput(Mbps)": {"a": 1}}},
+    # Sections missing altogether
+    {},
+]
+
+
+@pytest.mark.parametrize("record", RECORDS)
+def test_builtin_kpis_match_old_mapping(record):
+    old = old_kpi_data(*(record.get(section, {}) for section in ("Summary", "DL_Test", "UL_Test", "Ookla_Test")))
+    results = KpiProgram(list(BUILTIN_KPIS)).evaluate([record])
+
+    assert set(results) == set(old)
+    for name, value in old.items():
+        values, errors, offending = results[name]
+        expected = old_value(value)
+        if expected == "error":
+            assert errors[0], name
+            assert offending[0] == value
+        elif expected is None:
+            assert not errors[0] and math.isnan(values[0]), name
+        else:
+            assert not errors[0] and values[0] == expected, name
+
+
+def test_missing_attachcomplete_count_is_zero():
+    values, errors, _ = KpiProgram(["Attach_Successrate"]).evaluate([{"Summary": {"attachrequest_count": 5}}])["Attach_Successrate"]
+    assert not errors[0]
+    assert values[0] == 0
+
+
+def test_derived_kpi_reads_sections():
+    program = KpiProgram(["DL_UL_Ratio"], {"DL_UL_Ratio": 'DL_Test.PDSCH_Peak / UL_Test["PUSCH_Peak"]'})
+    values, errors, _ = program.evaluate([{"DL_Test": {"PDSCH_Peak": "90"}, "UL_Test": {"PUSCH_Peak": 30}}])["DL_UL_Ratio"]
+    assert not errors[0]
+    assert values[0] == 3
+
+
+@pytest.mark.parametrize("text", [
+    # Attribute access on anything but a section
+    "x.y",
+    "ping_avg.real",
+    "().__class__",
+    "DL_Test.PDSCH_Peak.__class__",
+    # Calls outside the whitelist
+    "__import__('os')",
+    "open('/etc/passwd')",
+    "foo(1)",
+    "DL_Test.PDSCH_Peak()",
+    # Lambdas
+    "lambda: 1",
+    "(lambda x: x)(1)",
+    # Subscripts on non-section names
+    "x[0]",
+    "ping_avg['a']",
+    "DL_Test[0]",
+    "DL_Test['a']['b']",
+])
+def test_rejected_expressions(text):
+    with pytest.raises(KpiExpressionError):
+        KpiExpression(text)
+
+
+def test_invalid_derived_kpi_is_an_error_for_every_record():
+    program = KpiProgram(["Bad"], {"Bad": "__import__('os')"})
+    assert "Bad" in program.errors
+    values, errors, _ = program.evaluate([{}, {}])["Bad"]
+    assert errors.all()
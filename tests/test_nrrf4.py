@@ -0,0 +1,127 @@
+import csv
+import mmap
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import nrrf4
+from baseline_nrrf4 import process_csv as baseline_process_csv
+
+HEADERS = [
+    "Date", "Time", "Latitude", "Longitude", "Call Event", "NR_PCell_Band",
+    "NR_PCell_PCI", "NR_PCell_NR_ARFCN", "NR_PCell_SS-RSRP", "NR_PCell_SS-SINR", "NR_PCell_WB CQI",
+    "NR_PCell_RI", "NR_PCell_DL MCS(Avg)", "NR_PCell_DL Num Layers",
+    "NR_PCell_DL Num RBs", "NR_Total_PDSCH Tput(Mbps)",
+    "NR_Total_PUSCH Tput(Mbps)", "NR_PCell_UL MCS(Avg)",
+    "NR_PCell_DL Modulation", "NR_PCell_UL Modulation",
+]
+
+DL_TEST = ["Iperf - UDP DL Start", "Iperf - UDP DL Success;Iperf - Complete"]
+UL_TEST = ["Iperf - UDP UL Start", "Iperf - UDP UL Success;Iperf - Complete"]
+OOKLA_TEST = ["Speedtest - Session Start", "Speedtest - Test Success", "Speedtest - Complete"]
+
+
+def make_rows(events, rows_between=6, start=datetime(2026, 10, 19, 10), seed=1):
+    """Rows at 2 Hz with `rows_between` plain samples before, between and after the call events."""
+    rng = random.Random(seed)
+    rows = []
+    labels = [""] * rows_between
+    for event in events:
+        labels += [event] + [""] * rows_between
+    for i, label in enumerate(labels):
+        stamp = start + timedelta(seconds=i * 0.5)
+        rows.append([
+            stamp.strftime("%m/%d/%Y"),
+            stamp.strftime("%H:%M:%S.%f")[:-3],
+            f"{40 + i * 1e-5:.6f}", f"{-74 - i * 1e-5:.6f}",
+            label, "n41",
+            rng.choice(["101", "101", "202"]), rng.choice(["520110", "501390"]),
+            f"{-80 - rng.random() * 20:.1f}", f"{rng.random() * 30:.1f}",
+            str(rng.randint(5, 15)), "2", f"{rng.random() * 27:.1f}", "4", "200",
+            f"{rng.random() * 900:.2f}", f"{rng.random() * 100:.2f}", "20",
+            rng.choice(["QPSK", "64QAM", "256QAM"]), rng.choice(["QPSK", "64QAM"]),
+        ])
+    return rows
+
+
+def write_log(path, rows, headers=HEADERS):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    return str(path)
+
+
+def assert_matches_baseline(path):
+    expected = baseline_process_csv(path, "unused")
+    assert expected is not None
+
+    # Without sinks the session locator reads only the test windows
+    assert nrrf4.process_csv(path, "unused") == expected
+    # With an event sink every row is read in one pass
+    events = []
+    assert nrrf4.process_csv(path, "unused", event_sink=events) == expected
+    assert events
+    return expected
+
+
+def test_complete_tests_match_baseline(tmp_path):
+    path = write_log(tmp_path / "log.csv", make_rows(DL_TEST + UL_TEST + OOKLA_TEST))
+    result = assert_matches_baseline(path)
+    assert [result[test]["Result"] for test in ("DL_Test", "UL_Test", "Ookla_Test")] == ["Success"] * 3
+
+
+def test_midnight_crossing_matches_baseline(tmp_path):
+    # The DL window opens before midnight and closes after it
+    rows = make_rows(DL_TEST + UL_TEST + OOKLA_TEST, start=datetime(2026, 10, 19, 23, 59, 55))
+    assert rows[0][0] != rows[-1][0]
+    path = write_log(tmp_path / "log.csv", rows)
+    result = assert_matches_baseline(path)
+    assert result["DL_Test"]["Start_Time"].startswith("23:59")
+
+
+def test_quoted_multiline_record_matches_baseline(tmp_path):
+    rows = make_rows(DL_TEST + UL_TEST + OOKLA_TEST)
+    # A field with an embedded newline inside a DL window makes the record span two lines
+    rows[9][5] = "n41\nn78"
+    path = write_log(tmp_path / "log.csv", rows)
+    with open(path, "rb") as f:
+        header = f.readline()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            assert not nrrf4._single_line_records(buffer, len(header))
+    assert_matches_baseline(path)
+
+
+def test_row_with_extra_fields_matches_baseline(tmp_path):
+    rows = make_rows(DL_TEST + UL_TEST + OOKLA_TEST)
+    rows[10] = rows[10] + ["trailing", "fields"]
+    rows[30] = rows[30] + ["x"]
+    path = write_log(tmp_path / "log.csv", rows)
+    assert_matches_baseline(path)
+
+
+@pytest.mark.parametrize("events", [
+    # DL never completes; the UL completion closes the DL window instead
+    [DL_TEST[0]] + UL_TEST + OOKLA_TEST,
+    # Ookla never completes before the Iperf tests
+    [OOKLA_TEST[0]] + DL_TEST + UL_TEST,
+    # UL never completes at the end of the log
+    DL_TEST + OOKLA_TEST + [UL_TEST[0]],
+])
+def test_events_after_unterminated_window_match_baseline(tmp_path, events):
+    path = write_log(tmp_path / "log.csv", make_rows(events))
+    assert_matches_baseline(path)
+
+
+def test_aggregator_missing_a_method_fails_when_created(monkeypatch):
+    class Incomplete(nrrf4.Aggregator):
+        def update(self, row, event):
+            pass
+
+        def merge(self, other):
+            pass
+
+    monkeypatch.setitem(nrrf4.AGGREGATORS, "incomplete", lambda test: Incomplete())
+    with pytest.raises(TypeError):
+        nrrf4.create_aggregators(["incomplete"], HEADERS)
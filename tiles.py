@@ -0,0 +1,231 @@
+import logging
+import math
+from collections import namedtuple
+from operator import itemgetter
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# KPI name in tile URLs -> NR_RF column
+KPI_COLUMNS = {
+    "rsrp": "NR_PCell_SS-RSRP",
+    "sinr": "NR_PCell_SS-SINR",
+    "dl_tput": "NR_Total_PDSCH Tput(Mbps)",
+    "ul_tput": "NR_Total_PUSCH Tput(Mbps)",
+}
+# Tile zoom levels whose cells are stored at ingest; other zooms are merged from them
+TILE_ZOOMS = (7, 11, 15)
+# Each tile is split into 2**CELL_BITS x 2**CELL_BITS cells (16x16); the finest cells are about 76 m wide
+CELL_BITS = 4
+MAX_TILE_ZOOM = 22
+# Web Mercator latitude limit
+MAX_LATITUDE = 85.05112878
+# Rows collected before they are parsed and reduced
+CHUNK_ROWS = 65536
+
+FINEST_CELL_ZOOM = TILE_ZOOMS[-1] + CELL_BITS
+
+TileSource = namedtuple("TileSource", ["zoom", "tile_x", "tile_y", "cell_x", "cell_y", "shift", "cell_zoom"])
+
+
+def to_cell(latitude, longitude, zoom):
+    """
+    Slippy-map (Web Mercator) grid coordinates of a point at a zoom level.
+
+    Returns:
+    tuple: (x, y), or None outside the Mercator latitude limit
+    """
+    if not -MAX_LATITUDE <= latitude <= MAX_LATITUDE or not -180.0 <= longitude <= 180.0:
+        return None
+    n = 1 << zoom
+    lat = math.radians(latitude)
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(x, n - 1), min(y, n - 1)
+
+
+def cell_bounds(x, y, zoom):
+    """[west, south, east, north] in degrees of a grid cell."""
+    n = 1 << zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return [x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y)]
+
+
+def _span(index, zoom, cell_zoom):
+    # Range of cell indices at cell_zoom covered by one tile index at zoom
+    if zoom <= cell_zoom:
+        shift = cell_zoom - zoom
+        return index << shift, ((index + 1) << shift) - 1
+    return index >> (zoom - cell_zoom), index >> (zoom - cell_zoom)
+
+
+def tile_source(z, x, y):
+    """
+    Which stored cells answer a tile request, and how to merge them.
+
+    A tile at or below the finest stored zoom is built from the closest stored
+    zoom at or above it, merging 2**shift x 2**shift stored cells into each of
+    its 16x16 cells. Deeper tiles get the finest stored cells that overlap them.
+    """
+    zoom = next((stored for stored in TILE_ZOOMS if stored >= z), TILE_ZOOMS[-1])
+    cell_zoom = zoom + CELL_BITS
+    cell_x = _span(x, z, cell_zoom)
+    cell_y = _span(y, z, cell_zoom)
+    tile_x = (cell_x[0] >> CELL_BITS, cell_x[1] >> CELL_BITS)
+    tile_y = (cell_y[0] >> CELL_BITS, cell_y[1] >> CELL_BITS)
+    shift = max(0, zoom - z)
+    return TileSource(zoom, tile_x, tile_y, cell_x, cell_y, shift, cell_zoom - shift)
+
+
+class CoverageBins:
+    """
+    Per-cell KPI aggregates of one log, filled while process_csv reads it.
+
+    Rows are only collected in the per-row path. Every CHUNK_ROWS rows they are
+    parsed and reduced to one [count, sum, min, max] per cell and KPI on the
+    finest grid with numpy. Since these aggregates merge, records() combines
+    the chunks and derives the coarser stored zooms from them.
+    """
+
+    def __init__(self, kpis=None):
+        self.kpis = list(KPI_COLUMNS if kpis is None else kpis)
+        self.pending = []
+        # (cell keys, stats of shape (cells, KPIs, 4)) per reduced chunk
+        self.parts = []
+
+    def bind(self, headers):
+        """
+        Return the per-row update function for a header layout, or None when the
+        log has no Latitude/Longitude or none of the KPI columns.
+        """
+        lat_i = headers.get("Latitude")
+        lon_i = headers.get("Longitude")
+        if lat_i is None or lon_i is None or not any(KPI_COLUMNS[kpi] in headers for kpi in self.kpis):
+            return None
+        # A missing KPI column reads the latitude and is dropped in _flush()
+        self.kpi_present = [KPI_COLUMNS[kpi] in headers for kpi in self.kpis]
+        getter = itemgetter(lat_i, lon_i, *[headers.get(KPI_COLUMNS[kpi], lat_i) for kpi in self.kpis])
+        pending = self.pending
+
+        def update(row):
+            pending.append(getter(row))
+            if len(pending) >= CHUNK_ROWS:
+                self._flush()
+
+        return update
+
+    def _flush(self):
+        if not self.pending:
+            return
+        columns = list(zip(*self.pending))
+        self.pending.clear()
+
+        latitude = _parse_floats(columns[0])
+        longitude = _parse_floats(columns[1])
+        with np.errstate(invalid='ignore'):
+            valid = (
+                (np.abs(latitude) <= MAX_LATITUDE) & (longitude >= -180.0) & (longitude < 180.0)
+                & ~((latitude == 0.0) & (longitude == 0.0))  # No GPS fix
+            )
+        if not valid.any():
+            return
+
+        n = 1 << FINEST_CELL_ZOOM
+        latitude, longitude = latitude[valid], longitude[valid]
+        x = ((longitude + 180.0) / 360.0 * n).astype(np.int64)
+        y = np.clip(((1.0 - np.arcsinh(np.tan(np.radians(latitude))) / np.pi) / 2.0 * n).astype(np.int64), 0, n - 1)
+
+        values = np.column_stack([
+            _parse_floats(column)[valid] if present else np.full(len(x), np.nan)
+            for column, present in zip(columns[2:], self.kpi_present)
+        ])
+        present = np.isfinite(values)
+        stats = np.stack([
+            present.astype(np.float64),
+            np.where(present, values, 0.0),
+            np.where(present, values, np.inf),
+            np.where(present, values, -np.inf),
+        ], axis=-1)
+        self.parts.append(_merge_cells((x << 32) | y, stats))
+
+    def records(self, filename):
+        """
+        Rows for the coverage_cells table: one per stored zoom, cell and KPI with data.
+
+        Returns:
+        list: Dicts with filename, kpi, zoom, tile_x, tile_y, cell_x, cell_y, count, total, minimum, maximum
+        """
+        self._flush()
+        if not self.parts:
+            return []
+        keys = np.concatenate([part_keys for part_keys, _ in self.parts])
+        stats = np.concatenate([part_stats for _, part_stats in self.parts])
+        self.parts = [(keys, stats)]
+
+        records = []
+        for zoom in TILE_ZOOMS:
+            shift = FINEST_CELL_ZOOM - (zoom + CELL_BITS)
+            zoom_keys = ((keys >> 32) >> shift << 32) | ((keys & 0xFFFFFFFF) >> shift)
+            cell_keys, cell_stats = _merge_cells(zoom_keys, stats)
+            cell_x = (cell_keys >> 32).tolist()
+            cell_y = (cell_keys & 0xFFFFFFFF).tolist()
+            for k, kpi in enumerate(self.kpis):
+                kpi_stats = cell_stats[:, k, :]
+                for i in np.flatnonzero(kpi_stats[:, 0]).tolist():
+                    count, total, minimum, maximum = kpi_stats[i].tolist()
+                    records.append({
+                        "filename": filename,
+                        "kpi": kpi,
+                        "zoom": zoom,
+                        "tile_x": cell_x[i] >> CELL_BITS,
+                        "tile_y": cell_y[i] >> CELL_BITS,
+                        "cell_x": cell_x[i],
+                        "cell_y": cell_y[i],
+                        "count": int(count),
+                        "total": total,
+                        "minimum": minimum,
+                        "maximum": maximum,
+                    })
+        return records
+
+
+def _parse_floats(texts):
+    # Empty cells are missing values; anything unparsable is too
+    try:
+        return np.array([float(text) if text else np.nan for text in texts], dtype=np.float64)
+    except ValueError:
+        values = np.full(len(texts), np.nan)
+        for i, text in enumerate(texts):
+            try:
+                values[i] = float(text)
+            except ValueError:
+                pass
+        return values
+
+
+def _merge_cells(keys, stats):
+    """
+    Merge the [count, sum, min, max] stats of equal cell keys.
+
+    Args:
+    keys (np.ndarray): Cell key per entry, x << 32 | y
+    stats (np.ndarray): Shape (entries, KPIs, 4)
+
+    Returns:
+    tuple: (unique keys, merged stats)
+    """
+    order = np.argsort(keys, kind='stable')
+    keys, stats = keys[order], stats[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    merged = np.stack([
+        np.add.reduceat(stats[..., 0], starts),
+        np.add.reduceat(stats[..., 1], starts),
+        np.minimum.reduceat(stats[..., 2], starts),
+        np.maximum.reduceat(stats[..., 3], starts),
+    ], axis=-1)
+    return keys[starts], merged
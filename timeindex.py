@@ -0,0 +1,284 @@
+import csv
+import io
+import logging
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+from timeseries import TIME_FORMAT, find_timestamp_column
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = ".tsidx.npz"
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def _time_of_day(times):
+    """Times as timedelta64[ns], NaT where invalid; HH:MM:SS.fff is decoded without a per-value parse."""
+    chars = np.asarray(times.to_numpy(), dtype=str)
+    width = max(chars.dtype.itemsize // 4, 12)
+    codes = chars.astype(f'U{width}').view(np.uint32).reshape(len(chars), width).astype(np.int64)
+    digits = codes[:, [0, 1, 3, 4, 6, 7, 9, 10, 11]] - ord('0')
+    fixed = (
+        ((digits >= 0) & (digits <= 9)).all(axis=1)
+        & (digits[:, 2] <= 5) & (digits[:, 4] <= 5)
+        & (codes[:, 2] == ord(':')) & (codes[:, 5] == ord(':')) & (codes[:, 8] == ord('.'))
+        & (codes[:, 12:] == 0).all(axis=1)
+    )
+    ms = (((digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 2] * 10 + digits[:, 3]) * 60
+          + digits[:, 4] * 10 + digits[:, 5]) * 1000 + digits[:, 6] * 100 + digits[:, 7] * 10 + digits[:, 8]
+    result = pd.Series(np.where(fixed, ms, 0).astype('timedelta64[ms]').astype('timedelta64[ns]'))
+    if not fixed.all():
+        others = ~fixed
+        result[others] = pd.to_timedelta(times[others].str.strip(), errors='coerce').to_numpy()
+    return result.where((result >= pd.Timedelta(0)) & (result < pd.Timedelta(days=1)))
+
+
+def _date_plus_time(dates, times):
+    # A log spans few days, so each distinct date is parsed once and the times are added as durations
+    codes, uniques = pd.factorize(dates.str.strip())
+    days = pd.to_datetime(pd.Series(uniques, dtype=object), errors='coerce').to_numpy()
+    return pd.Series(days[codes] + _time_of_day(times.reset_index(drop=True)).to_numpy())
+
+
+def parse_timestamps(dates, times):
+    """Combine Date and Time into epoch milliseconds, rolling over midnight when there is no Date."""
+    times = pd.Series(times, dtype=object).fillna('')
+    parsed = None
+    if dates is not None:
+        dates = pd.Series(dates, dtype=object).fillna('')
+        parsed = _date_plus_time(dates, times)
+        if parsed.isna().all():
+            parsed = pd.to_datetime(dates.str.strip() + " " + times.str.strip(), errors='coerce')
+        if parsed.isna().all():
+            logger.warning("Could not parse the Date column, falling back to Time only")
+            parsed = None
+
+    if parsed is None:
+        parsed = pd.to_datetime(times, format=TIME_FORMAT, errors='coerce')
+
+    parsed = parsed.ffill().bfill()
+    if parsed.isna().all():
+        return np.zeros(len(times), dtype=np.int64)
+    epoch_ms = parsed.to_numpy().astype('datetime64[ms]').astype(np.int64)
+
+    if dates is None and len(epoch_ms) > 1:
+        # A jump back of more than half a day means the log crossed midnight
+        wraps = np.diff(epoch_ms) < -DAY_MS // 2
+        epoch_ms[1:] += np.cumsum(wraps) * DAY_MS
+    return epoch_ms
+
+
+class TimeIndex:
+    """
+    Epoch timestamp per data row of an NR_RF CSV, plus the byte offset of each row.
+
+    Rows are normally already in time order, in which case a time window maps
+    to one contiguous byte range of the file and only that range is parsed.
+    """
+
+    def __init__(self, columns, epoch_ms, offsets, data_end):
+        self.columns = list(columns)
+        self.epoch_ms = epoch_ms
+        self.offsets = offsets
+        self.data_end = int(data_end)
+        self.monotonic = bool(len(epoch_ms) < 2 or np.all(np.diff(epoch_ms) >= 0))
+        self.order = None if self.monotonic else np.argsort(epoch_ms, kind='stable')
+
+    @property
+    def rows(self):
+        return len(self.epoch_ms)
+
+    @classmethod
+    def build(cls, csv_path):
+        """
+        Index a CSV without a Python pass over its lines.
+
+        Record offsets come from a numpy search for the newlines that are not inside
+        quotes, so quoted fields spanning lines stay one row. Date and Time are read
+        with pandas; files pandas rejects fall back to parsing each record with csv.
+        """
+        with open(csv_path, 'rb') as f:
+            header_line = f.readline()
+            columns = next(csv.reader([header_line.decode('utf-8', 'replace')]), [])
+            timestamp_column = find_timestamp_column(columns)
+            if timestamp_column is None:
+                raise ValueError("Timestamp column not found in the CSV file")
+            data_start = len(header_line)
+            size = os.fstat(f.fileno()).st_size
+            if size <= data_start:
+                return cls(columns, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), size)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                offsets = _record_offsets(np.frombuffer(buffer, dtype=np.uint8), data_start)
+                fields = [column for column in ("Date", timestamp_column) if column in columns]
+                try:
+                    values = _read_fields(csv_path, fields, len(offsets))
+                except (ValueError, pd.errors.ParserError) as e:
+                    logger.warning(f"Reading timestamps record by record: {str(e)}")
+                    values = _read_fields_by_record(buffer, offsets, size, [columns.index(column) for column in fields])
+
+        dates = values[0] if "Date" in fields else None
+        epoch_ms = parse_timestamps(dates, values[-1])
+        return cls(columns, epoch_ms, offsets, size)
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, columns=np.asarray(self.columns), epoch_ms=self.epoch_ms,
+                     offsets=self.offsets, data_end=np.int64(self.data_end))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['columns'].tolist(), data['epoch_ms'], data['offsets'], data['data_end'])
+
+    def time_range_ms(self):
+        if not self.rows:
+            return None, None
+        return int(self.epoch_ms.min()), int(self.epoch_ms.max())
+
+    def select(self, start_ms=None, end_ms=None):
+        """
+        Find the rows in [start_ms, end_ms] with a binary search.
+
+        Returns:
+        slice or ndarray: a row slice when the log is in time order, else sorted row numbers
+        """
+        sorted_ms = self.epoch_ms if self.monotonic else self.epoch_ms[self.order]
+        lo = 0 if start_ms is None else int(np.searchsorted(sorted_ms, start_ms, side='left'))
+        hi = self.rows if end_ms is None else int(np.searchsorted(sorted_ms, end_ms, side='right'))
+        hi = max(lo, hi)
+        if self.monotonic:
+            return slice(lo, hi)
+        return np.sort(self.order[lo:hi])
+
+    def _row_offset(self, row):
+        return int(self.offsets[row]) if row < self.rows else self.data_end
+
+    def _with_timestamps(self, df, epoch_ms, timestamp_column):
+        df = df.reset_index(drop=True)
+        if timestamp_column is not None:
+            df[timestamp_column] = pd.to_datetime(epoch_ms, unit='ms')
+        return df
+
+    def read_rows(self, csv_path, rows, usecols=None, timestamp_column=None):
+        """
+        Parse only the selected rows, replacing the timestamp column with the date-aware index times.
+        """
+        if isinstance(rows, slice):
+            count = rows.stop - rows.start
+            if count <= 0:
+                return self._with_timestamps(pd.DataFrame(columns=usecols or self.columns), [], timestamp_column)
+            with open(csv_path, 'rb') as f:
+                f.seek(self._row_offset(rows.start))
+                df = pd.read_csv(f, header=None, names=self.columns, usecols=usecols,
+                                 nrows=count, skip_blank_lines=False)
+            return self._with_timestamps(df, self.epoch_ms[rows], timestamp_column)
+
+        df = pd.read_csv(csv_path, usecols=usecols, skip_blank_lines=False).iloc[rows]
+        epoch_ms = self.epoch_ms[rows]
+        order = np.argsort(epoch_ms, kind='stable')
+        return self._with_timestamps(df.iloc[order], epoch_ms[order], timestamp_column)
+
+    def iter_row_chunks(self, csv_path, rows, chunk_rows, usecols=None, timestamp_column=None):
+        """Yield the selected rows as DataFrames of at most chunk_rows rows."""
+        if not isinstance(rows, slice):
+            df = self.read_rows(csv_path, rows, usecols, timestamp_column)
+            for start in range(0, len(df), chunk_rows):
+                yield df.iloc[start:start + chunk_rows]
+            return
+
+        count = rows.stop - rows.start
+        if count <= 0:
+            return
+        with open(csv_path, 'rb') as f:
+            f.seek(self._row_offset(rows.start))
+            reader = pd.read_csv(f, header=None, names=self.columns, usecols=usecols,
+                                 nrows=count, chunksize=chunk_rows, skip_blank_lines=False)
+            position = rows.start
+            for chunk in reader:
+                epoch_ms = self.epoch_ms[position:position + len(chunk)]
+                position += len(chunk)
+                yield self._with_timestamps(chunk, epoch_ms, timestamp_column)
+
+    def sample_rows(self, csv_path, rows, samples, usecols=None, timestamp_column=None):
+        """Read about `samples` evenly spaced rows of a selection by seeking to their offsets."""
+        numbers = np.arange(rows.start, rows.stop) if isinstance(rows, slice) else rows
+        if len(numbers) == 0:
+            return self._with_timestamps(pd.DataFrame(columns=usecols or self.columns), [], timestamp_column)
+        picks = numbers[np.unique(np.linspace(0, len(numbers) - 1, min(samples, len(numbers))).astype(np.int64))]
+
+        lines = []
+        with open(csv_path, 'rb') as f:
+            for row in picks:
+                f.seek(int(self.offsets[row]))
+                line = f.readline()
+                lines.append(line if line.endswith(b'\n') else line + b'\n')
+
+        df = pd.read_csv(io.BytesIO(b''.join(lines)), header=None, names=self.columns,
+                         usecols=usecols, skip_blank_lines=False)
+        epoch_ms = self.epoch_ms[picks]
+        if not self.monotonic:
+            order = np.argsort(epoch_ms, kind='stable')
+            df, epoch_ms = df.iloc[order], epoch_ms[order]
+        return self._with_timestamps(df, epoch_ms, timestamp_column)
+
+
+def _record_offsets(data, data_start):
+    # A newline ends a record when an even number of quotes precede it
+    newlines = np.flatnonzero(data == ord('\n'))
+    newlines = newlines[newlines >= data_start]
+    quotes = np.flatnonzero(data == ord('"'))
+    if len(quotes):
+        newlines = newlines[np.searchsorted(quotes, newlines) % 2 == 0]
+    starts = np.concatenate(([data_start], newlines + 1)).astype(np.int64)
+    # A newline at the very end does not start another record
+    return starts[starts < len(data)]
+
+
+def _read_fields(csv_path, fields, rows):
+    df = pd.read_csv(csv_path, usecols=fields, dtype=str, keep_default_na=False,
+                     skip_blank_lines=False, encoding_errors='replace')
+    if len(df) != rows:
+        raise ValueError(f"pandas read {len(df)} rows, the file has {rows} records")
+    return [df[field].fillna('').to_numpy(dtype=object) for field in fields]
+
+
+def _read_fields_by_record(buffer, offsets, size, positions):
+    values = [[] for _ in positions]
+    ends = np.append(offsets[1:], size)
+    for start, end in zip(offsets.tolist(), ends.tolist()):
+        text = buffer[start:end].decode('utf-8', 'replace')
+        row = next(csv.reader(io.StringIO(text, newline='')), [])
+        for column, i in zip(values, positions):
+            column.append(row[i] if len(row) > i else '')
+    return values
+
+
+def index_path(csv_path):
+    return f"{csv_path}{INDEX_SUFFIX}"
+
+
+def ensure_time_index(csv_path):
+    """Build and store the time index of a CSV if it does not exist yet."""
+    path = index_path(csv_path)
+    if not os.path.exists(path):
+        TimeIndex.build(csv_path).save(path)
+        logger.info(f"Built time index for {os.path.basename(csv_path)}")
+    return path
+
+
+def load_time_index(csv_path):
+    """Load the time index of a CSV, building it first for files ingested before indexes existed."""
+    return TimeIndex.load(ensure_time_index(csv_path))
+
+
+def to_epoch_ms(value):
+    """Convert a datetime (timezone dropped, as log times are local) to epoch milliseconds."""
+    if value is None:
+        return None
+    return int(pd.Timestamp(value.replace(tzinfo=None)).value // 1_000_000)
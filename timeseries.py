@@ -0,0 +1,185 @@
+import json
+import logging
+import struct
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%H:%M:%S.%f"
+# Plot timestamps include the date so logs crossing midnight stay in order
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+DESIRED_KPIS = [
+    "NR_PCELL_PCI",
+    "NR_PCell_PDSCH Tput(Mbps)",
+    "NR_PCell_SS-RSRP",
+    "NR_PCell_SS-SINR",
+    "NR_PCell_WB CQI",
+    "NR_PCell_DL MCS(Avg)",
+    "NR_PCell_DL Modulation"
+]
+
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+OVERVIEW_SAMPLES = 500
+STREAM_CHUNK_ROWS = 20000
+
+
+def find_timestamp_column(columns):
+    """Return the first column with 'time' in its name, or None."""
+    return next((col for col in columns if 'time' in col.lower()), None)
+
+
+def match_kpi_column(columns, kpi):
+    """Resolve a requested KPI to a column: exact name first, then case-insensitive substring."""
+    if kpi in columns:
+        return kpi
+    return next((col for col in columns if kpi.lower() in col.lower()), None)
+
+
+def select_kpi_columns(columns):
+    """Return the columns matching any of the plotted KPIs."""
+    return [col for col in columns if any(kpi.lower() in col.lower() for kpi in DESIRED_KPIS)]
+
+
+def load_kpi_series(file_path, index, kpi):
+    """
+    Read only the timestamp and one KPI column from an NR_RF CSV.
+
+    Args:
+    file_path (str): Path to the NR_RF CSV
+    index (TimeIndex): Time index of the file, giving date-aware timestamps
+    kpi (str): Requested KPI
+
+    Returns:
+    tuple: (kpi column name, session start timestamp, elapsed seconds array, values array)
+    """
+    timestamp_column = find_timestamp_column(index.columns)
+    if timestamp_column is None:
+        raise ValueError("Timestamp column not found in the CSV file")
+    kpi_column = match_kpi_column(index.columns, kpi)
+    if kpi_column is None:
+        raise KeyError(f"KPI {kpi} not found in the CSV file")
+
+    df = index.read_rows(file_path, index.select(), usecols=[timestamp_column, kpi_column],
+                         timestamp_column=timestamp_column)
+    timestamps = df[timestamp_column]
+    start = timestamps.min()
+    elapsed = (timestamps - start).dt.total_seconds().to_numpy()
+    values = pd.to_numeric(df[kpi_column], errors='coerce').to_numpy(dtype=float)
+
+    valid = ~np.isnan(values) & ~np.isnan(elapsed)
+    return kpi_column, start, elapsed[valid], values[valid]
+
+
+def resample_to_grid(elapsed, values, grid_edges):
+    """
+    Downsample a series onto shared time bins by averaging the samples in each bin.
+
+    Returns:
+    list: One mean per bin, None where a bin has no samples
+    """
+    bins = len(grid_edges) - 1
+    index = np.clip(np.searchsorted(grid_edges, elapsed, side='right') - 1, 0, bins - 1)
+    sums = np.bincount(index, weights=values, minlength=bins)
+    counts = np.bincount(index, minlength=bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return [None if count == 0 else float(mean) for mean, count in zip(means, counts)]
+
+
+def trace_points(df, timestamp_column, kpi):
+    """Return the non-null (x, y) lists of one KPI, with x formatted as datetime strings."""
+    valid = df[[timestamp_column, kpi]].dropna()
+    return valid[timestamp_column].dt.strftime(DATETIME_FORMAT).tolist(), valid[kpi].tolist()
+
+
+def format_time_range(timestamps):
+    return {
+        "start": timestamps.min().strftime(DATETIME_FORMAT),
+        "end": timestamps.max().strftime(DATETIME_FORMAT),
+    }
+
+
+def iter_timeseries_stream(file_path, index, rows, overview_samples=OVERVIEW_SAMPLES, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Yield the plot data of an NR_RF CSV as a sequence of messages.
+
+    A "meta" message with the KPIs and time range and an "overview" message
+    per KPI built from sampled rows come first. They are followed by "chunk"
+    messages carrying the full-resolution data, read chunk by chunk. Only the
+    rows selected from the time index are read.
+    """
+    timestamp_column = find_timestamp_column(index.columns)
+    if timestamp_column is None:
+        raise ValueError("Timestamp column not found in the CSV file")
+    kpis = select_kpi_columns(index.columns)
+    if not kpis:
+        raise ValueError("No matching KPI columns found in the CSV file")
+    usecols = [timestamp_column] + [kpi for kpi in kpis if kpi != timestamp_column]
+
+    overview = index.sample_rows(file_path, rows, overview_samples, usecols, timestamp_column)
+    yield {
+        "type": "meta",
+        "kpis": kpis,
+        "time_range": format_time_range(overview[timestamp_column]) if len(overview) else None,
+    }
+    for kpi in kpis:
+        x, y = trace_points(overview, timestamp_column, kpi)
+        yield {"type": "overview", "name": kpi, "x": x, "y": y}
+
+    for chunk_index, chunk in enumerate(index.iter_row_chunks(file_path, rows, chunk_rows, usecols, timestamp_column)):
+        for kpi in kpis:
+            x, y = trace_points(chunk, timestamp_column, kpi)
+            yield {"type": "chunk", "name": kpi, "index": chunk_index, "x": x, "y": y}
+
+    yield {"type": "done"}
+
+
+def encode_timeseries_binary(df, timestamp_column, kpis, time_range):
+    """
+    Encode plot data as one shared time column plus one array per KPI.
+
+    Layout (little-endian):
+    - uint32 length of the JSON header
+    - JSON header, space-padded so the data starts on an 8-byte boundary
+    - int64 epoch milliseconds, one per row
+    - float32 values per KPI, one per row, NaN where the KPI is missing
+
+    Text KPIs (e.g. modulation) are sent as float32 codes into the
+    "labels" list of their header entry.
+    """
+    rows = len(df)
+    epoch_ms = df[timestamp_column].astype('datetime64[ms]').astype('int64').to_numpy()
+
+    arrays = []
+    kpi_headers = []
+    for kpi in kpis:
+        column = df[kpi]
+        entry = {"name": kpi}
+        if column.dtype == object:
+            codes, labels = pd.factorize(column)
+            values = codes.astype('<f4')
+            values[codes < 0] = np.nan
+            entry["labels"] = labels.tolist()
+        else:
+            values = pd.to_numeric(column, errors='coerce').to_numpy(dtype='<f4')
+        arrays.append(values)
+        kpi_headers.append(entry)
+
+    header = {
+        "version": 1,
+        "rows": rows,
+        "time_range": time_range,
+        "time_range_ms": [int(epoch_ms.min()), int(epoch_ms.max())] if rows else [0, 0],
+        "kpis": kpi_headers,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-(4 + len(header_bytes)) % 8)
+
+    parts = [struct.pack('<I', len(header_bytes)), header_bytes, epoch_ms.astype('<i8').tobytes()]
+    parts.extend(values.tobytes() for values in arrays)
+    return b''.join(parts)
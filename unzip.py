@@ -1,52 +1,140 @@
 import os
 import zipfile
 import re
+import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def unzip_cellular_data(folder_path):
+# Members we keep: NR_RF and Summary CSVs plus screenshots
+MEMBER_PATTERN = re.compile(r'(.*NR_RF.*\.csv|.*Summary.*\.csv|.*\.(jpg|png|jpeg))$', re.IGNORECASE)
+
+# Per-archive guards against malformed or zip-bomb uploads
+MAX_ARCHIVE_UNCOMPRESSED_BYTES = 4 * 1024 ** 3
+MAX_COMPRESSION_RATIO = 200
+MAX_ARCHIVE_MEMBERS = 10000
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class ZipLimitError(Exception):
+    """Raised when an archive exceeds the configured extraction limits."""
+
+
+def _safe_member_path(extract_folder, member_name):
+    # Same sanitisation zipfile.extract applies: drop drive letters, absolute roots and '..'
+    arcname = member_name.replace('\\', '/')
+    parts = [p for p in arcname.split('/') if p not in ('', '.', '..')]
+    parts = [os.path.splitdrive(p)[1] for p in parts]
+    return os.path.join(extract_folder, *[p for p in parts if p])
+
+
+def _select_members(zip_ref, zip_name, max_bytes, max_ratio, max_members):
+    infos = zip_ref.infolist()
+    if len(infos) > max_members:
+        raise ZipLimitError(f"{zip_name}: {len(infos)} members exceeds limit of {max_members}")
+
+    selected = [info for info in infos if not info.is_dir() and MEMBER_PATTERN.match(info.filename)]
+
+    total_size = sum(info.file_size for info in selected)
+    if total_size > max_bytes:
+        raise ZipLimitError(f"{zip_name}: {total_size} uncompressed bytes exceeds limit of {max_bytes}")
+
+    for info in selected:
+        if info.compress_size and info.file_size / info.compress_size > max_ratio:
+            raise ZipLimitError(
+                f"{zip_name}: member {info.filename} compression ratio "
+                f"{info.file_size / info.compress_size:.0f} exceeds limit of {max_ratio}"
+            )
+
+    return selected
+
+
+def _extract_archive(zip_path, extract_folder, max_bytes, max_ratio, max_members):
+    zip_name = os.path.basename(zip_path)
+    manifest = []
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        # Validate the whole archive from metadata before writing anything
+        members = _select_members(zip_ref, zip_name, max_bytes, max_ratio, max_members)
+        written = 0
+        for info in members:
+            target = _safe_member_path(extract_folder, info.filename)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zip_ref.open(info) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+                written += dst.tell()
+            if written > max_bytes:
+                raise ZipLimitError(f"{zip_name}: extracted data exceeds limit of {max_bytes} bytes")
+            manifest.append({
+                "archive": zip_name,
+                "member": info.filename,
+                "name": os.path.basename(target),
+                "path": target,
+                "size": info.file_size,
+            })
+            logger.debug(f"Extracted: {info.filename}")
+
+    logger.info(f"Processed {zip_name}: {len(manifest)} files extracted")
+    return manifest
+
+
+def unzip_cellular_data(folder_path, max_workers=None,
+                        max_archive_bytes=MAX_ARCHIVE_UNCOMPRESSED_BYTES,
+                        max_compression_ratio=MAX_COMPRESSION_RATIO,
+                        max_archive_members=MAX_ARCHIVE_MEMBERS):
     """
     Unzips specific files from all ZIP files in the given folder.
-    
+
+    Several archives are extracted in parallel; a single one, as with an upload,
+    is extracted directly. Each goes into its own folder under
+    Extractedfiles named after the archive, so members with the same name in
+    different archives do not overwrite each other. Each archive is checked
+    against the size, compression ratio and member count limits before extraction.
+
     Args:
     folder_path (str): Path to the folder containing ZIP files
-    
+    max_workers (int): Number of archives extracted concurrently
+    max_archive_bytes (int): Maximum total uncompressed size of the selected members of one archive
+    max_compression_ratio (float): Maximum uncompressed/compressed ratio of any selected member
+    max_archive_members (int): Maximum number of entries in one archive
+
     Returns:
-    str: Path to the folder where files were extracted
+    list: One dict per extracted file with archive, member, name, path and size
     """
     extract_folder = os.path.join(folder_path, "Extractedfiles")
     os.makedirs(extract_folder, exist_ok=True)
-    
-    # Updated regex patterns
-    nrrf_pattern = re.compile(r'.*NR_RF.*\.csv$', re.IGNORECASE)
-    summary_pattern = re.compile(r'.*Summary.*\.csv$', re.IGNORECASE)
-    screenshots_pattern = re.compile(r'.*\.(jpg|png|jpeg)$', re.IGNORECASE)
-    
-    for filename in os.listdir(folder_path):
-        if filename.endswith('.zip'):
-            zip_path = os.path.join(folder_path, filename)
-            
-            # Extract all files to the Extractedfiles folder
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                for file in zip_ref.namelist():
-                    if (nrrf_pattern.match(file) or 
-                        summary_pattern.match(file) or 
-                        screenshots_pattern.match(file)):
-                        zip_ref.extract(file, extract_folder)
-                        logger.info(f"Extracted: {file}")
-            
-            logger.info(f"Processed {filename}")
-    
+
+    zip_paths = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.endswith('.zip')]
+    if not zip_paths:
+        logger.info("No ZIP files found")
+        return []
+
+    jobs = [
+        (zip_path, os.path.join(extract_folder, os.path.splitext(os.path.basename(zip_path))[0]),
+         max_archive_bytes, max_compression_ratio, max_archive_members)
+        for zip_path in zip_paths
+    ]
+    if len(jobs) == 1:
+        manifest = _extract_archive(*jobs[0])
+    else:
+        workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_extract_archive, *job) for job in jobs]
+            manifest = []
+            for future in futures:
+                manifest.extend(future.result())
+
     logger.info("All files processed")
-    return extract_folder
+    return manifest
 
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1:
         folder_path = sys.argv[1]
-        extracted_folder = unzip_cellular_data(folder_path)
-        print(f"Files extracted to: {extracted_folder}")
+        manifest = unzip_cellular_data(folder_path)
+        print(f"Extracted {len(manifest)} files to: {os.path.join(folder_path, 'Extractedfiles')}")
+        for entry in manifest:
+            print(f"  {entry['archive']}: {entry['member']} ({entry['size']} bytes)")
     else:
-        print("Please provide the path to the folder containing ZIP files as an argument.")
\ No newline at end of file
+        print("Please provide the path to the folder containing ZIP files as an argument.")
@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+
+from artifacts import file_digest
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Sessions without any activity for this long are removed
+DEFAULT_SESSION_TTL = 24 * 3600
+# Received bytes are collected up to this size before each write to disk
+WRITE_BUFFER_SIZE = 1024 * 1024
+SESSION_FILENAME = "session.json"
+DATA_FILENAME = "data.part"
+CHUNKS_DIRNAME = "chunks"
+# A finalized session is renamed to <id>.finalizing while its ZIP is processed
+FINALIZING_SUFFIX = ".finalizing"
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be applied."""
+
+    def __init__(self, detail, status_code=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _pwrite_all(fd, data, offset):
+    # pwrite may write less than asked
+    view = memoryview(data)
+    while view:
+        count = os.pwrite(fd, view, offset)
+        view, offset = view[count:], offset + count
+    return len(data)
+
+
+def _ranges(indices, chunk_size, size):
+    # Merge sorted chunk indices into [start, end) byte ranges
+    ranges = []
+    for index in indices:
+        start, end = index * chunk_size, min((index + 1) * chunk_size, size)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+class ChunkedUploads:
+    """
+    Resumable uploads of large files in numbered chunks.
+
+    Each session is a directory under root holding session.json, the data file
+    (allocated sparse at its final size) and one marker file per verified chunk
+    under chunks/. Chunk n covers bytes [n * chunk_size, (n + 1) * chunk_size)
+    and is streamed straight to that offset, so chunks can arrive in any order,
+    be re-sent, and be written by any worker process sharing the directory.
+    A chunk only counts as received once its SHA-256 matched.
+    """
+
+    def __init__(self, root, max_size, session_ttl=DEFAULT_SESSION_TTL):
+        self.root = root
+        self.max_size = max_size
+        self.session_ttl = session_ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _session_dir(self, upload_id):
+        if not UPLOAD_ID_RE.match(upload_id):
+            raise UploadError("Upload not found", 404)
+        return os.path.join(self.root, upload_id)
+
+    def _expired(self, path, now):
+        try:
+            return now - os.path.getmtime(path) > self.session_ttl
+        except FileNotFoundError:
+            return False
+
+    def create(self, filename, size, chunk_size=None):
+        """
+        Start an upload session.
+
+        Args:
+        filename (str): Name of the uploaded file; only its base name is kept
+        size (int): Total size in bytes
+        chunk_size (int): Bytes per chunk, DEFAULT_CHUNK_SIZE when not given
+
+        Returns:
+        dict: The session status, see status()
+        """
+        filename = os.path.basename(filename or "")
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        if not filename:
+            raise UploadError("filename is required")
+        if size <= 0:
+            raise UploadError("size must be positive")
+        if size > self.max_size:
+            raise UploadError(f"Upload exceeds the limit of {self.max_size} bytes", 413)
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise UploadError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes")
+
+        self.collect_garbage()
+        if shutil.disk_usage(self.root).free < size:
+            raise UploadError("Not enough disk space for this upload", 507)
+
+        upload_id = uuid.uuid4().hex
+        session_dir = os.path.join(self.root, upload_id)
+        os.makedirs(os.path.join(session_dir, CHUNKS_DIRNAME))
+        with open(os.path.join(session_dir, DATA_FILENAME), 'wb') as f:
+            f.truncate(size)
+        session = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "size": size,
+            "chunk_size": chunk_size,
+            "chunk_count": -(-size // chunk_size),
+            "created_at": time.time(),
+        }
+        _write_atomic(os.path.join(session_dir, SESSION_FILENAME), json.dumps(session).encode('utf-8'))
+        logger.info(f"Started upload {upload_id}: {filename}, {size} bytes in {session['chunk_count']} chunks")
+        return self.status(upload_id)
+
+    def load(self, upload_id):
+        """Session metadata; expired sessions are removed and reported as not found."""
+        session_dir = self._session_dir(upload_id)
+        session_path = os.path.join(session_dir, SESSION_FILENAME)
+        if self._expired(session_path, time.time()):
+            shutil.rmtree(session_dir, ignore_errors=True)
+        try:
+            with open(session_path, 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+
+    def received_chunks(self, upload_id):
+        chunks_dir = os.path.join(self._session_dir(upload_id), CHUNKS_DIRNAME)
+        try:
+            return sorted(int(name) for name in os.listdir(chunks_dir) if name.isdigit())
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+
+    def status(self, upload_id):
+        """
+        Progress of an upload.
+
+        Returns:
+        dict: Session fields plus received_bytes, received_ranges ([start, end) byte
+        offsets), missing_chunks, complete and expires_at (epoch seconds)
+        """
+        session = self.load(upload_id)
+        received = self.received_chunks(upload_id)
+        ranges = _ranges(received, session["chunk_size"], session["size"])
+        received_set = set(received)
+        mtime = os.path.getmtime(os.path.join(self._session_dir(upload_id), SESSION_FILENAME))
+        return {
+            **session,
+            "received_bytes": sum(end - start for start, end in ranges),
+            "received_ranges": ranges,
+            "missing_chunks": [index for index in range(session["chunk_count"]) if index not in received_set],
+            "complete": len(received) == session["chunk_count"],
+            "expires_at": mtime + self.session_ttl,
+        }
+
+    async def write_chunk(self, upload_id, index, stream, checksum):
+        """
+        Stream one chunk to its offset in the data file and verify it.
+
+        The file work runs in worker threads, so the event loop only receives the body.
+
+        Args:
+        upload_id (str): Session id
+        index (int): Chunk number, from 0
+        stream: Async iterator of the chunk's bytes
+        checksum (str): Expected SHA-256 of the chunk, hex
+
+        Returns:
+        dict: The session status after this chunk
+        """
+        session = await asyncio.to_thread(self.load, upload_id)
+        session_dir = self._session_dir(upload_id)
+        if not 0 <= index < session["chunk_count"]:
+            raise UploadError(f"Chunk index must be between 0 and {session['chunk_count'] - 1}")
+        checksum = (checksum or "").strip().lower()
+        if not SHA256_RE.match(checksum):
+            raise UploadError("A SHA-256 hex checksum of the chunk is required")
+
+        offset = index * session["chunk_size"]
+        length = min(session["chunk_size"], session["size"] - offset)
+        marker_path = os.path.join(session_dir, CHUNKS_DIRNAME, str(index))
+        # A re-sent chunk is not received again until it verifies
+        await asyncio.to_thread(_remove_if_exists, marker_path)
+
+        sha = hashlib.sha256()
+        received = 0
+        written = 0
+        pending = bytearray()
+        fd = await asyncio.to_thread(os.open, os.path.join(session_dir, DATA_FILENAME), os.O_WRONLY)
+        try:
+            async for block in stream:
+                if received + len(block) > length:
+                    raise UploadError(f"Chunk {index} must be {length} bytes")
+                sha.update(block)
+                received += len(block)
+                pending += block
+                if len(pending) >= WRITE_BUFFER_SIZE:
+                    written += await asyncio.to_thread(_pwrite_all, fd, bytes(pending), offset + written)
+                    pending.clear()
+            if pending:
+                written += await asyncio.to_thread(_pwrite_all, fd, bytes(pending), offset + written)
+            await asyncio.to_thread(os.fsync, fd)
+        finally:
+            await asyncio.to_thread(os.close, fd)
+
+        if received != length:
+            raise UploadError(f"Chunk {index} must be {length} bytes, received {received}")
+        if sha.hexdigest() != checksum:
+            raise UploadError(f"Checksum mismatch for chunk {index}", 422)
+        return await asyncio.to_thread(self._mark_received, upload_id, marker_path, checksum)
+
+    def _mark_received(self, upload_id, marker_path, checksum):
+        _write_atomic(marker_path, checksum.encode('ascii'))
+        os.utime(os.path.join(self._session_dir(upload_id), SESSION_FILENAME))
+        return self.status(upload_id)
+
+    def finalize(self, upload_id, sha256=None):
+        """
+        Close a complete upload and hand over its file.
+
+        The session directory is renamed out of the active sessions, so only one
+        caller can finalize it. The caller owns the returned file and removes
+        its directory when done.
+
+        Args:
+        upload_id (str): Session id
+        sha256 (str): Optional SHA-256 of the whole file, checked before the session is closed
+
+        Returns:
+        str: Path of the assembled file, named after the uploaded file
+        """
+        status = self.status(upload_id)
+        if not status["complete"]:
+            raise UploadError(f"Upload is missing {len(status['missing_chunks'])} chunks", 409)
+        session_dir = self._session_dir(upload_id)
+        if sha256 and file_digest(os.path.join(session_dir, DATA_FILENAME)) != sha256.strip().lower():
+            raise UploadError("Checksum mismatch for the assembled file", 422)
+
+        claimed_dir = session_dir + FINALIZING_SUFFIX
+        try:
+            os.rename(session_dir, claimed_dir)
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+        os.utime(os.path.join(claimed_dir, SESSION_FILENAME))
+        file_path = os.path.join(claimed_dir, status["filename"])
+        os.replace(os.path.join(claimed_dir, DATA_FILENAME), file_path)
+        logger.info(f"Finalized upload {upload_id}: {status['filename']}")
+        return file_path
+
+    def delete(self, upload_id):
+        session_dir = self._session_dir(upload_id)
+        if not os.path.isdir(session_dir):
+            raise UploadError("Upload not found", 404)
+        shutil.rmtree(session_dir, ignore_errors=True)
+        logger.info(f"Cancelled upload {upload_id}")
+
+    def collect_garbage(self):
+        """
+        Remove sessions idle for longer than the session TTL, including finalized
+        ones whose processing never cleaned up.
+
+        Returns:
+        int: Number of sessions removed
+        """
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.root):
+            session_dir = os.path.join(self.root, name)
+            if not UPLOAD_ID_RE.match(name.removesuffix(FINALIZING_SUFFIX)) or not os.path.isdir(session_dir):
+                continue
+            session_path = os.path.join(session_dir, SESSION_FILENAME)
+            # A session whose metadata was never written is judged by its directory
+            if self._expired(session_path if os.path.exists(session_path) else session_dir, now):
+                shutil.rmtree(session_dir, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} abandoned uploads")
+        return removed
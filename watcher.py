@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import traceback
+from datetime import datetime
+
+from watchfiles import Change, awatch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Checkpoints are kept outside the watched folder, one per folder
+CHECKPOINT_DIR = os.environ.get(
+    "WATCHER_CHECKPOINT_DIR", os.path.join(os.path.dirname(os.path.realpath(__file__)), "watcher_checkpoints")
+)
+# Where earlier versions kept the checkpoint, inside the watched folder
+LEGACY_CHECKPOINT_FILENAME = ".ingest_checkpoint.json"
+DEFAULT_CONCURRENCY = 2
+DEFAULT_STABLE_SECONDS = 5.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class Checkpoint:
+    """
+    Persistent record of the ZIP files that were already ingested.
+
+    Entries are keyed by file name and store the size and modification time
+    seen at ingest, so a ZIP that is replaced with new content is picked up
+    again while an unchanged one is skipped after a restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not read checkpoint {path}, starting empty: {str(e)}")
+
+    @staticmethod
+    def signature(zip_path):
+        """(size, mtime) of a file; raises FileNotFoundError when it is gone."""
+        stat = os.stat(zip_path)
+        return stat.st_size, int(stat.st_mtime)
+
+    def is_processed(self, zip_path):
+        entry = self.entries.get(os.path.basename(zip_path))
+        if not entry or entry.get("status") != "processed":
+            return False
+        try:
+            size, mtime = self.signature(zip_path)
+        except FileNotFoundError:
+            return True
+        return entry.get("size") == size and entry.get("mtime") == mtime
+
+    def mark(self, zip_path, signature, status, error=None):
+        """Record a result for the file as it was when ingest started, see signature()."""
+        size, mtime = signature
+        self.entries[os.path.basename(zip_path)] = {
+            "size": size,
+            "mtime": mtime,
+            "status": status,
+            "error": error,
+            "updated_at": datetime.now().isoformat(),
+        }
+        self.save()
+
+    def save(self):
+        # Write to a temp file first so a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+async def wait_until_stable(zip_path, stable_seconds=DEFAULT_STABLE_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Wait until a file has stopped growing.
+
+    Returns:
+    bool: True once the size has been unchanged for stable_seconds, False if the file disappeared
+    """
+    last_size = -1
+    stable_for = 0.0
+    while stable_for < stable_seconds:
+        try:
+            size = os.path.getsize(zip_path)
+        except FileNotFoundError:
+            return False
+        if size == last_size and size > 0:
+            stable_for += poll_interval
+        else:
+            stable_for = 0.0
+            last_size = size
+        await asyncio.sleep(poll_interval)
+    return True
+
+
+def ingest_zip(zip_path):
+    """Run the parse, evaluate and persist pipeline of /process_zip/ on one ZIP."""
+    from main import SessionLocal, append_to_sqlite, get_numeric_id, process_zip_path
+
+    db = SessionLocal()
+    pending_writes = []
+    try:
+        file_results = process_zip_path(zip_path, db, pending_writes=pending_writes)
+    finally:
+        db.close()
+
+    numeric_id = get_numeric_id(os.path.basename(zip_path))
+    if not append_to_sqlite({"results": {numeric_id: file_results}}, pending_writes):
+        raise RuntimeError(f"Failed to save results for {zip_path} to SQLite")
+    return numeric_id
+
+
+def backfill_rollups():
+    """The rollup backfill the app runs at startup, for a watcher running on its own."""
+    from main import backfill_cell_kpi_rollups, write_queue
+
+    write_queue.run(backfill_cell_kpi_rollups)
+
+
+def default_checkpoint_path(folder_path):
+    """Checkpoint file for a watched folder under CHECKPOINT_DIR, named after the folder."""
+    folder_path = os.path.abspath(folder_path)
+    digest = hashlib.sha256(folder_path.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(CHECKPOINT_DIR, f"{os.path.basename(folder_path) or 'root'}-{digest}.json")
+
+
+class FolderWatcher:
+    def __init__(self, folder_path, concurrency=DEFAULT_CONCURRENCY, stable_seconds=DEFAULT_STABLE_SECONDS,
+                 checkpoint_path=None):
+        self.folder_path = os.path.abspath(folder_path)
+        self.stable_seconds = stable_seconds
+        checkpoint_path = os.path.abspath(checkpoint_path or default_checkpoint_path(self.folder_path))
+        if os.path.dirname(checkpoint_path) == self.folder_path:
+            raise ValueError("The checkpoint must be kept outside the watched folder")
+        legacy_path = os.path.join(self.folder_path, LEGACY_CHECKPOINT_FILENAME)
+        if os.path.exists(legacy_path) and not os.path.exists(checkpoint_path):
+            os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+            shutil.move(legacy_path, checkpoint_path)
+            logger.info(f"Moved checkpoint {legacy_path} to {checkpoint_path}")
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = set()
+        self.tasks = set()
+
+    def schedule(self, zip_path):
+        if zip_path in self.in_flight or self.checkpoint.is_processed(zip_path):
+            return
+        self.in_flight.add(zip_path)
+        task = asyncio.create_task(self._ingest(zip_path))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _ingest(self, zip_path):
+        try:
+            if not await wait_until_stable(zip_path, self.stable_seconds):
+                logger.warning(f"File disappeared before it was complete: {zip_path}")
+                return
+            async with self.semaphore:
+                # Re-check: an identical file may have been handled while this one was settling
+                if self.checkpoint.is_processed(zip_path):
+                    return
+                # Signed before ingest: the file may be moved or replaced while it is processed
+                try:
+                    signature = Checkpoint.signature(zip_path)
+                except FileNotFoundError:
+                    logger.warning(f"File disappeared before ingest: {zip_path}")
+                    return
+                logger.info(f"Ingesting {zip_path}")
+                try:
+                    numeric_id = await asyncio.to_thread(ingest_zip, zip_path)
+                    self.checkpoint.mark(zip_path, signature, "processed")
+                    logger.info(f"Ingested {zip_path} as {numeric_id}")
+                except Exception as e:
+                    logger.error(f"Error ingesting {zip_path}: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    self.checkpoint.mark(zip_path, signature, "failed", str(e))
+        finally:
+            self.in_flight.discard(zip_path)
+
+    async def run(self):
+        logger.info(f"Watching {self.folder_path} for ZIP files")
+        await asyncio.to_thread(backfill_rollups)
+
+        # Pick up anything that arrived while the watcher was not running
+        for filename in sorted(os.listdir(self.folder_path)):
+            if filename.endswith('.zip'):
+                self.schedule(os.path.join(self.folder_path, filename))
+
+        async for changes in awatch(self.folder_path, watch_filter=_zip_filter, recursive=False):
+            for change, path in changes:
+                if change != Change.deleted:
+                    self.schedule(path)
+
+
+def _zip_filter(change, path):
+    return path.endswith('.zip')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a folder and ingest new ZIP files as they finish writing.")
+    parser.add_argument("folder_path", help="Path to the folder the drive-test rigs sync ZIP files to")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum number of ZIP files ingested at once")
+    parser.add_argument("--stable-seconds", type=float, default=DEFAULT_STABLE_SECONDS, help="Seconds a file size must stay unchanged before ingest")
+    parser.add_argument("--checkpoint", help="Checkpoint file, outside the watched folder; defaults to one under WATCHER_CHECKPOINT_DIR")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder_path):
+        logger.error(f"Error: The specified path is not a valid directory: {args.folder_path}")
+        sys.exit(1)
+
+    watcher = FolderWatcher(args.folder_path, concurrency=args.concurrency, stable_seconds=args.stable_seconds,
+                            checkpoint_path=args.checkpoint)
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        logger.info("Watcher stopped")